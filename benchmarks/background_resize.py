@@ -0,0 +1,95 @@
+"""
+Simulates dragging a window edge: RESIZES resize events, one every FRAME ms, on a widget with bg.jpg as its
+background, the way ImageBackgroundWidget used to handle them (decode the file and scale it on the gui thread, every
+time) and with utils.image_cache. Prints how long the gui thread was busy and how many decodes/scales it took. Then
+opens DIALOGS dialogs of the same size, which used to scale the image each time (QPixmap(path) itself is cached by
+Qt's QPixmapCache, so it's mostly the scaling that's saved).
+
+Run from the project root (QT_QPA_PLATFORM=offscreen works without a display):
+    python -m benchmarks.background_resize
+"""
+import time
+
+from PySide2 import QtWidgets, QtCore, QtGui
+
+from utils import image_cache
+
+IMAGE = "bg.jpg"
+RESIZES = 60
+FRAME = 16  # ms, about 60 resize events a second
+DIALOGS = 20
+
+
+def sizes():
+    return [QtCore.QSize(800 + 5 * i, 600 + 3 * i) for i in range(RESIZES)]
+
+
+def old_resize(size):
+    bg = QtGui.QPixmap(IMAGE)
+    return bg.scaled(size.width(), size.height(), QtCore.Qt.KeepAspectRatioByExpanding)
+
+
+def wait(app, ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        app.processEvents(QtCore.QEventLoop.AllEvents, 1)
+
+
+def run_old(app):
+    busy = 0
+    for size in sizes():
+        start = time.perf_counter()
+        old_resize(size)
+        busy += time.perf_counter() - start
+        wait(app, FRAME)
+    dialogs = 0
+    for _ in range(DIALOGS):
+        start = time.perf_counter()
+        dialog = QtWidgets.QWidget()
+        old_resize(QtCore.QSize(400, 300))
+        dialogs += time.perf_counter() - start
+        dialog.deleteLater()
+    return busy, RESIZES, dialogs
+
+
+def run_new(app):
+    image_cache.clear()
+    widget = QtWidgets.QWidget()
+    background = image_cache.ScaledBackground(widget, IMAGE)
+    scales = {"count": 0}
+    image_cache.scaler.done.connect(lambda *args: scales.update(count=scales["count"] + 1))
+
+    busy = 0
+    for size in sizes():
+        start = time.perf_counter()
+        background.resize(size)
+        busy += time.perf_counter() - start
+        wait(app, FRAME)
+    wait(app, image_cache.RESCALE_DELAY + 200)  # the last, debounced rescale
+    QtCore.QThreadPool.globalInstance().waitForDone()
+    wait(app, 50)
+    assert background.pixmap is not None and background.pixmap.width() >= sizes()[-1].width()
+
+    dialogs = 0
+    for _ in range(DIALOGS):
+        start = time.perf_counter()
+        dialog = QtWidgets.QWidget()
+        dialog_background = image_cache.ScaledBackground(dialog, IMAGE)
+        dialog_background.resize(QtCore.QSize(400, 300))
+        dialogs += time.perf_counter() - start
+        QtCore.QThreadPool.globalInstance().waitForDone()
+        wait(app, 5)
+        dialog.deleteLater()
+    return busy, scales["count"], dialogs
+
+
+def main():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    for name, run in (("old", run_old), ("image_cache", run_new)):
+        busy, scales, dialogs = run(app)
+        print(f"{name:>11}: gui thread busy {busy * 1000:8.1f}ms over {RESIZES} resizes, {scales:3} scales, "
+              f"{DIALOGS} dialog opens {dialogs * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Counts the SQL statements it takes to load the board the way the widgets used to (query the lists, then each list's
+cards and each card's labels load lazily) and with todo_lists.models.load_board(), for growing numbers of cards.
+load_board() has to stay at the same count however many cards there are.
+
+Run from the project root:
+    python -m benchmarks.board_loading
+"""
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine, transaction
+from todo_lists.models import TodoListModel, TodoCardModel, TodoLabelModel, load_board
+
+LISTS = 5
+LABELS = 10
+
+
+def old_load():
+    boards = []
+    for todo_list in Session.query(TodoListModel).all():
+        cards = sorted(todo_list.cards, key=lambda c: c.position)
+        boards.append((todo_list, cards, [len(card.labels) for card in cards]))
+    return boards
+
+
+def new_load():
+    return [(todo_list, cards, [len(card.labels) for card in cards]) for todo_list, cards in load_board()]
+
+
+def make_board(card_count):
+    rng = random.Random(0)
+    with transaction():
+        labels = [TodoLabelModel(f"label {i}", "#FFFFFF") for i in range(LABELS)]
+        lists = [TodoListModel(f"list {i}") for i in range(LISTS)]
+        for i in range(card_count):
+            TodoCardModel(rng.choice(lists), f"card {i}", "", None, position=i, labels=rng.sample(labels, rng.randint(0, 3)))
+
+
+def main(card_counts=(10, 100, 1000, 5000)):
+    statements = {"count": 0}
+    new_counts = []
+    for card_count in card_counts:
+        with tempfile.TemporaryDirectory(dir=".") as directory:
+            Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+            Base.metadata.create_all(Session.bind)
+            event.listen(Session.bind, "before_cursor_execute", lambda *args: statements.update(count=statements["count"] + 1))
+            make_board(card_count)
+
+            results = []
+            for name, load in (("old", old_load), ("new", new_load)):
+                Session.expunge_all()  # start from an empty identity map, like at startup
+                statements["count"] = 0
+                start = time.perf_counter()
+                load()
+                results.append(f"{name}: {statements['count']:5} statements {(time.perf_counter() - start) * 1000:8.1f}ms")
+            new_counts.append(statements["count"])
+            print(f"{card_count:5} cards | {' | '.join(results)}")
+            Session.bind.dispose()
+
+    assert len(set(new_counts)) == 1, f"load_board() statement count grows with the card count: {new_counts}"
+
+
+if __name__ == "__main__":
+    main()
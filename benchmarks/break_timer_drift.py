@@ -0,0 +1,106 @@
+"""
+Runs an hour long break timer on a simulated clock, where every sleep or timer wakes up late by a random 0-OVERSHOOT
+seconds, like a busy event loop does. The old BreakTimerWidget counted a second as 100 sleep(0.01)s, so each second
+took as long as those sleeps did, overshoot included; break_timer.timer.Countdown works from a deadline instead.
+Prints how far off each one finished and how many times it woke up, and asserts the Countdown was off by less than
+one tick (a second) and never showed a time more than a second off. Then it does it again with the computer suspended
+for SUSPEND_FOR seconds partway through, which the Countdown should count as time passed.
+
+Run from the project root:
+    python -m benchmarks.break_timer_drift
+"""
+import heapq
+import itertools
+import math
+import random
+
+from break_timer.timer import Countdown
+
+SECONDS = 3600
+OVERSHOOT = 0.002  # seconds, at most
+SUSPEND_AT = 1000
+SUSPEND_FOR = 600
+
+
+class SimulatedLoop:
+    def __init__(self, seed=0, suspend_at=None):
+        self.now = 0.0
+        self.suspend_at = suspend_at
+        self.rng = random.Random(seed)
+        self.queue = []
+        self.counter = itertools.count()
+        self.wakeups = 0
+
+    def clock(self):
+        return self.now
+
+    def call_later(self, delay, callback):
+        handle = Handle()
+        heapq.heappush(self.queue, (self.now + delay + self.rng.uniform(0, OVERSHOOT), next(self.counter), handle, callback))
+        return handle
+
+    def run(self):
+        while self.queue:
+            when, _, handle, callback = heapq.heappop(self.queue)
+            if handle.cancelled:
+                continue
+            self.now = when
+            if self.suspend_at is not None and self.now >= self.suspend_at:
+                # the loop's timers don't count suspended time, so this one fires SUSPEND_FOR late
+                self.now += SUSPEND_FOR
+                self.suspend_at = None
+            self.wakeups += 1
+            callback()
+
+
+class Handle:
+    cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+def old_timer(loop):
+    """Simulates the old start(): SECONDS * 100 sleep(0.01)s, each one late by up to OVERSHOOT"""
+    for _ in range(SECONDS * 100):
+        loop.now += 0.01 + loop.rng.uniform(0, OVERSHOOT)
+        loop.wakeups += 1
+    return loop.now
+
+
+def new_timer(loop):
+    done = {}
+    worst = {"error": 0}
+
+    def on_tick(displayed):
+        true_left = max(0, SECONDS - loop.now)
+        worst["error"] = max(worst["error"], abs(displayed - math.ceil(true_left)))
+
+    countdown = Countdown(SECONDS, on_tick, lambda: done.update(at=loop.now), clock=loop.clock, call_later=loop.call_later)
+    countdown.start()
+    loop.run()
+    return done["at"], worst["error"]
+
+
+def main():
+    old_loop = SimulatedLoop()
+    old_end = old_timer(old_loop)
+    new_loop = SimulatedLoop()
+    new_end, worst_display_error = new_timer(new_loop)
+
+    print(f"old: finished {old_end - SECONDS:+8.3f}s off after {old_loop.wakeups} wakeups")
+    print(f"new: finished {new_end - SECONDS:+8.3f}s off after {new_loop.wakeups} wakeups, "
+          f"displayed time at most {worst_display_error}s off")
+    assert 0 <= new_end - SECONDS < 1, "drifted by a tick or more"
+    assert worst_display_error <= 1
+    assert new_loop.wakeups <= SECONDS + 1
+
+    suspended_loop = SimulatedLoop(suspend_at=SUSPEND_AT)
+    suspended_end, _ = new_timer(suspended_loop)
+    print(f"new, suspended for {SUSPEND_FOR}s: finished {suspended_end - SECONDS:+8.3f}s off after "
+          f"{suspended_loop.wakeups} wakeups")
+    assert 0 <= suspended_end - SECONDS < 1
+
+
+if __name__ == "__main__":
+    main()
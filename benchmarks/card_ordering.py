@@ -0,0 +1,76 @@
+"""
+Drags cards around a long list, the way TodoListWidget.add_card used to place them (the card gets the index as its
+position and every card below it moves down one) and with todo_lists.ordering's spaced positions, counting the rows
+each drag writes.
+
+Run from the project root:
+    python -m benchmarks.card_ordering [cards in the list] [drags]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine, transaction
+from todo_lists import ordering
+from todo_lists.models import TodoListModel, TodoCardModel
+
+
+def old_drag(list_model, card, index):
+    with transaction():
+        others = [other for other in list_model.cards if other is not card]
+        card.position = index
+        card.save()
+        for other in others:
+            if other.position >= card.position:
+                other.position += 1
+                other.save()
+
+
+def new_drag(list_model, card, index):
+    with transaction():
+        others = [other for other in list_model.cards if other is not card]
+        card.position = ordering.position_at(list_model, others, index)
+        card.save()
+    if ordering._scheduled_lists:  # noqa, run the background rebalance now instead of a second later
+        ordering._rebalance_scheduled()  # noqa
+
+
+def main(card_count=1000, drags=100):
+    rows = {"written": 0}
+
+    @event.listens_for(Session, "after_flush")
+    def count_rows(session, flush_context):
+        rows["written"] += len(session.dirty) + len(session.new)
+
+    # dragging to the same spot over and over squeezes the same gap, so it shows the cost of rebalancing
+    patterns = (("random spots", lambda rng: rng.randrange(card_count)), ("the same spot", lambda rng: 1))
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+
+        print(f"{drags} drags in a {card_count} card list")
+        for pattern, pick_index in patterns:
+            for name, drag, gap in (("old", old_drag, 1), ("new", new_drag, ordering.POSITION_GAP)):
+                with transaction():
+                    list_model = TodoListModel(f"{name} list, {pattern}")
+                    for i in range(card_count):
+                        list_model.cards.append(TodoCardModel(None, f"card {i}", "", None, position=(i + 1) * gap))
+                    list_model.save()
+
+                rng = random.Random(0)
+                rows["written"] = 0
+                start = time.perf_counter()
+                for _ in range(drags):
+                    drag(list_model, rng.choice(list_model.cards), pick_index(rng))
+                elapsed = time.perf_counter() - start
+
+                print(f"  {pattern:>13}, {name}: {rows['written'] / drags:7.1f} rows written per drag | "
+                      f"{elapsed / drags * 1000:7.2f}ms per drag")
+        Session.bind.dispose()
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,94 @@
+"""
+Builds a TodoListWidget with 100, 1000 and 10000 cards, once with a TodoCardWidget per card ("Widgets") and once with a
+CardListView ("List View"), and prints how long construction and the first layout take, how many QObjects the list
+ends up with and how much the process' memory grew.
+
+Run from the project root (QT_QPA_PLATFORM=offscreen works without a display):
+    python -m benchmarks.card_rendering
+Memory is read from /proc/self/status, so it's only printed on linux.
+"""
+import asyncio
+import datetime
+import gc
+import os
+import random
+import tempfile
+import time
+
+import qasync
+from PySide2 import QtWidgets, QtCore
+
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine, transaction
+from settings.models import Setting
+from todo_lists.models import TodoListModel, TodoCardModel, TodoLabelModel, load_board
+from todo_lists.card_view import CARD_DISPLAY_WIDGETS, CARD_DISPLAY_LIST_VIEW
+from todo_lists.widgets import TodoListWidget
+
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def make_list(card_count, labels):
+    rng = random.Random(0)
+    with transaction():
+        todo_list = TodoListModel(f"list {card_count}")
+        for i in range(card_count):
+            due_date = datetime.datetime.now() + datetime.timedelta(days=rng.randint(-3, 10)) if rng.random() < 0.5 else None
+            TodoCardModel(todo_list, f"card {i}", "", due_date, position=i, labels=rng.sample(labels, rng.randint(0, 3)))
+    return todo_list
+
+
+async def build(todo_list, display):
+    Setting.get_or_create("Card Display", CARD_DISPLAY_WIDGETS).set_value(display)
+    cards = dict(load_board())[todo_list]  # with their labels, like at startup
+    gc.collect()
+    rss_before = rss_kb()
+    start = time.perf_counter()
+    widget = TodoListWidget(todo_list, cards)
+    widget.grab()  # the first layout and paint
+    await asyncio.sleep(0)  # and the due dates' first check_date()
+    elapsed = time.perf_counter() - start
+    rss_after = rss_kb()
+    objects = len(widget.findChildren(QtCore.QObject))
+
+    widget.deleteLater()
+    await asyncio.sleep(0.1)  # let it be deleted
+    memory = f"{(rss_after - rss_before) / 1024:8.1f}MB" if rss_before is not None else "       ?"
+    return f"{display.split(' ')[0]:>7}: {elapsed * 1000:9.1f}ms {objects:7} QObjects {memory}"
+
+
+async def run(card_counts):
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+        with transaction():
+            labels = [TodoLabelModel(f"label {i}", "#FFFFFF") for i in range(8)]
+        for card_count in card_counts:
+            todo_list = make_list(card_count, labels)
+            # the list view first, so the widgets' memory isn't counted against it
+            results = [await build(todo_list, display) for display in (CARD_DISPLAY_LIST_VIEW, CARD_DISPLAY_WIDGETS)]
+            print(f"{card_count:6} cards | " + " | ".join(reversed(results)))
+        Session.bind.dispose()
+
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()  # the deleted DueDateDisplays' check_date() loops
+
+
+def main(card_counts=(100, 1000, 10000)):
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    loop = qasync.QEventLoop(app)  # due dates start a task on the running loop, like in the app
+    asyncio.set_event_loop(loop)
+    with loop:
+        loop.run_until_complete(run(card_counts))
+
+
+if __name__ == "__main__":
+    main()
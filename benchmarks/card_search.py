@@ -0,0 +1,114 @@
+"""
+Searches CARDS cards with long, email-like descriptions, in a throwaway database:
+    - with todo_lists.search's FTS5 index: the time to index existing cards (add_search_index() on an old database),
+      and each query's time for the top LIMIT matches and for all of them unranked, the way the board's search box
+      filters
+    - by loading every card's title and description and checking them in python, the way it would be done without it
+    - with search()'s LIKE fallback, for sqlite without FTS5
+Then checks that inserting, renaming and deleting a card through the ORM updates the index (it's kept by triggers).
+
+Run from the project root:
+    python -m benchmarks.card_search
+"""
+import itertools
+import os
+import random
+import statistics
+import string
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine, transaction
+from todo_lists import search
+from todo_lists.models import TodoListModel, TodoCardModel
+
+CARDS = 100000
+VOCABULARY = 20000
+LIMIT = 50
+RUNS = 5
+
+
+def make_words(rng):
+    return ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10))) for _ in range(VOCABULARY)]
+
+
+def make_cards(rng, vocabulary, list_id):
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))  # zipf-ish, like text
+    for i in range(CARDS):
+        yield {"title": " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(3, 7))),
+               "description": " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(40, 200))),
+               "position": i, "list_id": list_id}
+
+
+def timed(function, *args):
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = function(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000, result
+
+
+def python_scan(query):
+    words = [word.lower() for word in search.words(query)]
+    rows = Session.execute(text("SELECT id, title, description FROM todo_cards")).all()
+    return [row[0] for row in rows
+            if all(any(part.startswith(word) for part in f"{row[1]} {row[2]}".lower().split()) for word in words)]
+
+
+def main():
+    rng = random.Random(0)
+    vocabulary = make_words(rng)
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+        with transaction():
+            todo_list = TodoListModel("list")
+        start = time.perf_counter()
+        with Session.bind.begin() as connection:
+            connection.execute(TodoCardModel.__table__.insert(), list(make_cards(rng, vocabulary, todo_list.id)))
+        print(f"{CARDS} cards inserted in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        search.add_search_index()
+        print(f"indexed the existing cards in {time.perf_counter() - start:.1f}s")
+
+        queries = [vocabulary[0], vocabulary[50], vocabulary[5000], vocabulary[19999], vocabulary[300][:3],
+                   f"{vocabulary[10]} {vocabulary[400]}"]
+        print(f"{'query':>24} | {'matches':>7} | {'fts5 top ' + str(LIMIT):>11} | {'fts5 all, unranked':>18} | {'python scan':>11} |")
+        results = {}
+        for query in queries:
+            top_time, top = timed(search.search, query, LIMIT)
+            all_time, matches = timed(search.search, query, None, False)
+            scan_time, scanned = timed(python_scan, query)
+            assert set(matches) == set(scanned) and set(top) <= set(matches), query
+            results[query] = matches
+            print(f"{query:>24} | {len(matches):7} | {top_time:9.2f}ms | {all_time:16.2f}ms | {scan_time:9.1f}ms |")
+
+        with transaction():
+            card = TodoCardModel(todo_list, "zzzunique new card", "", None)
+        assert search.search("zzzunique") == [card.id]
+        card.title = "yyyrenamed"
+        card.save()
+        assert search.search("zzzunique") == [] and search.search("yyyrenamed") == [card.id]
+        Session.delete(card)
+        Session.commit()
+        assert search.search("yyyrenamed") == []
+        print("insert, rename and delete kept the index current")
+
+        with Session.bind.begin() as connection:  # what's left without FTS5
+            connection.exec_driver_sql(f"DROP TABLE {search.FTS_TABLE}")
+            for trigger in ("insert", "delete", "update"):
+                connection.exec_driver_sql(f"DROP TRIGGER {search.FTS_TABLE}_{trigger}")
+        for query in queries[:3]:
+            like_time, matches = timed(search.search, query, None, False)
+            # LIKE matches inside words too, so it can find more
+            assert set(results[query]) <= set(matches), query
+            print(f"{query:>24} | LIKE fallback: {len(matches)} matches in {like_time:.1f}ms")
+        Session.bind.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Crashes the email checker in the middle of AccountIngester.flush(), after the cards were written but before they and
+the checkpoint are committed, and checks that no card is lost or duplicated. Each case uses a throwaway database and a
+mailbox of MESSAGES emails on benchmarks.fake_imap's local server, every SKIP_EVERY-th of them not from Classroom, and
+checking starts from the beginning (email_latest_message_uid = 0):
+    - "exit": the process dies with os._exit(), like a power cut or a kill
+    - "raise": flush() raises, so the checker rewinds to the saved checkpoint and carries on (or doesn't, for a flush
+      made by the timer, until it's restarted)
+at the first, second and last flush. After the crashing run, the cards must be exactly those of the Classroom emails up
+to the saved checkpoint. Then the checker is restarted, and after that there must be a card for each Classroom email,
+once, with the checkpoint at the newest message.
+
+It's the real TodoCardEmailChecker, adding cards to a real (offscreen) board, so the board is checked too: after a run
+that didn't die, it must show each saved card once, and none that were rolled back.
+
+Each run of the checker is its own process. Run from the project root:
+    QT_QPA_PLATFORM=offscreen python -m benchmarks.checkpoint_crash
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from PySide2 import QtWidgets
+from sqlalchemy import text
+
+from benchmarks.fake_imap import FakeIMAPServer, make_message
+from benchmarks.email_parsing import generate_classroom_email
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine
+from settings.models import Setting
+from todo_lists import email_checking
+from todo_lists.email_cards import TodoCardEmailChecker
+from todo_lists.models import TodoListModel
+from todo_lists.widgets import MainTodoWidget
+
+MESSAGES = 1200  # with CHECKPOINT_FLUSH_MESSAGES = 500: flushes after 500 and 1000 messages, then one by the timer
+SKIP_EVERY = 4
+CRASH_EXIT_CODE = 17
+RUN_TIMEOUT = 60  # seconds
+
+
+def mailbox():
+    """The same emails every time, so each run of the checker sees the same mailbox. Returns [(message id, message)]."""
+    rng = random.Random(0)
+    messages = []
+    for i in range(1, MESSAGES + 1):
+        message_id = f"<message-{i}@classroom.google.com>"
+        subject, body = generate_classroom_email(rng)
+        if i % SKIP_EVERY == 0:
+            messages.append((None, make_message("Lunch?", body, sender="Friend <friend@example.com>", message_id=message_id)))
+        else:
+            messages.append((message_id, make_message(subject, body, message_id=message_id)))
+    return messages
+
+
+class BoardTab:
+    """What TodoCardEmailChecker uses of main.py's MainTabWidget"""
+    def __init__(self):
+        self.todo_widget = MainTodoWidget()
+
+
+class CrashingChecker(TodoCardEmailChecker):
+    """Crashes on the crash_at-th flush"""
+    def __init__(self, board_tab, accounts, crash, crash_at):
+        super().__init__(board_tab, accounts)
+        self.CHECK_MODE = email_checking.CHECK_MODE_PUSH
+        self.crash = crash
+        self.crash_at = crash_at
+        self.flushes = 0
+
+    def on_new_emails(self, batch):
+        super().on_new_emails(batch)
+        self.flushes += 1
+        if self.flushes == self.crash_at:
+            Session.flush()  # the cards are in the database, not committed yet, and the checkpoint isn't saved
+            if self.crash == "exit":
+                os._exit(CRASH_EXIT_CODE)
+            raise RuntimeError("crash injected in flush()")
+
+
+async def run_checker(board_tab, crash, crash_at):
+    """Checks the mailbox until the checker has nothing left to do: idling, with nothing waiting to be committed"""
+    server = FakeIMAPServer()
+    await server.start()
+    for message_id, message in mailbox():
+        server.add_message(message)
+    checker = CrashingChecker(board_tab, [server.account()], crash, crash_at)
+    checker.start()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + RUN_TIMEOUT
+    while not (checker.ingesters and server.idling and checker.ingesters[0].pending_uid is None):
+        assert loop.time() < deadline, "the checker didn't finish"
+        await asyncio.sleep(0.05)
+    checker.stop()
+    try:
+        await checker.main_task
+    except asyncio.CancelledError:
+        pass
+    await server.close()
+
+
+def child(directory, crash, crash_at):
+    email_checking.logger.setLevel(logging.CRITICAL)  # the injected errors are expected
+    email_checking.RETRY_DELAY_MIN = 0.1
+    # parsed in process: os._exit() leaves parser pool workers running, blocked on a queue they hold both ends of
+    email_checking.BULK_PARSE_THRESHOLD = MESSAGES + 1
+    Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+    app = QtWidgets.QApplication([])  # noqa, the widgets need one
+    board_tab = BoardTab()
+    asyncio.run(run_checker(board_tab, crash, int(crash_at)))
+
+    shown = [card.model for list_widget in board_tab.todo_widget.lists.values() for card in list_widget.cards()]
+    with open(os.path.join(directory, "board.json"), "w") as f:
+        json.dump([card.source_message_id for card in shown], f)
+
+
+def run_child(directory, crash="none", crash_at=0):
+    """Runs the checker in a new process, without its output (the widgets print as cards are added)"""
+    return subprocess.run([sys.executable, "-m", "benchmarks.checkpoint_crash", "child", directory, crash, str(crash_at)],
+                          stdout=subprocess.DEVNULL, timeout=RUN_TIMEOUT * 2).returncode
+
+
+def saved_state(engine):
+    """(the message ids of the cards, the saved checkpoint)"""
+    with engine.connect() as connection:
+        cards = [row[0] for row in connection.execute(text("SELECT source_message_id FROM todo_cards"))]
+        checkpoint = connection.execute(text("SELECT value FROM settings WHERE name = 'email_latest_message_uid'")).scalar()
+    return cards, int(checkpoint)
+
+
+def shown_cards(directory):
+    """The message ids of the cards on the board when the last run ended, None if it didn't get to the end"""
+    path = os.path.join(directory, "board.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        shown = json.load(f)
+    os.remove(path)
+    return shown
+
+
+def check(engine, directory, classroom_ids, complete):
+    """(cards saved, the saved checkpoint, cards on the board or None)"""
+    cards, checkpoint = saved_state(engine)
+    expected = [message_id for message_id in classroom_ids[:checkpoint] if message_id is not None]
+    assert len(cards) == len(set(cards)), "duplicated cards"
+    assert set(cards) == set(expected), \
+        f"{len(set(expected) - set(cards))} cards missing and {len(set(cards) - set(expected))} past checkpoint {checkpoint}"
+    if complete:
+        assert checkpoint == MESSAGES, f"checkpoint at {checkpoint}, not {MESSAGES}"
+    shown = shown_cards(directory)
+    if shown is not None:
+        assert len(shown) == len(set(shown)), f"{len(shown) - len(set(shown))} cards shown twice on the board"
+        assert set(shown) == set(cards), \
+            f"{len(set(cards) - set(shown))} saved cards not on the board and {len(set(shown) - set(cards))} unsaved ones on it"
+    return len(cards), checkpoint, None if shown is None else len(shown)
+
+
+def case(crash, crash_at, classroom_ids):
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        engine = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            connection.execute(TodoListModel.__table__.insert().values(title="Assignments"))
+            connection.execute(Setting.__table__.insert().values(name="email_latest_message_uid", value="0"))
+            for name in ("Assignments List", "Materials List"):
+                connection.execute(Setting.__table__.insert().values(name=name, value="Assignments"))
+
+        code = run_child(directory, crash, crash_at)
+        assert code == (CRASH_EXIT_CODE if crash == "exit" else 0), f"exit code {code}"
+        crashed = check(engine, directory, classroom_ids, complete=False)
+        assert run_child(directory) == 0
+        restarted = check(engine, directory, classroom_ids, complete=True)
+        engine.dispose()
+    board = "     -" if crashed[2] is None else f"{crashed[2]:6}"
+    print(f"{crash:>5} at flush {crash_at}: after the crash {crashed[0]:4} cards, checkpoint {crashed[1]:4}, {board} on "
+          f"the board | after a restart {restarted[0]:4} cards, checkpoint {restarted[1]:4}, {restarted[2]:4} on the board")
+
+
+def main():
+    classroom_ids = [message_id for message_id, message in mailbox()]
+    print(f"{MESSAGES} messages, {sum(1 for i in classroom_ids if i is not None)} from Classroom")
+    for crash in ("exit", "raise"):
+        for crash_at in (1, 2, 3):
+            case(crash, crash_at, classroom_ids)
+    print("no card lost or duplicated")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["child"]:
+        child(*sys.argv[2:5])
+    else:
+        main()
@@ -0,0 +1,112 @@
+"""
+Counts the commits a few ui actions make, the way they used to run (every save() commits straight away) and with
+transaction() around them and unchanged saves skipped. The actions call the same model methods their widgets do,
+since the widgets themselves need a running QApplication.
+
+Run from the project root:
+    python -m benchmarks.commits_per_action [cards in the list]
+"""
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import event
+
+import project_sqlalchemy_globals
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine
+from settings import models as settings_models
+from settings.models import Setting
+from todo_lists import models as todo_models
+from todo_lists.models import TodoListModel, TodoCardModel, TodoLabelModel
+
+SETTINGS = 20
+
+
+def drag_card_to_top(transaction, source, destination):
+    """TodoListWidget.dropEvent: remove_card() from the old list, then add_card() at the top of the new one"""
+    with transaction():
+        card = source.cards[-1]
+        source.remove_card(card)
+        with transaction():
+            card.position = 1
+            card.save()
+            for other in destination.cards:
+                if other.position >= card.position:
+                    other.position += 1
+                    other.save()
+            destination.add_card(card)
+
+
+def rename_list_unchanged(transaction, todo_list):
+    """TodoListWidget.set_title() when focus leaves the title without it being edited"""
+    todo_list.title = todo_list.title
+    todo_list.save()
+
+
+def save_settings_unchanged(transaction, settings):
+    """SettingsWidget.save() when only one setting was changed"""
+    with transaction():
+        for i, setting in enumerate(settings):
+            setting.set_value(setting.value if i else f"{setting.value}!")
+
+
+def create_card(transaction, todo_list):
+    """CardDialog.save() for a new card with a label"""
+    with transaction():
+        label = TodoLabelModel.get_or_create("Biology", "#00FF00")
+        card = TodoCardModel(None, "Lab report", "", None, position=len(todo_list.cards) + 1, labels=[label])
+        todo_list.add_card(card)
+
+
+@contextlib.contextmanager
+def old_behaviour():
+    """Models commit on every save() again, and transaction() does nothing"""
+    patched = [(settings_models, "commit"), (todo_models, "commit")]
+    originals = [getattr(module, name) for module, name in patched]
+    for module, name in patched:
+        setattr(module, name, Session.commit)
+    try:
+        yield contextlib.nullcontext
+    finally:
+        for (module, name), original in zip(patched, originals):
+            setattr(module, name, original)
+
+
+def main(card_count=20):
+    commits = {"count": 0}
+
+    @event.listens_for(Session, "after_commit")
+    def count_commit(session):
+        commits["count"] += 1
+
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+
+        source, destination = TodoListModel("To-Do"), TodoListModel("Doing")
+        for todo_list in (source, destination):
+            for i in range(card_count):
+                todo_list.add_card(TodoCardModel(None, f"card {i}", "", None, position=i + 1))
+        settings = [Setting.get_or_create(f"setting {i}", "value") for i in range(SETTINGS)]
+
+        actions = (("drag a card to the top of a list", lambda t: drag_card_to_top(t, source, destination)),
+                   ("leave a list title unchanged", lambda t: rename_list_unchanged(t, source)),
+                   (f"save settings, 1 of {SETTINGS} changed", lambda t: save_settings_unchanged(t, settings)),
+                   ("create a card with a label", lambda t: create_card(t, destination)))
+        print(f"{card_count} cards per list")
+        for name, action in actions:
+            results = []
+            for mode in ("old", "new"):
+                with (old_behaviour() if mode == "old" else contextlib.nullcontext(project_sqlalchemy_globals.transaction)) as transaction:
+                    commits["count"] = 0
+                    start = time.perf_counter()
+                    action(transaction)
+                    results.append(f"{mode}: {commits['count']:3} commits {(time.perf_counter() - start) * 1000:7.1f}ms")
+            print(f"{name:>36} | {' | '.join(results)}")
+        Session.bind.dispose()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,74 @@
+"""
+Checks todo_lists.deadlines.DeadlineScheduler on a plain asyncio loop:
+    - CARDS due dates whose "due soon" and "overdue" transitions all happen within the next few seconds; every
+      callback has to come on time (within LATE_LIMIT) and the loop should wake up about once per distinct transition
+      time, not once per card
+    - how long watching and unwatching CARDS cards takes
+    - with only far off due dates, the loop doesn't wake up at all
+The old DueDateDisplay kept a task per card, each waking every 5000s, so an overdue card could wait that long.
+
+Run from the project root:
+    python -m benchmarks.deadline_scheduler
+"""
+import asyncio
+import datetime
+import random
+import time
+
+from benchmarks.idle_wakeups import count_wakeups
+from todo_lists import deadlines
+
+CARDS = 10000
+SPREAD = 3  # seconds the transitions are spread over
+LATE_LIMIT = 0.05  # seconds
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    rng = random.Random(0)
+    scheduler = deadlines.DeadlineScheduler()
+
+    now = datetime.datetime.now()
+    # half become due soon within SPREAD, the other half are already due soon and become overdue within it
+    due_dates = [now + datetime.timedelta(seconds=0.5 + round(rng.uniform(0, SPREAD), 2)) + (deadlines.SOON if i % 2 else datetime.timedelta())
+                 for i in range(CARDS)]
+    lateness = []
+
+    def callback(due_date, state):
+        expected = due_date if state == deadlines.STATE_OVERDUE else due_date - deadlines.SOON
+        lateness.append((datetime.datetime.now() - expected).total_seconds())
+
+    start = time.perf_counter()
+    for i, due_date in enumerate(due_dates):
+        scheduler.watch(i, due_date, lambda state, due_date=due_date: callback(due_date, state))
+    watch_time = time.perf_counter() - start
+
+    counter = count_wakeups(loop)
+    loop.run_until_complete(asyncio.sleep(SPREAD + 1))
+    transition_times = len({due_date for due_date in due_dates})
+    print(f"{CARDS} cards: watched in {watch_time * 1000:.1f}ms, {len(lateness)} callbacks, "
+          f"{counter['wakeups']} wakeups for {transition_times} distinct transition times, "
+          f"latest callback {max(lateness) * 1000:.1f}ms late")
+    assert len(lateness) == CARDS and max(lateness) < LATE_LIMIT and min(lateness) >= 0
+
+    start = time.perf_counter()
+    for i in range(CARDS):
+        scheduler.unwatch(i)
+    print(f"unwatched in {(time.perf_counter() - start) * 1000:.1f}ms, heap left: {len(scheduler.heap)}")
+
+    for i in range(CARDS):
+        scheduler.watch(i, now + datetime.timedelta(days=30 + i), lambda state: None)
+    counter["wakeups"] = 0
+    loop.run_until_complete(asyncio.sleep(2))
+    loop.close()
+
+    empty_loop = asyncio.new_event_loop()  # what the sleep costs by itself
+    empty_counter = count_wakeups(empty_loop)
+    empty_loop.run_until_complete(asyncio.sleep(2))
+    empty_loop.close()
+    print(f"far off due dates only: {counter['wakeups']} wakeups in 2s, an empty loop: {empty_counter['wakeups']}")
+
+
+if __name__ == "__main__":
+    main()
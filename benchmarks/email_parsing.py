@@ -0,0 +1,192 @@
+"""
+Compares todo_lists.email_checking.parse_classroom_email against the old split()-based parser on synthetic Classroom
+notification emails, checking they agree and reporting messages per second and peak bytes allocated per message.
+
+Then parses the same emails, still transfer encoded like they're fetched, with EmailChecker.parse_raw_emails(): in
+process, and in its pool of worker processes with 1, 2, 4... up to one per core (in a throwaway database, for the
+checker's settings). The pool's first batch includes starting the workers, so it's timed separately.
+
+Run from the project root:
+    python -m benchmarks.email_parsing [message count]
+"""
+import asyncio
+import base64
+import datetime
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine
+from todo_lists import email_checking
+
+POOL_RUNS = 3
+
+TEACHERS = ("Ms. Smith", "Mr. Johnson", "Dr. Nguyen", "Mrs. O'Brien")
+CLASSES = ("Biology", "AP Calculus BC", "English 10 - Period 3", "US History")
+WORDS = ("read", "chapter", "the", "essay", "worksheet", "lab", "report", "submit", "questions", "page", "notes",
+         "due", "before", "class", "group", "project", "review")
+
+
+def generate_classroom_email(rng):
+    """Returns (subject, text/plain body) shaped like a Google Classroom "New assignment"/"New material" email"""
+    classroom_type = rng.choice(("assignment", "material"))
+    course_id = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(16))
+    title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8))).capitalize()
+    if rng.random() < 0.2:
+        title = title.replace(" ", "  ", 2)  # classroom keeps doubled spaces, the parser collapses them
+    description = "\r\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+                              for _ in range(rng.randint(0, 30)))
+
+    subject = f'New {classroom_type}: "{title}"'
+
+    lines = [f"{rng.choice(TEACHERS)} posted a new {classroom_type} in {rng.choice(CLASSES)} "
+             f"<https://classroom.google.com/c/{course_id}>.", ""]
+    if classroom_type == "assignment" and rng.random() < 0.8:
+        lines.append(f"Due: {datetime.date(2021, rng.randint(1, 12), rng.randint(1, 28)).strftime('%b %d')}")
+    lines += [title, description, rng.choice(("OPEN  ", "Open  ")),
+              f"<https://classroom.google.com/c/{course_id}/a/{rng.randint(10 ** 9, 10 ** 10)}/details>",
+              "", "Google LLC 1600 Amphitheatre Parkway, Mountain View, CA 94043 USA", ""]
+    return subject, "\r\n".join(lines)
+
+
+def generate_classroom_emails(count, seed=0):
+    rng = random.Random(seed)
+    return [generate_classroom_email(rng) for _ in range(count)]
+
+
+def old_parse_classroom_email(subject, text):
+    """The parser as it was before it was rewritten, kept here as the baseline"""
+    logger = email_checking.logger
+    logger.info(f'Generating card for: Subject: {subject}')
+    logger.debug(f"!!DEBUG{'=' * 100}")
+
+    text = text.replace("\r", "")
+    logger.debug(f"original text: \n {text}")
+
+    classroom_type = subject.split(" ")[1].lower().replace(":", "")
+
+    logger.debug(f"classroom_type: {classroom_type}")
+    og_title = subject.split('"', 1)[1][:-1].replace("\r", "").replace("\n ", "\n")
+    title = " ".join(og_title.split(' ')).replace("\n", "")
+    while "  " in title:
+        title = title.replace("  ", " ")
+    title = title[:-1] if title.endswith(" ") else title
+    title = title[1:] if title.startswith(" ") else title
+    logger.debug(f"title: {[title]}, {title.split(' ')}, {title.endswith(' ')}\nog_title: {[og_title]}")
+
+    subject_label = text.split("<https://classroom.google.com/c/")[0].split(f" posted a new {classroom_type} in ")[1]
+    logger.debug([f"subject_label: {subject_label}"])
+
+    try:
+        url = "https://classroom.google.com/c/{}".format(
+            text.split("\nOPEN  \n<https://classroom.google.com/c/")[1].split("/details>\n")[0])
+    except IndexError:
+        url = "https://classroom.google.com/c/{}".format(
+            text.split("\nOpen  \n<https://classroom.google.com/c/")[1].split("/details>\n")[0])
+    logger.debug(f"url: {url}")
+    logger.debug(f"text.split(title) debug: {text.split(title), len(text.split(title)), title in text, type(text)}")
+    try:
+        description = text.split(og_title)[1].split("\nOPEN  \n<https://classroom.google.com/c/")[0].split(
+            "\nOpen  \n<https://classroom.google.com/c/")[0]
+    except IndexError:
+        description = text.split(title)[1].split("\nOPEN  \n<https://classroom.google.com/c/")[0].split(
+            "\nOpen  \n<https://classroom.google.com/c/")[0]
+
+    description = f"{url}\n\n{description}".replace("\n", "<br>")
+    logger.debug(f"description: {description}")
+
+    date = None
+    if classroom_type == "assignment":
+        try:
+            date = text.split(">.\n\n")[1].split(f"\n{title}")[0].replace("Due: ", "").replace(
+                "New assignment Due ", "")
+            date = datetime.datetime.strptime(date, "%b %d")
+            # If the date is in or past Jan, but before Sep, year is increased by 1
+            date = date.replace(
+                year=datetime.datetime.now().year + 1 if 9 > date.month >= 1 else datetime.datetime.now().year)
+        except ValueError:
+            date = None
+
+    logger.debug(f"date: {date}")
+    logger.debug(f"!!END_DEBUG{'=' * 100}\n\n")
+    return {"type": classroom_type, "title": title, "subject": subject_label, "date": date, "description": description}
+
+
+def measure(parse, emails):
+    start = time.perf_counter()
+    for subject, text in emails:
+        parse(subject, text)
+    elapsed = time.perf_counter() - start
+
+    total_peak = 0
+    for subject, text in emails:
+        tracemalloc.start()  # a fresh start per message resets the peak, tracemalloc.reset_peak() needs python 3.9
+        parse(subject, text)
+        total_peak += tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return len(emails) / elapsed, total_peak / len(emails)
+
+
+def worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    return counts + [cores] if cores > 1 else counts
+
+
+async def measure_pool(checker, jobs, workers):
+    """Returns (messages/s of the first batch, including starting the workers, messages/s after that)"""
+    checker.parser_workers = workers
+    start = time.perf_counter()
+    expected = await checker.parse_raw_emails(jobs)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(POOL_RUNS):
+        assert await checker.parse_raw_emails(jobs) == expected
+    warm = (time.perf_counter() - start) / POOL_RUNS
+    checker.shutdown_parser_pool()
+    return len(jobs) / cold, len(jobs) / warm
+
+
+def compare_pool(emails):
+    jobs = [(subject, base64.b64encode(text.encode()), b"base64", "utf-8") for subject, text in emails]
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+        checker = email_checking.EmailChecker(accounts=[])
+
+        start = time.perf_counter()
+        in_process = email_checking.parse_raw_classroom_emails(jobs)
+        print(f"\n{os.cpu_count()} cores, parse_raw_emails() on {len(jobs)} messages")
+        print(f"in process:   {len(jobs) / (time.perf_counter() - start):10.0f} messages/s")
+        for workers in worker_counts():
+            cold, warm = asyncio.run(measure_pool(checker, jobs, workers))
+            print(f"{workers:3} workers:  {warm:10.0f} messages/s ({cold:.0f} messages/s for the first batch)")
+        assert asyncio.run(checker.parse_raw_emails(jobs[:email_checking.BULK_PARSE_THRESHOLD - 1])) \
+            == in_process[:email_checking.BULK_PARSE_THRESHOLD - 1]
+        Session.bind.dispose()
+
+
+def main(count=5000):
+    email_checking.logger.setLevel(logging.WARNING)  # measure parsing, not printing
+    emails = generate_classroom_emails(count)
+
+    for subject, text in emails:
+        old, new = old_parse_classroom_email(subject, text), email_checking.parse_classroom_email(subject, text)
+        assert old == new, f"parsers disagree on {subject!r}:\n{old}\n{new}"
+    print(f"Both parsers agree on all {count} messages\n")
+
+    for name, parse in (("old", old_parse_classroom_email), ("new", email_checking.parse_classroom_email)):
+        per_second, peak = measure(parse, emails)
+        print(f"{name}: {per_second:10.0f} messages/s | {peak / 1024:8.1f} KiB peak allocation per message")
+
+    compare_pool(emails)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
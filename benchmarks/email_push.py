@@ -0,0 +1,115 @@
+"""
+Runs the real EmailChecker against benchmarks.fake_imap's local server, in a throwaway database, and checks how it
+waits for new mail:
+    - IDLE: once caught up it sits in IDLE, sending nothing while the inbox is quiet, and a message is picked up as
+      soon as the server announces it with EXISTS
+    - a server without the IDLE capability: the checker falls back to polling, backing off from POLL_INTERVAL_MIN
+      while the inbox is quiet, and goes back to the shortest interval once a message arrives
+For each it prints the requests sent while quiet and how long a new message took to be fetched and to become a card
+(which includes the CHECKPOINT_FLUSH_INTERVAL the checker waits to commit cards together).
+
+Run from the project root:
+    python -m benchmarks.email_push [quiet seconds]
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+
+from benchmarks.email_parsing import generate_classroom_email
+from benchmarks.fake_imap import FakeIMAPServer, make_message
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine
+from todo_lists import email_checking
+
+START_TIMEOUT = 5  # seconds to catch up and start waiting
+
+
+class RecordingChecker(email_checking.EmailChecker):
+    """Keeps the titles of the cards it would make, and when"""
+    def __init__(self, accounts):
+        super().__init__(accounts)
+        self.CHECK_MODE = email_checking.CHECK_MODE_PUSH
+        self.cards = []  # [(loop time, title)]
+
+    def on_new_assignment(self, title, **kwargs):
+        self.cards.append((asyncio.get_running_loop().time(), title))
+
+    def on_new_material(self, title, **kwargs):
+        self.cards.append((asyncio.get_running_loop().time(), title))
+
+
+async def wait_for(condition, timeout):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            raise TimeoutError("timed out")
+        await asyncio.sleep(0.01)
+
+
+async def deliver(server, checker, rng, timeout):
+    """Adds a Classroom email and waits for its card. Returns (ms until the server was asked for it, ms until the card)."""
+    loop = asyncio.get_running_loop()
+    cards, start = len(checker.cards), loop.time()
+    server.add_message(make_message(*generate_classroom_email(rng)))
+    await wait_for(lambda: len(checker.cards) > cards, timeout)
+    fetched = min(when for when, command in server.commands if command == "UID FETCH" and when >= start)
+    return (fetched - start) * 1000, (checker.cards[-1][0] - start) * 1000
+
+
+async def run(idle, quiet):
+    rng = random.Random(0)
+    loop = asyncio.get_running_loop()
+    server = FakeIMAPServer(idle=idle)
+    await server.start()
+    checker = RecordingChecker([server.account(checkpoint_suffix=":idle" if idle else ":polling")])
+    checker.start()
+    try:
+        if idle:
+            await wait_for(lambda: server.idling, START_TIMEOUT)
+        else:
+            await wait_for(lambda: server.count("UID SEARCH") > 0, START_TIMEOUT)
+
+        quiet_start = loop.time()
+        await asyncio.sleep(quiet)
+        requests = sum(1 for when, command in server.commands if when >= quiet_start)
+        searches = server.count("UID SEARCH", quiet_start)
+
+        if idle:
+            assert requests == 0, f"sent {requests} requests while idling"
+            fetched, card = await deliver(server, checker, rng, 1 + email_checking.CHECKPOINT_FLUSH_INTERVAL)
+            print(f"IDLE:    {requests} requests in {quiet:.0f}s quiet | new message fetched after {fetched:6.1f}ms, "
+                  f"card after {card:6.1f}ms")
+        else:
+            fixed = int(quiet / email_checking.POLL_INTERVAL_MIN)
+            assert searches < fixed / 2, f"{searches} checks in {quiet}s, it isn't backing off"
+            fetched, card = await deliver(server, checker, rng, email_checking.POLL_INTERVAL_MAX + 1)
+            # right after a message the interval is back to the shortest
+            reset_fetched, reset_card = await deliver(server, checker, rng, 2 * email_checking.POLL_INTERVAL_MIN + 1)
+            print(f"polling: {searches} checks in {quiet:.0f}s quiet (every {email_checking.POLL_INTERVAL_MIN}s would be "
+                  f"{fixed}) | new message fetched after {fetched:6.1f}ms, card after {card:6.1f}ms | the next one "
+                  f"fetched after {reset_fetched:6.1f}ms")
+        assert len(checker.cards) == len(server.messages)
+    finally:
+        checker.stop()
+        try:
+            await checker.main_task
+        except asyncio.CancelledError:
+            pass
+        await server.close()
+
+
+def main(quiet=16.0):
+    email_checking.logger.setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+        asyncio.run(run(True, quiet))
+        asyncio.run(run(False, quiet))
+        Session.bind.dispose()
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,180 @@
+"""
+A local IMAP server, on asyncio streams, for running the real email checker against. It knows just the commands
+todo_lists.aioimap sends (LOGIN, CAPABILITY, SELECT/EXAMINE, NOOP, UID SEARCH, UID FETCH, FETCH, IDLE, LOGOUT) and
+keeps its mailbox in memory. add_message() announces the new message with EXISTS to every connection that's idling, like
+a real server. With idle=False it doesn't advertise IDLE, so the checker has to fall back to polling.
+
+    server = FakeIMAPServer(idle=True)
+    await server.start()
+    checker = SomeEmailChecker(accounts=[server.account()])
+"""
+import asyncio
+import email.mime.multipart
+import email.mime.text
+import email.utils
+import re
+
+from todo_lists.email_checking import EmailAccount
+
+CLASSROOM_SENDER = "Google Classroom <no-reply@classroom.google.com>"
+
+_UID_RANGE_RE = re.compile(r'UID (\d+):(\d+|\*)(?: FROM "([^"]*)")?', re.IGNORECASE)
+_SECTION_RE = re.compile(r"BODY\.PEEK\[([^\]]*)\]", re.IGNORECASE)
+
+
+def make_message(subject, text, sender=CLASSROOM_SENDER, message_id=None):
+    """An email shaped like Classroom's: text/plain (base64, as utf-8 text is by default) and an html alternative"""
+    message = email.mime.multipart.MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = sender
+    message["Date"] = email.utils.formatdate()
+    message["Message-ID"] = message_id or email.utils.make_msgid(domain="classroom.google.com")
+    message.attach(email.mime.text.MIMEText(text, "plain", "utf-8"))
+    message.attach(email.mime.text.MIMEText(f"<html><body><pre>{text}</pre></body></html>", "html", "utf-8"))
+    return message
+
+
+def body_structure(message):
+    if message.is_multipart():
+        return f'({"".join(body_structure(part) for part in message.get_payload())} "{message.get_content_subtype().upper()}")'
+    payload = message.get_payload().encode()
+    lines = payload.count(b"\n")
+    return (f'("{message.get_content_maintype().upper()}" "{message.get_content_subtype().upper()}" '
+            f'("CHARSET" "{message.get_content_charset() or "us-ascii"}") NIL NIL '
+            f'"{(message["Content-Transfer-Encoding"] or "7bit").upper()}" {len(payload)} {lines})')
+
+
+def body_section(message, section):
+    if section.upper().startswith("HEADER.FIELDS"):
+        names = section[section.index("(") + 1:section.rindex(")")].split()
+        return "".join(f"{name}: {message[name]}\r\n" for name in names if message[name] is not None).encode() + b"\r\n"
+    part = message
+    for number in section.split("."):
+        part = part.get_payload()[int(number) - 1]
+    return part.get_payload().encode()  # still transfer encoded, like a server sends it
+
+
+class FakeIMAPServer:
+    def __init__(self, idle=True, uidvalidity=1, password="password"):
+        self.idle = idle
+        self.uidvalidity = uidvalidity
+        self.password = password
+        self.messages = []  # [(uid, email.message.Message)], in uid order
+        self.next_uid = 1
+        self.idling = set()  # writers of connections in IDLE
+        self.commands = []  # (loop time, command name) of every command received, for counting requests
+        self.connections = {}  # {writer: task handling it}
+        self.server = None
+        self.port = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        for writer in self.connections:
+            writer.close()
+        await asyncio.gather(*self.connections.values(), return_exceptions=True)
+        await self.server.wait_closed()
+
+    def account(self, address="student@example.com", checkpoint_suffix=""):
+        return EmailAccount(address, self.password, "127.0.0.1", self.port, use_ssl=False,
+                            checkpoint_suffix=checkpoint_suffix)
+
+    def add_message(self, message):
+        """Adds message to the inbox and tells idling connections. Returns its uid."""
+        uid = self.next_uid
+        self.next_uid += 1
+        self.messages.append((uid, message))
+        for writer in self.idling:
+            writer.write(f"* {len(self.messages)} EXISTS\r\n".encode())
+        return uid
+
+    def count(self, name, since=0.0):
+        return sum(1 for when, command in self.commands if command == name and when >= since)
+
+    async def handle(self, reader, writer):
+        self.connections[writer] = asyncio.current_task()
+        writer.write(b"* OK fake IMAP server ready\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                tag, command, args = (line.decode().rstrip("\r\n").split(" ", 2) + ["", ""])[:3]
+                command = command.upper()
+                if command == "UID":
+                    command, args = (f"UID {args}".split(" ", 2) + [""])[1:3]
+                    command = f"UID {command.upper()}"
+                self.commands.append((asyncio.get_running_loop().time(), command))
+                if not await self.respond(reader, writer, tag, command, args):
+                    break
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.idling.discard(writer)
+            self.connections.pop(writer, None)
+            writer.close()
+
+    async def respond(self, reader, writer, tag, command, args):
+        """Answers one command. Returns False once the connection should be closed."""
+        if command == "LOGIN":
+            if not args.endswith(f'"{self.password}"'):
+                writer.write(f"{tag} NO [AUTHENTICATIONFAILED] Invalid credentials\r\n".encode())
+                return True
+        elif command == "CAPABILITY":
+            writer.write(f"* CAPABILITY IMAP4rev1{' IDLE' if self.idle else ''}\r\n".encode())
+        elif command in ("SELECT", "EXAMINE"):
+            writer.write(f"* {len(self.messages)} EXISTS\r\n* OK [UIDVALIDITY {self.uidvalidity}] UIDs valid\r\n"
+                         f"* OK [UIDNEXT {self.next_uid}] Predicted next UID\r\n".encode())
+        elif command == "UID SEARCH":
+            writer.write(("* SEARCH" + "".join(f" {uid}" for uid in self.search(args)) + "\r\n").encode())
+        elif command == "UID FETCH":
+            uids, items = args.split(" ", 1)
+            wanted = {int(uid) for uid in uids.split(",")}
+            for seq, (uid, message) in enumerate(self.messages, 1):
+                if uid in wanted:
+                    self.write_fetch(writer, seq, uid, message, items)
+        elif command == "FETCH":
+            seq = int(args.split(" ", 1)[0])
+            writer.write(f"* {seq} FETCH (UID {self.messages[seq - 1][0]})\r\n".encode())
+        elif command == "IDLE" and self.idle:
+            writer.write(b"+ idling\r\n")
+            await writer.drain()
+            self.idling.add(writer)
+            try:
+                done = await reader.readline()
+            finally:
+                self.idling.discard(writer)
+            if not done:
+                return False
+        elif command == "LOGOUT":
+            writer.write(f"* BYE logging out\r\n{tag} OK LOGOUT completed\r\n".encode())
+            return False
+        elif command != "NOOP":
+            writer.write(f"{tag} BAD unknown command {command}\r\n".encode())
+            return True
+        writer.write(f"{tag} OK {command} completed\r\n".encode())
+        return True
+
+    def search(self, criteria):
+        match = _UID_RANGE_RE.search(criteria)
+        first = int(match.group(1))
+        last = self.next_uid - 1 if match.group(2) == "*" else int(match.group(2))
+        uids = [uid for uid, message in self.messages
+                if first <= uid <= last and (match.group(3) is None or match.group(3) in (message["From"] or ""))]
+        if not uids and match.group(2) == "*" and self.messages:
+            uids = [self.messages[-1][0]]  # "n:*" always matches the newest message
+        return uids
+
+    @staticmethod
+    def write_fetch(writer, seq, uid, message, items):
+        parts = [f"* {seq} FETCH (UID {uid}".encode()]
+        if "BODYSTRUCTURE" in items.upper():
+            parts.append(f" BODYSTRUCTURE {body_structure(message)}".encode())
+        for section in _SECTION_RE.findall(items):
+            data = body_section(message, section)
+            parts.append(f" BODY[{section}] {{{len(data)}}}\r\n".encode() + data)
+        writer.write(b"".join(parts) + b")\r\n")
@@ -0,0 +1,74 @@
+"""
+Counts how often the event loop wakes up while the real EmailChecker has nothing to do, run against
+benchmarks.fake_imap's local server in a throwaway database:
+    - caught up and sitting in IDLE, which should cost no wakeups at all until the server announces a message
+    - against a server without IDLE, polling with back-off, for comparison
+The checker and the server share the loop, like the checker shares the qt loop with the gui. For reference, the
+checker used to poll a queue.Queue every 300ms, ~3.3 wakeups/s whether or not anything arrived.
+
+Run from the project root:
+    python -m benchmarks.idle_wakeups [seconds]
+"""
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+
+from benchmarks.email_push import RecordingChecker, wait_for, START_TIMEOUT
+from benchmarks.fake_imap import FakeIMAPServer
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine
+from todo_lists import email_checking
+
+
+def count_wakeups(loop):
+    """Patches the loop's selector so every return from select() (one loop iteration) is counted"""
+    counter = {"wakeups": 0}
+    select = loop._selector.select  # noqa
+
+    def counting_select(timeout=None):
+        events = select(timeout)
+        counter["wakeups"] += 1
+        return events
+
+    loop._selector.select = counting_select  # noqa
+    return counter
+
+
+async def measure(idle, seconds):
+    counter = count_wakeups(asyncio.get_running_loop())
+    server = FakeIMAPServer(idle=idle)
+    await server.start()
+    checker = RecordingChecker([server.account(checkpoint_suffix=":idle" if idle else ":polling")])
+    checker.start()
+    try:
+        if idle:
+            await wait_for(lambda: server.idling, START_TIMEOUT)
+        else:
+            await wait_for(lambda: server.count("UID SEARCH") > 0, START_TIMEOUT)
+        await asyncio.sleep(0.1)  # let the last responses settle
+        start = counter["wakeups"]
+        await asyncio.sleep(seconds)
+        return (counter["wakeups"] - start - 2) / seconds  # not the two that end the sleep: its timer, then this task
+    finally:
+        checker.stop()
+        try:
+            await checker.main_task
+        except asyncio.CancelledError:
+            pass
+        await server.close()
+
+
+def main(seconds=10):
+    email_checking.logger.setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+        idle = asyncio.run(measure(True, seconds))
+        polling = asyncio.run(measure(False, seconds))
+        Session.bind.dispose()
+    print(f"idle wakeups/s over {seconds}s | in IDLE: {idle:.2f} | polling with back-off: {polling:.2f}")
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,132 @@
+"""
+Compares a card's labels as the old LabelContainer (a frame and layout per row of five, and a frame with its own
+stylesheet per label and per padding spacer) with TodoCardWidget.LabelStrip, which paints them all itself:
+    - that they look the same: both are grabbed for 1 to MAX_LABELS labels and compared pixel by pixel
+    - building CARDS of each, laid out and painted: the time, QObjects per card and how much the process' memory grew
+
+Run from the project root (QT_QPA_PLATFORM=offscreen works without a display):
+    python -m benchmarks.label_strip
+Memory is read from /proc/self/status, so it's only printed on linux.
+"""
+import gc
+import random
+import time
+from types import SimpleNamespace
+
+from PySide2 import QtWidgets, QtCore, QtGui
+
+from benchmarks.card_rendering import rss_kb
+from todo_lists.widgets import TodoCardWidget
+
+CARDS = 1000
+MAX_LABELS = 15
+WIDTH = 200  # the labels' width in a TodoCardWidget
+
+
+class OldLabelContainer(QtWidgets.QFrame):
+    """TodoCardWidget.LabelContainer as it was"""
+    def __init__(self, labels, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.setLayout(QtWidgets.QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+
+        last = 0
+        for i in range(5, len(labels), 5):
+            a = QtWidgets.QFrame()
+            a.setLayout(QtWidgets.QHBoxLayout())
+            a.layout().setContentsMargins(0, 0, 0, 0)
+
+            for label in labels[last:i]:
+                a.layout().addWidget(self.CardLabelWidget(label))
+            last = i
+            self.layout().addWidget(a)
+
+        a = QtWidgets.QFrame()
+        a.setLayout(QtWidgets.QHBoxLayout())
+        a.layout().setContentsMargins(0, 0, 0, 0)
+        for label in labels[last:len(labels)]:
+            a.layout().addWidget(self.CardLabelWidget(label))
+
+        while a.layout().count() != 5:
+            a.layout().addWidget(self.CardLabelSpacer())
+        self.layout().addWidget(a)
+
+    class CardLabelWidget(QtWidgets.QFrame):
+        def __init__(self, label, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.setStyleSheet(f"background-color: {label.color}; border-radius: 4px;")
+            self.setFixedWidth(32)
+            self.setFixedHeight(8)
+
+    class CardLabelSpacer(QtWidgets.QFrame):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.setStyleSheet(f"background-color: rgba(0, 0, 0, 0)")
+            self.setFixedWidth(32)
+            self.setFixedHeight(8)
+
+
+def make_labels(rng, count):
+    return [SimpleNamespace(color=f"#{rng.randrange(0x1000000):06X}") for _ in range(count)]
+
+
+def grab(strip):
+    strip.setFixedWidth(WIDTH)
+    strip.resize(strip.sizeHint())
+    return strip.grab().toImage()
+
+
+def compare(rng):
+    different = []
+    for count in range(1, MAX_LABELS + 1):
+        labels = make_labels(rng, count)
+        old, new = OldLabelContainer(labels), TodoCardWidget.LabelStrip(labels)
+        old_image, new_image = grab(old), grab(new)
+        if old_image.size() != new_image.size():
+            different.append(f"{count} labels: {old_image.width()}x{old_image.height()} vs {new_image.width()}x{new_image.height()}")
+            continue
+        pixels = sum(old_image.pixel(x, y) != new_image.pixel(x, y)
+                     for x in range(old_image.width()) for y in range(old_image.height()))
+        if pixels:
+            different.append(f"{count} labels: {pixels} pixels differ")
+        old.deleteLater()
+        new.deleteLater()
+    return different
+
+
+def build(app, strip_class, label_sets):
+    gc.collect()
+    app.processEvents()
+    rss_before = rss_kb()
+    start = time.perf_counter()
+    holder = QtWidgets.QWidget()
+    holder.setLayout(QtWidgets.QVBoxLayout())
+    for labels in label_sets:
+        strip = strip_class(labels)
+        strip.setFixedWidth(WIDTH)
+        holder.layout().addWidget(strip)
+    holder.grab()  # the first layout and paint
+    elapsed = time.perf_counter() - start
+    rss_after = rss_kb()
+    objects = len(holder.findChildren(QtCore.QObject)) - 1  # not the layout
+    holder.deleteLater()
+    app.processEvents()
+    memory = f"{(rss_after - rss_before) / 1024:6.1f}MB" if rss_before is not None else "     ?"
+    return f"{elapsed * 1000:8.1f}ms {objects / len(label_sets):5.1f} QObjects per card {memory}"
+
+
+def main():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    rng = random.Random(0)
+    different = compare(rng)
+    print(f"1-{MAX_LABELS} labels: {'identical' if not different else ', '.join(different)}")
+
+    label_sets = [make_labels(rng, rng.randint(1, MAX_LABELS)) for _ in range(CARDS)]
+    print(f"{CARDS} cards, {sum(map(len, label_sets)) / CARDS:.1f} labels each on average")
+    print(f"LabelStrip:       {build(app, TodoCardWidget.LabelStrip, label_sets)}")  # first, so the old ones' memory isn't counted against it
+    print(f"old LabelContainer: {build(app, OldLabelContainer, label_sets)}")
+
+
+if __name__ == "__main__":
+    main()
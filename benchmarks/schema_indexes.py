@@ -0,0 +1,99 @@
+"""
+Shows the query plans and timings of the hot lookups (label by name, list by title, a list's cards in order, a label's
+cards, cards due soon) on a board of generated cards, without the indexes added in todo_lists.models and with them.
+
+Run from the project root:
+    python -m benchmarks.schema_indexes [card count ...]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from project_sqlalchemy_globals import Base, create_sqlite_engine
+from todo_lists import models  # noqa, registers the tables
+
+NEW_INDEXES = ("ix_todo_cards_list_id_position", "ix_todo_cards_due_date", "ix_todo_card_labels_m2m_label_id",
+               "ix_todo_labels_name", "ix_todo_lists_title")
+CARDS_PER_LIST = 200
+CARDS_PER_LABEL = 100
+REPEATS = 200
+
+QUERIES = {
+    "label by name": ("SELECT * FROM todo_labels WHERE name = :name", lambda rng, n: {"name": f"label {rng.randrange(n // CARDS_PER_LABEL)}"}),
+    "list by title": ("SELECT * FROM todo_lists WHERE title = :title", lambda rng, n: {"title": f"list {rng.randrange(n // CARDS_PER_LIST)}"}),
+    "list's cards in order": ("SELECT * FROM todo_cards WHERE list_id = :list_id ORDER BY position",
+                              lambda rng, n: {"list_id": rng.randrange(n // CARDS_PER_LIST) + 1}),
+    "label's cards": ("SELECT card_id FROM todo_card_labels_m2m WHERE label_id = :label_id",
+                      lambda rng, n: {"label_id": rng.randrange(n // CARDS_PER_LABEL) + 1}),
+    "cards due in a week": ("SELECT * FROM todo_cards WHERE due_date BETWEEN :start AND :end",
+                            lambda rng, n: week_after(datetime.datetime(2021, 1, 1) + datetime.timedelta(days=rng.randrange(365)))),
+}
+
+
+def week_after(start):
+    return {"start": start, "end": start + datetime.timedelta(days=7)}
+
+
+def make_board(path, card_count):
+    """A database with card_count cards, spread over lists and labels, without the new indexes"""
+    engine = create_sqlite_engine(path)
+    Base.metadata.create_all(engine)
+    rng = random.Random(0)
+    with engine.begin() as connection:
+        for index in NEW_INDEXES:
+            connection.execute(text(f"DROP INDEX {index}"))
+        connection.execute(text("INSERT INTO todo_lists (id, title) VALUES (:id, :title)"),
+                           [{"id": i + 1, "title": f"list {i}"} for i in range(card_count // CARDS_PER_LIST)])
+        connection.execute(text("INSERT INTO todo_labels (id, name, color) VALUES (:id, :name, '#FFFFFF')"),
+                           [{"id": i + 1, "name": f"label {i}"} for i in range(card_count // CARDS_PER_LABEL)])
+        connection.execute(text("INSERT INTO todo_cards (id, title, description, due_date, position, list_id) "
+                                "VALUES (:id, :title, '', :due_date, :position, :list_id)"),
+                           [{"id": i + 1, "title": f"card {i}", "position": rng.randrange(CARDS_PER_LIST),
+                             "due_date": datetime.datetime(2021, 1, 1) + datetime.timedelta(minutes=rng.randrange(525600)),
+                             "list_id": rng.randrange(card_count // CARDS_PER_LIST) + 1} for i in range(card_count)])
+        connection.execute(text("INSERT OR IGNORE INTO todo_card_labels_m2m (card_id, label_id) VALUES (:card_id, :label_id)"),
+                           [{"card_id": i + 1, "label_id": rng.randrange(card_count // CARDS_PER_LABEL) + 1}
+                            for i in range(card_count)])
+    return engine
+
+
+def measure(engine, card_count):
+    """{query name: (query plan, ms per query)}"""
+    results = {}
+    with engine.connect() as connection:
+        for name, (sql, make_params) in QUERIES.items():
+            rng = random.Random(1)
+            params = [make_params(rng, card_count) for _ in range(REPEATS)]
+            plan = " / ".join(row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params[0]))
+            start = time.perf_counter()
+            for p in params:
+                connection.execute(text(sql), p).fetchall()
+            results[name] = (plan, (time.perf_counter() - start) / REPEATS * 1000)
+    return results
+
+
+def main(*card_counts):
+    for card_count in card_counts or (10_000, 100_000):
+        with tempfile.TemporaryDirectory(dir=".") as directory:
+            engine = make_board(os.path.join(directory, "db.sqlite3"), card_count)
+            before = measure(engine, card_count)
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    if index.name in NEW_INDEXES:
+                        index.create(engine)
+            after = measure(engine, card_count)
+            engine.dispose()
+
+        print(f"\n{card_count} cards")
+        for name in QUERIES:
+            print(f"  {name}: {before[name][1]:8.3f}ms -> {after[name][1]:8.3f}ms\n"
+                  f"    before: {before[name][0]}\n    after:  {after[name][0]}")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,100 @@
+"""
+Compares the engine profiles in project_sqlalchemy_globals.SQLITE_PROFILES on a throwaway database: the latency of
+small commits like the ones every save() makes, and how many reads and writes get done when a writer and several
+readers share the database, like the gui and the email checker do.
+
+Run from the project root:
+    python -m benchmarks.sqlite_profiles [seconds per concurrency run]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import sqlalchemy.exc
+from sqlalchemy import text
+
+from project_sqlalchemy_globals import SQLITE_PROFILES, create_sqlite_engine
+
+COMMITS = 500
+READERS = 3
+
+
+def make_engine(directory, profile):
+    engine = create_sqlite_engine(os.path.join(directory, f"{profile}.sqlite3"), profile)
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE cards (id INTEGER PRIMARY KEY, title TEXT, position INTEGER)"))
+        connection.execute(text("INSERT INTO cards (title, position) VALUES (:title, :position)"),
+                           [{"title": f"card {i}", "position": i} for i in range(1000)])
+    return engine
+
+
+def commit_latency(engine):
+    """Seconds per commit of a one-row update, as (median, 99th percentile)"""
+    times = []
+    with engine.connect() as connection:
+        for i in range(COMMITS):
+            start = time.perf_counter()
+            with connection.begin():
+                connection.execute(text("UPDATE cards SET position = :position WHERE id = :id"),
+                                   {"position": i, "id": i % 1000 + 1})
+            times.append(time.perf_counter() - start)
+    return statistics.median(times), statistics.quantiles(times, n=100)[98]
+
+
+def concurrent_throughput(engine, seconds):
+    """(writes/s, reads/s, "database is locked" errors) with one writer and READERS readers running for seconds"""
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def count(name):
+        with lock:
+            counts[name] += 1
+
+    def writer():
+        with engine.connect() as connection:
+            i = 0
+            while time.perf_counter() < deadline:
+                try:
+                    with connection.begin():
+                        connection.execute(text("UPDATE cards SET title = :title WHERE id = :id"),
+                                           {"title": f"renamed {i}", "id": i % 1000 + 1})
+                    count("writes")
+                except sqlalchemy.exc.OperationalError:
+                    count("locked")
+                i += 1
+
+    def reader():
+        with engine.connect() as connection:
+            while time.perf_counter() < deadline:
+                try:
+                    connection.execute(text("SELECT * FROM cards ORDER BY position LIMIT 100")).fetchall()
+                    count("reads")
+                except sqlalchemy.exc.OperationalError:
+                    count("locked")
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(READERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts["writes"] / seconds, counts["reads"] / seconds, counts["locked"]
+
+
+def main(seconds=3):
+    # in the project directory, not /tmp, which is often in memory where fsyncs cost nothing
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        for profile in SQLITE_PROFILES:
+            engine = make_engine(directory, profile)
+            median, p99 = commit_latency(engine)
+            writes, reads, locked = concurrent_throughput(engine, seconds)
+            engine.dispose()
+            print(f"{profile:>8}: commit median {median * 1000:6.2f}ms, p99 {p99 * 1000:6.2f}ms | "
+                  f"1 writer + {READERS} readers: {writes:8.0f} writes/s, {reads:8.0f} reads/s, {locked} locked errors")
+
+
+if __name__ == "__main__":
+    main(*(float(arg) for arg in sys.argv[1:2]))
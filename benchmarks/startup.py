@@ -0,0 +1,75 @@
+"""
+Starts the app the way main.py does, against a throwaway database, and prints the time to the window's first paint
+and to the board being built, and whether email checking or the settings form had been imported by the first paint
+(they shouldn't be: the window is meant to show before any IMAP or settings form work).
+
+Run from the project root (QT_QPA_PLATFORM=offscreen works without a display):
+    python -m benchmarks.startup
+"""
+import time
+STARTED = time.perf_counter()
+
+import asyncio
+import os
+import sys
+import tempfile
+
+from PySide2 import QtWidgets, QtCore
+import qasync
+
+DEFERRED_MODULES = ("todo_lists.email_checking", "todo_lists.aioimap", "settings.widgets", "break_timer.widgets")
+
+
+async def run(app, directory):
+    import project_sqlalchemy_globals
+    from project_sqlalchemy_globals import Base, Session, create_sqlite_engine
+    Session.bind = project_sqlalchemy_globals.engine = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+
+    import main
+    from todo_lists.models import merge_duplicates
+    from todo_lists.search import add_search_index
+    imported = time.perf_counter()
+    Base.metadata.create_all(Session.bind)
+    project_sqlalchemy_globals.add_missing_columns()
+    merge_duplicates()
+    project_sqlalchemy_globals.add_missing_indexes()
+    add_search_index()
+    main.app = app
+    main.themes.apply(app, os.path.join(os.path.dirname(main.__file__), "styles.qss"))
+
+    first_paint = {}
+
+    class TimedMainWindow(main.AppMainWindow):
+        def paintEvent(self, event):
+            super().paintEvent(event)
+            if not first_paint:
+                first_paint["time"] = time.perf_counter()
+                first_paint["deferred imported"] = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+    window = TimedMainWindow()
+    window.show()
+    while not first_paint:
+        await asyncio.sleep(0.001)
+    tabs = window.centralWidget()
+    while isinstance(tabs.widget(tabs.TODO_TAB), QtWidgets.QLabel):  # still the placeholder
+        await asyncio.sleep(0.001)
+    board_built = time.perf_counter()
+
+    print(f"imports:      {(imported - STARTED) * 1000:7.1f}ms")
+    print(f"first paint:  {(first_paint['time'] - STARTED) * 1000:7.1f}ms")
+    print(f"board built:  {(board_built - STARTED) * 1000:7.1f}ms")
+    print(f"imported by the first paint, of {', '.join(DEFERRED_MODULES)}: {first_paint['deferred imported'] or 'none'}")
+    window.close()
+    Session.bind.dispose()
+
+
+def main():
+    app = QtWidgets.QApplication([])
+    loop = qasync.QEventLoop(app)
+    asyncio.set_event_loop(loop)
+    with tempfile.TemporaryDirectory(dir=".") as directory, loop:
+        loop.run_until_complete(run(app, directory))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Times restyling a board of CARDS TodoCardWidgets (with labels and due dates), against a throwaway database:
+    - "old": the stylesheet read from styles.qss and qss_vars.json and filled in with a str.replace() per variable,
+      every time, on a board whose label and due date widgets each had their own stylesheet, as they used to
+    - switching between the shipped themes with settings.themes, on the board as it is now
+    - switching to the theme that's already set, and changing only the background image, which shouldn't restyle
+Each time includes the re-polish and a repaint of the board (grab()). Like main.py, the stylesheet is applied once after
+the theme's settings are saved.
+
+Run from the project root (QT_QPA_PLATFORM=offscreen works without a display):
+    python -m benchmarks.theme_switch
+"""
+import asyncio
+import datetime
+import json
+import os
+import random
+import tempfile
+import time
+
+from PySide2 import QtWidgets
+
+from benchmarks.label_strip import OldLabelContainer
+from project_sqlalchemy_globals import Base, Session, create_sqlite_engine, transaction
+from settings import themes
+from settings.models import Setting
+from todo_lists import deadlines
+from todo_lists.card_view import CARD_DISPLAY_WIDGETS
+from todo_lists.models import TodoListModel, TodoCardModel, TodoLabelModel, load_board
+from todo_lists.widgets import TodoListWidget, TodoCardWidget
+
+CARDS = 1000
+SWITCHES = 5
+
+
+def make_board():
+    rng = random.Random(0)
+    with transaction():
+        labels = [TodoLabelModel(f"label {i}", f"#{rng.randrange(0x1000000):06X}") for i in range(8)]
+        todo_list = TodoListModel("list")
+        for i in range(CARDS):
+            due_date = datetime.datetime.now() + datetime.timedelta(days=rng.randint(-3, 10)) if rng.random() < 0.5 else None
+            TodoCardModel(todo_list, f"card {i}", "", due_date, position=i, labels=rng.sample(labels, rng.randint(0, 3)))
+    Setting.get_or_create("Card Display", CARD_DISPLAY_WIDGETS).set_value(CARD_DISPLAY_WIDGETS)
+    widget = TodoListWidget(todo_list, dict(load_board())[todo_list])
+    widget.resize(300, 800)
+    widget.show()
+    widget.grab()
+    return widget
+
+
+def add_old_stylesheets(board):
+    """Gives the board back the label frames and stylesheets of their own its widgets used to have"""
+    for card in board.findChildren(TodoCardWidget):
+        strip = card.findChild(TodoCardWidget.LabelStrip)
+        if strip is not None:
+            card.layout().replaceWidget(strip, OldLabelContainer(card.model.labels, card))  # parented, or python deletes it
+            strip.deleteLater()
+    for due_date in board.findChildren(TodoCardWidget.DueDateDisplay):
+        state = due_date.property("state")
+        due_date.setStyleSheet("background-color: rgba(120, 0, 0, 90)" if state == deadlines.STATE_OVERDUE else
+                               "background-color: rgba(250, 220, 120, 90)" if state == deadlines.STATE_SOON else
+                               "border-width: 5px")
+
+
+def old_apply(app, directory, name):
+    vars_fp = os.path.join(directory, "qss_vars.json")
+    values = themes.THEMES[name]
+    with open(vars_fp, "w") as vars_file:
+        json.dump({"primary_color": ", ".join(str(int(values["Primary Color"][i:i + 2], 16)) for i in (1, 3, 5)),
+                   "accent_color": ", ".join(str(int(values["Accent Color"][i:i + 2], 16)) for i in (1, 3, 5)),
+                   "opacity": values["Opacity"]}, vars_file, indent=4)
+    with open(vars_fp, "r") as vars_file:
+        stylesheet_vars = json.load(vars_file)
+    with open(themes.STYLESHEET, "r") as stylesheet:
+        stylesheet_str = stylesheet.read()
+        for var, value in stylesheet_vars.items():
+            stylesheet_str = stylesheet_str.replace(f"@{var}", value)
+        app.setStyleSheet(stylesheet_str)
+
+
+def new_switch(app, name):
+    themes.switch(name)
+    return themes.apply(app)
+
+
+def timed(board, action):
+    start = time.perf_counter()
+    result = action()
+    board.grab()
+    return (time.perf_counter() - start) * 1000, result
+
+
+def main():
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    asyncio.set_event_loop(asyncio.new_event_loop())  # for the due dates' scheduler
+    with tempfile.TemporaryDirectory(dir=".") as directory:
+        Session.bind = create_sqlite_engine(os.path.join(directory, "db.sqlite3"))
+        Base.metadata.create_all(Session.bind)
+        board = make_board()
+        own_sheets = sum(1 for widget in board.findChildren(QtWidgets.QWidget) if widget.styleSheet())
+        print(f"{CARDS} cards, {len(board.findChildren(QtWidgets.QWidget))} widgets, {own_sheets} with their own stylesheet")
+
+        names = list(themes.THEMES)
+        render_start = time.perf_counter()
+        themes.StyleTemplate(open(themes.STYLESHEET).read()).render(themes.stylesheet_vars())
+        render = time.perf_counter() - render_start
+        themes.apply(app)  # the stylesheet set at startup
+        render_start = time.perf_counter()
+        themes.template().render(themes.stylesheet_vars())
+        cached_render = time.perf_counter() - render_start
+
+        new = [timed(board, lambda: new_switch(app, names[(i + 1) % len(names)]))[0] for i in range(SWITCHES * len(names))]
+        current = themes.current_theme()
+        same = [timed(board, lambda: new_switch(app, current)) for _ in range(SWITCHES)]
+        background_only = timed(board, lambda: (Setting.get("Background Image").set_value("cover_photo.png"), themes.apply(app))[1])
+
+        add_old_stylesheets(board)
+        own_sheets = sum(1 for widget in board.findChildren(QtWidgets.QWidget) if widget.styleSheet())
+        old = [timed(board, lambda: old_apply(app, directory, names[i % len(names)]))[0] for i in range(SWITCHES * len(names))]
+
+        print(f"old, {own_sheets} own stylesheets: {sum(old) / len(old):8.1f}ms per switch")
+        print(f"themes:                         {sum(new) / len(new):8.1f}ms per switch "
+              f"(reading and rendering the template {render * 1000:.2f}ms, cached {cached_render * 1000:.3f}ms)")
+        print(f"themes, already set:            {sum(t for t, _ in same) / len(same):8.1f}ms, restyled: {any(r for _, r in same)}")
+        print(f"themes, background image only:  {background_only[0]:8.1f}ms, restyled: {background_only[1]}")
+        board.deleteLater()
+        Session.bind.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+The countdown behind BreakTimerWidget. The time left is a deadline on a clock that keeps counting while the computer is
+suspended, so it's worked out from the clock every time instead of being counted down by sleeps, and can't drift. It
+wakes up once each time the displayed whole second changes, and not at all while paused.
+
+clock and call_later can be swapped out, ex. for a simulated clock (see benchmarks/break_timer_drift.py).
+"""
+import asyncio
+import math
+import sys
+import time
+
+
+if hasattr(time, "CLOCK_BOOTTIME"):  # linux, where time.monotonic() stops while suspended
+    def suspend_aware_clock():
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+elif sys.platform == "darwin":  # the same, but macos' CLOCK_MONOTONIC keeps going
+    def suspend_aware_clock():
+        return time.clock_gettime(time.CLOCK_MONOTONIC)
+else:  # windows, where time.monotonic() includes suspended time already
+    suspend_aware_clock = time.monotonic
+
+
+def split_seconds(seconds):
+    """seconds as (hours, minutes, seconds)"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return hours, minutes, seconds
+
+
+class Countdown:
+    def __init__(self, seconds, on_tick, on_done, clock=suspend_aware_clock, call_later=None):
+        """on_tick(displayed seconds left) is called each time that changes, on_done() when it reaches 0"""
+        self.on_tick = on_tick
+        self.on_done = on_done
+        self.clock = clock
+        self.call_later = call_later
+        self.remaining = float(seconds)  # while not running
+        self.deadline = None  # clock time it reaches 0 at, while running
+        self.handle = None
+
+    @property
+    def running(self):
+        return self.deadline is not None
+
+    def seconds_left(self):
+        if self.running:
+            return max(0.0, self.deadline - self.clock())
+        return self.remaining
+
+    def displayed(self):
+        """Whole seconds left, rounded up, so it shows the full time until a whole second has passed"""
+        return math.ceil(self.seconds_left() - 1e-9)
+
+    def start(self):
+        if not self.running:
+            self.deadline = self.clock() + self.remaining
+            self.schedule()
+
+    def pause(self):
+        if self.running:
+            self.remaining = self.seconds_left()
+            self.deadline = None
+            self.cancel()
+
+    def set(self, seconds):
+        """Starts over from seconds, still running if it was"""
+        running = self.running
+        self.cancel()
+        self.remaining = float(seconds)
+        self.deadline = None
+        self.on_tick(self.displayed())
+        if running:
+            self.start()
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def schedule(self):
+        left = self.deadline - self.clock()
+        # the displayed value goes down when left reaches the whole second below it. A hair later, so it has.
+        delay = max(0.0, left - (math.ceil(left - 1e-9) - 1)) + 0.001
+        call_later = self.call_later or asyncio.get_event_loop().call_later
+        self.handle = call_later(delay, self.tick)
+
+    def tick(self):
+        self.handle = None
+        displayed = self.displayed()
+        self.on_tick(displayed)
+        if displayed <= 0:
+            self.remaining = 0.0
+            self.deadline = None
+            self.on_done()
+        else:
+            self.schedule()
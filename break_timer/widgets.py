@@ -5,13 +5,14 @@ import qasync
 import asyncio
 from utils import style_selector_widgets as styles
 from utils.widgets import HBoxFrame, ImageBackgroundWidget
+from .timer import Countdown, split_seconds
 
 
 class BreakTimerWidget(styles.PrimaryColorWidget):
     def __init__(self, *args, **kwargs):
         self.paused = False
-        self.break_time = [int(value) for value in Setting.get_or_create("Break Time", "0:5:0").value.split(":")]
-        self.study_time = [int(value) for value in Setting.get_or_create("Study Time", "0:25:0").value.split(":")]
+        self.break_time = Setting.get_time("Break Time", "0:5:0")
+        self.study_time = Setting.get_time("Study Time", "0:25:0")
         self.mode = "study"
         self.current_time = getattr(self, f"{self.mode}_time")
 
@@ -20,13 +21,15 @@ class BreakTimerWidget(styles.PrimaryColorWidget):
         self.setFixedHeight(300)
         self.setFixedWidth(600)
         self.setLayout(QtWidgets.QVBoxLayout())
+        self.countdown = Countdown(self.seconds(self.current_time), self.show_time, self.on_countdown_done)
+        self.started = False  # started once, it keeps counting down through mode switches after that
 
         self.mode_label = QtWidgets.QLabel(self.mode.capitalize())
-        self.mode_label.setStyleSheet("font-size: 35px")
+        self.mode_label.setFont(self.pixel_font(35))
         self.layout().addWidget(self.mode_label, alignment=QtCore.Qt.AlignCenter)  # noqa
 
         self.time_label = QtWidgets.QLabel(":".join(str(value).zfill(2) for value in self.current_time))
-        self.time_label.setStyleSheet("font-size: 50px")
+        self.time_label.setFont(self.pixel_font(50))
         self.layout().addWidget(self.time_label, alignment=QtCore.Qt.AlignCenter)  # noqa
 
         self.buttons = HBoxFrame()
@@ -42,46 +45,44 @@ class BreakTimerWidget(styles.PrimaryColorWidget):
 
         self.layout().addWidget(self.buttons, alignment=QtCore.Qt.AlignCenter)  # noqa
 
-        self.task = None
+        subscriptions = [("Break Time", Setting.subscribe("Break Time", lambda value: self.update_time("break"))),
+                         ("Study Time", Setting.subscribe("Study Time", lambda value: self.update_time("study")))]
+        self.destroyed.connect(lambda: [Setting.unsubscribe(*subscription) for subscription in subscriptions])
+        self.destroyed.connect(lambda: self.countdown.cancel())
+
+    def pixel_font(self, size):
+        font = QtGui.QFont(self.font())
+        font.setPixelSize(size)
+        return font
+
+    def update_time(self, mode):
+        """Called when the Break or Study Time setting changes"""
+        setattr(self, f"{mode}_time", Setting.get_time(f"{mode.capitalize()} Time"))
+        if self.mode == mode and not self.started:  # don't reset a running timer
+            self.current_time = getattr(self, f"{self.mode}_time")
+            self.countdown.set(self.seconds(self.current_time))
 
     def set_mode(self, mode):
         self.mode = mode
         self.current_time = getattr(self, f"{self.mode}_time")
-        self.time_label.setText(":".join(str(value).zfill(2) for value in self.current_time))
+        self.countdown.set(self.seconds(self.current_time))
         self.mode_label.setText(self.mode.capitalize())
         self.switch_button.setText(f'Switch to {"Study" if self.mode == "break" else "Break"}')
 
-        if self.task is not None:
-            self.task.cancel()
-            self.task = asyncio.get_running_loop().create_task(self.start())
-
-    def change_time(self, increment):
-        time = [int(value) for value in self.time_label.text().split(":")]
-        time[2] += increment
-        for i in reversed(range(0, 3)):
-            if time[i] > 60:
-                time[i - 1] += time[i] // 60
-                time[i] = time[i] % 60
-
-            if time[i] < 0:  # -1
-                time[i - 1] += time[i] // 60  # idk why but -1//60 = -1 instead of 0 so no need to subtract 1.
-                time[i] = time[i] % 60  # idk why but -1 % 60 = 59, so no need to add 60.
-
-        if sum(time) < 0:
-            raise ArithmeticError("Time cannot be negative!")
-
-        self.time_label.setText(":".join(str(value).zfill(2) for value in time))
-
-    async def start(self):
-        time_in_seconds = 3600 * self.current_time[0] + 60 * self.current_time[1] + self.current_time[2]
-        for sec in range(time_in_seconds):
-            for centisec in range(100):
-                while self.paused:
-                    await asyncio.sleep(0.01)
-                await asyncio.sleep(0.01)
-
-            self.change_time(-1)
-        await asyncio.sleep(1)
+        if self.started and not self.paused:
+            self.countdown.start()
+
+    @staticmethod
+    def seconds(hms):
+        return 3600 * hms[0] + 60 * hms[1] + hms[2]
+
+    def show_time(self, seconds):
+        self.time_label.setText(":".join(str(value).zfill(2) for value in split_seconds(seconds)))
+
+    def on_countdown_done(self):
+        QtCore.QTimer.singleShot(1000, self.announce_switch)  # show 00:00:00 for a second first
+
+    def announce_switch(self):
         mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Break timer",
                                    f"Time {'for a break' if self.mode == 'study' else 'to study'}!")
         mb.setWindowFlags(QtCore.Qt.WindowStaysOnTopHint)
@@ -90,20 +91,24 @@ class BreakTimerWidget(styles.PrimaryColorWidget):
         self.set_mode("study" if self.mode == "break" else "break")
 
     def toggle_pause(self):
-        if self.task is None:
-            self.task = asyncio.get_running_loop().create_task(self.start())
+        if not self.started:
+            self.started = True
+            self.countdown.start()
             self.pause_button.setText("Pause")
             return
 
         self.paused = not self.paused
         if self.paused:
+            self.countdown.pause()
             self.pause_button.setText("Start")
         else:
+            self.countdown.start()
             self.pause_button.setText("Pause")
 
 
 class MainBreakTimerWidget(ImageBackgroundWidget):
     def __init__(self, *args, **kwargs):
         super().__init__(image_fp=Setting.get("Background Image").value, *args, *kwargs)
+        Setting.subscribe_widget(self, "Background Image", self.bg.set_path)
         self.setLayout(QtWidgets.QHBoxLayout())
         self.layout().addWidget(BreakTimerWidget(), alignment=QtCore.Qt.AlignCenter)  # noqa
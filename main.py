@@ -1,52 +1,45 @@
 # Created by Nickolas Koe for the 2021 Congressional App Challenge
 # NOTE: Currently does not work with python 3.10 - pip has no available binaries for PySide2 for 3.10
 
+import time
+STARTED = time.perf_counter()  # for the time to first paint
+
+import sys
+from utils import profiling
+if __name__ == "__main__":
+    profiling.enable_from_args(sys.argv)  # --profile, before the imports below so they're timed too
+
 import asyncio
-import imaplib
-import random
-import socket
 from PySide2 import QtWidgets, QtCore, QtGui
-from project_sqlalchemy_globals import Session, Base, engine
+from project_sqlalchemy_globals import Base, engine, add_missing_columns, add_missing_indexes
 import qasync
-import json
 import os
 
-if os.name == 'nt':
-    # https://stackoverflow.com/questions/1551605/how-to-set-applications-taskbar-icon-in-windows-7/1552105#1552105
-    import ctypes
-    myappid = 'StudyCoordinator'  # arbitrary string
-    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)  # ensures qt icon is used and not the python one
-
-app = QtWidgets.QApplication([])
-asyncio.set_event_loop(qasync.QEventLoop(QtCore.QCoreApplication.instance()))  # expose qt event loop as a PEP 3156 one
-
-# these imports here in case any rely on the event loop
-from settings.widgets import SettingsWidget
+# Email parsing worker processes are spawned, so they re-import this module, and anything that shouldn't run in them
+# goes under a __main__ check.
+if __name__ == "__main__":
+    if os.name == 'nt':
+        # https://stackoverflow.com/questions/1551605/how-to-set-applications-taskbar-icon-in-windows-7/1552105#1552105
+        import ctypes
+        myappid = 'StudyCoordinator'  # arbitrary string
+        ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)  # ensures qt icon is used and not the python one
+
+    app = QtWidgets.QApplication([])
+    asyncio.set_event_loop(qasync.QEventLoop(QtCore.QCoreApplication.instance()))  # expose qt event loop as a PEP 3156 one
+    profiling.stop_after()
+
+# these imports here in case any rely on the event loop. The settings form, break timer and email checking are only
+# imported once their tab or the checker is built, after the window is shown.
 from settings.models import Setting
-from break_timer.widgets import MainBreakTimerWidget
-from todo_lists import TodoLabelModel, TodoCardWidget, TodoMainScroll, TodoListModel, TodoCardModel, email_checking
+from settings import themes
+from todo_lists import TodoMainScroll
+from todo_lists.models import merge_duplicates
+from todo_lists.search import add_search_index
+from utils.widgets import LazyTabWidget
 
-Base.metadata.create_all(engine)
 
-
-def apply_stylesheet(qapp, qss_fp, vars_fp):
-    try:
-        with open(vars_fp, "r") as vars_file:
-            stylesheet_vars = json.load(vars_file)
-    except FileNotFoundError:
-        with open(vars_fp, "a+") as vars_file:
-            stylesheet_vars = {
-                "primary_color": "255, 255, 255",
-                "accent_color": "0, 0, 0",
-                "opacity": "123",
-            }
-            json.dump(stylesheet_vars, vars_file, indent=4)
-
-    with open(qss_fp, "r") as stylesheet:
-        stylesheet_str = stylesheet.read()
-        for var, value in stylesheet_vars.items():
-            stylesheet_str = stylesheet_str.replace(f"@{var}", value)
-        qapp.setStyleSheet(stylesheet_str)
+EMAIL_SETTINGS = ("gc_email_cards", "Email IMAP URL", "Email Address", "Email Password", "Additional Email Accounts",
+                  "Email Check Mode", "Email Fetch Chunk Size")
 
 
 class AppMainWindow(QtWidgets.QMainWindow):
@@ -59,107 +52,116 @@ class AppMainWindow(QtWidgets.QMainWindow):
             print(size)
             self.icon.addFile(f"icon_{size}", QtCore.QSize(size, size))
         self.setWindowIcon(self.icon)
+        self.first_painted = False
+        self.restyle_scheduled = False
+        for name in themes.STYLE_SETTINGS:
+            Setting.subscribe_widget(self, name, lambda value: self.schedule_restyle())
 
-    def reload(self):
-        for task in asyncio.all_tasks():
-            task.cancel()
-        try:
-            self.centralWidget().email_checker.stop()
-        except AttributeError:
-            pass
-        self.centralWidget().deleteLater()
-        self.setCentralWidget(MainTabWidget())
-        self.centralWidget().setCurrentWidget(self.centralWidget().settings_widget)
-        apply_stylesheet(app, "styles.qss", "qss_vars.json")
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.first_painted:
+            self.first_painted = True
+            print(f"First paint {(time.perf_counter() - STARTED) * 1000:.0f}ms after start")
+            profiling.mark("first paint")
 
+    def schedule_restyle(self):
+        """Once for any number of style settings saved together"""
+        if not self.restyle_scheduled:
+            self.restyle_scheduled = True
+            QtCore.QTimer.singleShot(0, self.restyle)
 
-class MainTabWidget(QtWidgets.QTabWidget):
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.todo_widget = TodoMainScroll()
-        self.addTab(self.todo_widget, "To-do list")
-        self.todo_widget = self.todo_widget.widget()
+    def restyle(self):
+        self.restyle_scheduled = False
+        themes.apply(QtWidgets.QApplication.instance())
 
-        self.break_timer_widget = MainBreakTimerWidget()
-        self.addTab(self.break_timer_widget, "Break and Study Timer")
 
-        self.settings_widget = SettingsWidget()
-        self.settings_widget.updated.connect(lambda: self.parent().reload())
-        self.addTab(self.settings_widget, "Settings")
-        self.setAcceptDrops(True)
+class MainTabWidget(LazyTabWidget):
+    TODO_TAB, BREAK_TIMER_TAB, SETTINGS_TAB = range(3)
 
-        try:
-            if Setting.get_or_create("gc_email_cards", "False").value == "True":
-                print("STARTING GC EMAILS")
-                self.email_checker = self.TodoCardEmailChecker(self)
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # each tab is built when it's first shown, so the window comes up before the board, the timer or the settings form
+        self.add_lazy_tab(self.build_todo_tab, "To-do list")
+        self.add_lazy_tab(self.build_break_timer_tab, "Break and Study Timer")
+        self.add_lazy_tab(self.build_settings_tab, "Settings")
+        self.setAcceptDrops(True)
+        self.email_checker = None
+        self.email_checker_scheduled = False
+        self.email_restart_scheduled = False
+        for name in EMAIL_SETTINGS:
+            Setting.subscribe_widget(self, name, lambda value: self.schedule_email_restart())
+        Setting.subscribe_widget(self, "Card Display", lambda value: self.reset_tab(self.TODO_TAB, self.build_todo_tab))
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.email_checker_scheduled:
+            self.email_checker_scheduled = True
+            QtCore.QTimer.singleShot(0, self.start_email_checker)  # once the window is on screen
+
+    @property
+    def todo_widget(self):
+        return self.build_tab(self.TODO_TAB).widget()
+
+    @property
+    def break_timer_widget(self):
+        return self.build_tab(self.BREAK_TIMER_TAB)
+
+    @property
+    def settings_widget(self):
+        return self.build_tab(self.SETTINGS_TAB)
+
+    def build_todo_tab(self):
+        return TodoMainScroll()
+
+    def build_break_timer_tab(self):
+        from break_timer.widgets import MainBreakTimerWidget
+        return MainBreakTimerWidget()
+
+    def build_settings_tab(self):
+        from settings.widgets import SettingsWidget
+        return SettingsWidget()  # saving it updates whatever uses the changed settings through Setting.subscribe()
+
+    def start_email_checker(self):
+        if self.email_checker is not None:  # restarted before this got to run
+            return
+        if Setting.get_bool("gc_email_cards"):
+            print("STARTING GC EMAILS")
+            from todo_lists.email_cards import TodoCardEmailChecker
+            self.build_tab(self.TODO_TAB)  # the checker adds its cards to the board
+            with profiling.phase("email checker start"):
+                self.email_checker = TodoCardEmailChecker(self)
                 self.email_checker.start()
-            else:
-                print("NOT STARTING GC EMAILS")
-        except socket.gaierror:
-            if Setting.get_or_create("Offline Notification", "True") == "True":
-                mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Offline",
-                                           "Unable to connect to the internet. Some features, such as auto-generated "
-                                           "to-do cards from Google Classroom emails, may be unavailable. This message"
-                                           " can be disabled in the settings menu.")
-                mb.exec_()
-
-        except imaplib.IMAP4.error as e:
-            if str(e) == "b'[AUTHENTICATIONFAILED] Invalid credentials (Failure)'":
-                mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Invalid Email Credentials",
-                                           "Your email login information is incorrect. Auto-generated to-do cards "
-                                           "from Google Classroom emails will be unavailable. You can disable "
-                                           "Google Classroom emails in settings.")
-                mb.exec_()
-            else:
-                raise
-
-        except ConnectionRefusedError as e:
-            mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Invalid IMAP URL",
-                                       "The IMAP url provided in settings is invalid. Auto-generated to-do cards "
-                                       "from Google Classroom emails will be unavailable. You can disable "
-                                       "Google Classroom emails in settings.")
-            mb.exec_()
-
-    class TodoCardEmailChecker(email_checking.EmailChecker):
-        def __init__(self, main_tab_widget):
-            self.upper = main_tab_widget
-            super().__init__()
-
-        def on_new_assignment(self, title, subject, date, description, **kwargs):
-            list_name = Session.query(Setting).filter(Setting.name == "Assignments List").first().value
-            list_model = Session.query(TodoListModel).filter(TodoListModel.title == list_name).first()
-            try:
-                print(self.upper.todo_widget.lists)
-                list_widget = self.upper.todo_widget.lists[list_model.id]
-                model = TodoCardModel(list_model, title, description, date, labels=[TodoLabelModel.get_or_create(subject, color=f'#{"".join((random.choice(list("0123456789ABCDEF")) for i in range(6)))}')])
-                list_widget.add_card(TodoCardWidget(model))
-            except KeyError:
-                box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Critical, "Invalid List",
-                                            f'Invalid list "{list_name.title}" selected as Assignments List. Please '
-                                            f"select another in settings. You can also disable google classroom emails "
-                                            f"integration there")
-                box.exec_()
-                raise self.ExitError("Invalid list")
-            print("DONE")
-
-        def on_new_material(self, title, subject, description, **kwargs):
-            list_name = Session.query(Setting).filter(Setting.name == "Materials List").first().value
-            list_model = Session.query(TodoListModel).filter(TodoListModel.title == list_name).first()
-            try:
-                list_widget = self.upper.todo_widget.lists[list_model.id]
-                model = TodoCardModel(list_model, title, description, None, labels=[TodoLabelModel.get_or_create(subject, color=f'#{"".join((random.choice("0123456789ABCDEF") for _ in range(6)))}')])
-                list_widget.add_card(TodoCardWidget(model))
-            except KeyError:
-                box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Critical, "Invalid List",
-                                            f'Invalid list "{list_name.title}" selected as Materials List. Please '
-                                            f"select another in settings. You can also disable google classroom emails "
-                                            f"integration there")
-                box.exec_()
-                raise self.ExitError("Invalid list")
-
-
-apply_stylesheet(app, "styles.qss", "qss_vars.json")
-
-root = AppMainWindow()
-root.show()
-app.exec_()
+        else:
+            print("NOT STARTING GC EMAILS")
+
+    def schedule_email_restart(self):
+        """Once for any number of email settings saved together"""
+        if self.email_checker_scheduled and not self.email_restart_scheduled:  # otherwise it hasn't started yet anyway
+            self.email_restart_scheduled = True
+            QtCore.QTimer.singleShot(0, self.restart_email_checker)
+
+    def restart_email_checker(self):
+        self.email_restart_scheduled = False
+        if self.email_checker is not None:
+            self.email_checker.stop()
+            self.email_checker = None
+        self.start_email_checker()
+
+
+if __name__ == "__main__":
+    profiling.mark("imports done")
+    with profiling.phase("create_all"):
+        Base.metadata.create_all(engine)
+    with profiling.phase("migrations"):
+        add_missing_columns()
+        merge_duplicates()
+        add_missing_indexes()
+        add_search_index()
+    with profiling.phase("stylesheet"):
+        themes.apply(app)
+
+    with profiling.phase("AppMainWindow"):
+        root = AppMainWindow()
+    with profiling.phase("show"):
+        root.show()
+    app.exec_()
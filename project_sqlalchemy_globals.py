@@ -1,6 +1,177 @@
-from sqlalchemy import orm, create_engine
+import contextlib
+import os
+
+from sqlalchemy import orm, create_engine, inspect, event
+
+# PRAGMAs run on every new connection. "default" is sqlite's own behaviour: a rollback journal, and a full fsync on
+# every commit. "wal" is the one used normally. Its commits append to a write-ahead log, which is only fsynced at
+# checkpoints with synchronous=NORMAL. A power cut can lose the last few commits, but the database can't be corrupted.
+# Readers also don't block the writer or wait for it, and busy_timeout makes a connection wait for a lock instead of
+# failing with "database is locked".
+SQLITE_PROFILES = {
+    "default": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    "wal": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "mmap_size": 64 * 1024 * 1024,
+        "cache_size": -16 * 1024,  # negative is in KiB, so 16MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,  # ms
+    },
+}
+DB_PROFILE = os.environ.get("STUDYCOORDINATOR_DB_PROFILE", "wal")
+
+
+def create_sqlite_engine(path, profile=DB_PROFILE):
+    """An engine for the sqlite database at path, with the PRAGMAs in SQLITE_PROFILES[profile] set on each connection"""
+    pragmas = SQLITE_PROFILES[profile]
+    new_engine = create_engine(f'sqlite:///{path}', echo=False)
+
+    @event.listens_for(new_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas.items():
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+
+    return new_engine
+
 
 Base = orm.declarative_base()
-engine = create_engine('sqlite:///db.sqlite3', echo=False)
+engine = create_sqlite_engine('db.sqlite3')
 Session = orm.sessionmaker(bind=engine)()
 Session.expire_on_commit = False
+
+_transaction_depth = 0
+_flushed_since_commit = False  # changes were written by a flush (ex. an autoflush before a query) but not committed
+_after_commit = []  # callbacks waiting for the outermost transaction() to commit
+_rollback_only = False  # a nested transaction() failed, so the outermost one can only roll back
+commit_stats = {"commits": 0, "skipped": 0}  # for measuring how many commits an action makes
+
+
+@event.listens_for(Session, "after_flush")
+def _on_flush(session, flush_context):
+    global _flushed_since_commit
+    _flushed_since_commit = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _on_transaction_end(session):
+    global _flushed_since_commit
+    _flushed_since_commit = False
+
+
+def has_changes():
+    """Whether the Session has anything to commit. Setting an attribute to the value it already had doesn't count."""
+    return bool(_flushed_since_commit or Session.new or Session.deleted
+                or any(Session.is_modified(instance) for instance in Session.dirty))
+
+
+def commit():
+    """
+    Session.commit(), except inside transaction(), where changes are only flushed until the transaction ends. Skipped
+    if nothing changed, so saving an unchanged model costs nothing.
+    """
+    if _transaction_depth:
+        Session.flush()
+    else:
+        _commit_if_changed()
+
+
+def _commit_if_changed():
+    if has_changes():
+        Session.commit()
+        commit_stats["commits"] += 1
+    else:
+        commit_stats["skipped"] += 1
+
+
+def after_commit(callback):
+    """
+    Calls callback() once the current transaction() has committed, or right away outside of one. If the transaction
+    is rolled back it's never called, so listeners only hear about changes that were actually saved. A callback added
+    more than once in the same transaction is only called once.
+    """
+    if _transaction_depth:
+        if callback not in _after_commit:
+            _after_commit.append(callback)
+    else:
+        callback()
+
+
+def add_missing_columns():
+    """
+    create_all() only creates missing tables, so columns added to a model since the database was made are added here.
+    Call after create_all(), then add_missing_indexes().
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    # sqlite can't add a column with a UNIQUE constraint, uniqueness comes from its index instead
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+
+
+def add_missing_indexes():
+    """
+    Creates indexes added to models since the database was made, which create_all() skips for existing tables. Rows
+    that would break a new unique index have to be fixed first (see todo_lists.models.merge_duplicates()).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(connection)
+
+
+class RollbackOnlyError(Exception):
+    """Raised when a transaction() ends without an error after a transaction() nested in it failed"""
+
+
+@contextlib.contextmanager
+def transaction():
+    """
+    Everything saved inside is committed at once when it ends (one fsync instead of one per save), or rolled back if
+    anything raises. Works as a decorator too, ex. for a whole ui action:
+
+        @transaction()
+        def dropEvent(self, event):
+            ...
+
+    Nested transactions join the outermost one, there are no savepoints. If a nested one raises, the whole outermost
+    transaction is marked rollback-only: even if the error is caught, nothing saved in it is committed and no
+    after_commit() callback is called. It's rolled back when it ends, raising RollbackOnlyError if nothing else did.
+    """
+    global _transaction_depth, _rollback_only
+    _transaction_depth += 1
+    try:
+        yield Session
+        if _transaction_depth == 1:
+            if _rollback_only:
+                raise RollbackOnlyError("a nested transaction failed, everything in this one was rolled back")
+            _commit_if_changed()
+    except BaseException:
+        if _transaction_depth == 1:
+            Session.rollback()
+            _after_commit.clear()
+            _rollback_only = False
+        else:
+            _rollback_only = True
+        raise
+    finally:
+        _transaction_depth -= 1
+    if not _transaction_depth:
+        callbacks = _after_commit[:]
+        _after_commit.clear()
+        for callback in callbacks:
+            callback()
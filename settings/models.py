@@ -1,31 +1,107 @@
-from sqlalchemy import orm, create_engine, Table, Column, Integer, String, Sequence, ForeignKey, DateTime
-from project_sqlalchemy_globals import Session, Base, engine
+import functools
+
+from sqlalchemy import orm, create_engine, Table, Column, Integer, String, Sequence, ForeignKey, DateTime, inspect
+from project_sqlalchemy_globals import Session, Base, engine, commit, after_commit
 
 
 class Setting(Base):
+    """
+    Settings are all read once into _cache and served from memory after that. Since the cached objects are the
+    Session's own, saving one updates the cache too. Setting.subscribe() gets a callback whenever a setting changes,
+    instead of querying it again to check.
+    """
     __tablename__ = "settings"
     name = Column(String, primary_key=True)
     category = Column(String)
     value = Column(String)
 
+    _cache = None  # {name: Setting}
+    _subscribers = {}  # {name: [callback(value)]}
+
     def set_value(self, value):
-        self.value = value
+        self.value = None if value is None else str(value)  # the column is a string, this keeps the cached value one too
         self.save()
 
+    @classmethod
+    def _get_cache(cls):
+        if cls._cache is None:
+            cls._cache = {setting.name: setting for setting in Session.query(cls).all()}
+        return cls._cache
+
     @classmethod
     def get_or_create(cls, name, value=None):
-        a = Session.query(cls).filter(cls.name == name).one_or_none()
+        a = cls.get(name)
         if a is None:
-            a = cls(name=name, value=value)
-            Session.add(a)
-            Session.commit()
+            a = cls(name=name, value=None if value is None else str(value))
+            a.save()
         return a
 
     @classmethod
     def get(cls, name):
-        return Session.query(cls).filter(cls.name == name).one_or_none()
+        a = cls._get_cache().get(name)
+        if a is not None and inspect(a).session is None:  # created in a transaction that was rolled back
+            del cls._cache[name]
+            return None
+        return a
+
+    @classmethod
+    def get_bool(cls, name, default=False):
+        return cls.get_or_create(name, default).value == "True"
+
+    @classmethod
+    def get_int(cls, name, default=0):
+        return int(cls.get_or_create(name, default).value)
+
+    @classmethod
+    def get_time(cls, name, default="0:0:0"):
+        """"h:m:s" settings, ex. Break Time, as an (hours, minutes, seconds) tuple"""
+        return _parse_time(cls.get_or_create(name, default).value)
+
+    @classmethod
+    def get_color(cls, name, default="#FFFFFF"):
+        """"#RRGGBB" settings, ex. Primary Color, as an (r, g, b) tuple"""
+        return _parse_color(cls.get_or_create(name, default).value)
+
+    @classmethod
+    def subscribe(cls, name, callback):
+        """
+        callback(new value) is called after the setting is saved with a different value. Inside a transaction() that's
+        once it has committed, so a form saving several settings at once has them all saved before anyone is told.
+        """
+        cls._subscribers.setdefault(name, []).append(callback)
+        return callback
+
+    @classmethod
+    def subscribe_widget(cls, widget, name, callback):
+        """subscribe() until widget is destroyed"""
+        cls.subscribe(name, callback)
+        widget.destroyed.connect(lambda: cls.unsubscribe(name, callback))
+        return callback
+
+    @classmethod
+    def unsubscribe(cls, name, callback):
+        cls._subscribers.get(name, []).remove(callback)
 
     def save(self):
+        changed = inspect(self).attrs.value.history.has_changes()
         Session.add(self)
-        Session.commit()
+        commit()
+        if self._cache is not None:
+            self._cache[self.name] = self
+        if changed:
+            after_commit(self.notify)
+
+    def notify(self):
+        for callback in list(self._subscribers.get(self.name, ())):
+            callback(self.value)
+
+
+@functools.lru_cache()
+def _parse_time(value):
+    return tuple(int(part) for part in value.split(":"))
+
 
+@functools.lru_cache()
+def _parse_color(value):
+    value = value.lstrip("#")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
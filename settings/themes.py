@@ -0,0 +1,93 @@
+"""
+The app's stylesheet and themes. styles.qss is a template with @variables in it. It's compiled once into its literal
+pieces and variable names, so rendering it is a single join, and each rendered sheet is kept per set of variables, so
+switching back to a theme used before doesn't render anything. apply() only calls QApplication.setStyleSheet(), which
+re-polishes every widget that's styled by it, when the rendered sheet actually changed. A theme that only changes the background image
+costs no restyle at all, the backgrounds swap their image through the Background Image setting (see main.py).
+
+A theme is just values for the Appearance settings, so switching to one is saving those in one transaction.
+"""
+import functools
+import re
+
+from project_sqlalchemy_globals import transaction
+from .models import Setting
+
+STYLESHEET = "styles.qss"
+
+STYLE_SETTINGS = ("Primary Color", "Accent Color", "Opacity")
+THEME_SETTINGS = STYLE_SETTINGS + ("Background Image",)
+CUSTOM_THEME = "Custom"  # the settings don't match any of THEMES
+
+THEMES = {
+    "Default": {"Primary Color": "#FFFFFF", "Accent Color": "#000000", "Opacity": "100", "Background Image": "bg.jpg"},
+    "Halloween": {"Primary Color": "#2B1033", "Accent Color": "#FF8A1F", "Opacity": "170",
+                  "Background Image": "bg_halloween.jpg"},
+}
+
+_VARIABLE = re.compile(r"@(\w+)")
+
+
+class StyleTemplate:
+    def __init__(self, text):
+        # re.split with a group alternates literal text and variable names: [text, name, text, name, ..., text]
+        self.pieces = _VARIABLE.split(text)
+        self.rendered = {}  # {sorted variables: stylesheet}
+
+    def render(self, variables):
+        key = tuple(sorted(variables.items()))
+        sheet = self.rendered.get(key)
+        if sheet is None:
+            pieces = self.pieces[:]
+            for i in range(1, len(pieces), 2):
+                pieces[i] = variables.get(pieces[i], f"@{pieces[i]}")  # unknown ones are left as they were
+            sheet = self.rendered[key] = "".join(pieces)
+        return sheet
+
+
+@functools.lru_cache()
+def template(path=STYLESHEET):
+    """The template in path, read and compiled the first time only"""
+    with open(path, "r") as stylesheet:
+        return StyleTemplate(stylesheet.read())
+
+
+def stylesheet_vars():
+    """The template's variables, from the Appearance settings"""
+    return {
+        "primary_color": ", ".join(str(c) for c in Setting.get_color("Primary Color")),
+        "accent_color": ", ".join(str(c) for c in Setting.get_color("Accent Color", "#000000")),
+        "opacity": str(Setting.get_or_create("Opacity", 100).value),
+    }
+
+
+def apply(qapp, path=STYLESHEET):
+    """Sets the stylesheet for the current settings, unless it's already the one set. Returns whether it was set."""
+    sheet = template(path).render(stylesheet_vars())
+    if qapp.styleSheet() == sheet:  # ex. only the background image changed
+        return False
+    if qapp.styleSheet():
+        # going straight from one stylesheet to another, qt re-polishes each widget again for every ancestor it has
+        # (it walks the children of each widget it re-polishes). Clearing it first polishes each once, about half the time.
+        qapp.setStyleSheet("")
+    qapp.setStyleSheet(sheet)
+    return True
+
+
+def current_theme():
+    """The name of the theme the settings match, or CUSTOM_THEME"""
+    current = {setting: str(Setting.get_or_create(setting).value).lower() for setting in THEME_SETTINGS}
+    for name, values in THEMES.items():
+        if all(current[setting] == value.lower() for setting, value in values.items()):  # the color dialog's are lowercase
+            return name
+    return CUSTOM_THEME
+
+
+def switch(name):
+    """
+    Saves theme name's settings. Their subscribers are told once it's committed, so only what changed is updated:
+    the stylesheet once for all the style settings, and the backgrounds for the image.
+    """
+    with transaction():
+        for setting, value in THEMES[name].items():
+            Setting.get_or_create(setting).set_value(value)
@@ -1,10 +1,12 @@
-import json
 from PySide2 import QtWidgets, QtCore, QtGui
 from .models import Setting
+from . import themes
 from todo_lists.models import TodoListModel
-from utils.field_widgets import LineEditField, SliderField, ComboBoxField, ColorSelectField, TimeField, FilePathField, PasswordField, BooleanField
+from utils.field_widgets import LineEditField, SliderField, ComboBoxField, ColorSelectField, TimeField, FilePathField, PasswordField, BooleanField, EmailAccountsField
 from utils.widgets import ImageBackgroundWidget
-from project_sqlalchemy_globals import Session
+from todo_lists.email_checking import CHECK_MODES, CHECK_MODE_PUSH, DEFAULT_CHUNK_SIZE
+from todo_lists.card_view import CARD_DISPLAYS, CARD_DISPLAY_WIDGETS
+from project_sqlalchemy_globals import Session, transaction
 from collections import OrderedDict
 from datetime import datetime
 
@@ -14,6 +16,7 @@ class SettingsWidget(ImageBackgroundWidget):  # just hardcode it, i give up
 
     def __init__(self, *args, **kwargs):
         super().__init__(image_fp=Setting.get("Background Image").value, *args, **kwargs)
+        Setting.subscribe_widget(self, "Background Image", self.bg.set_path)
 
         self.setLayout(QtWidgets.QVBoxLayout())
         self.fields = OrderedDict({
@@ -24,6 +27,9 @@ class SettingsWidget(ImageBackgroundWidget):  # just hardcode it, i give up
                 ("Email IMAP URL", Setting.get_or_create("Email IMAP URL"), LineEditField(Setting.get("Email IMAP URL").value)),
                 ("Email Address", Setting.get_or_create("Email Address"), LineEditField(Setting.get("Email Address").value)),
                 ("Email Password", Setting.get_or_create("Email Password"), PasswordField(Setting.get("Email Password").value)),
+                ("Additional Email Accounts", Setting.get_or_create("Additional Email Accounts", "[]"), EmailAccountsField(Setting.get("Additional Email Accounts").value)),
+                ("Email Check Mode", Setting.get_or_create("Email Check Mode", CHECK_MODE_PUSH), ComboBoxField(CHECK_MODES, Setting.get("Email Check Mode").value)),
+                ("Emails Fetched per Request", Setting.get_or_create("Email Fetch Chunk Size", DEFAULT_CHUNK_SIZE), SliderField(Setting.get("Email Fetch Chunk Size").value, (1, 500), QtCore.Qt.Horizontal)),
                 ("Assignments List", Setting.get_or_create("Assignments List"), ComboBoxField([l.title for l in Session.query(TodoListModel).all()])),
                 ("Materials List", Setting.get_or_create("Materials List"), ComboBoxField([l.title for l in Session.query(TodoListModel).all()])),
             ),
@@ -36,12 +42,21 @@ class SettingsWidget(ImageBackgroundWidget):  # just hardcode it, i give up
                 ("Accent Color", Setting.get_or_create("Accent Color", "#000000"), ColorSelectField(Setting.get("Accent Color").value)),
                 ("Opacity", Setting.get_or_create("Opacity", 100), SliderField(Setting.get("Opacity").value, (0, 255), QtCore.Qt.Horizontal)),
                 ("Background Image", Setting.get_or_create("Background Image", "bg.jpg"), FilePathField(Setting.get("Background Image").value)),
+                ("Card Display", Setting.get_or_create("Card Display", CARD_DISPLAY_WIDGETS), ComboBoxField(CARD_DISPLAYS, Setting.get("Card Display").value)),
             ),
         })
 
+        # switching theme saves its Appearance settings right away, see themes.py
+        self.theme_select = QtWidgets.QComboBox()
+        self.theme_select.addItems(list(themes.THEMES) + [themes.CUSTOM_THEME])
+        self.theme_select.setCurrentText(themes.current_theme())
+        self.theme_select.activated.connect(lambda index: self.switch_theme(self.theme_select.itemText(index)))
+
         for category in self.fields:
             box = QtWidgets.QGroupBox(category)
             box.setLayout(QtWidgets.QFormLayout())
+            if category == "Appearance":
+                box.layout().addRow("Theme", self.theme_select)
             for row in self.fields[category]:
                 box.layout().addRow(row[0], row[2])
             self.layout().addWidget(box)
@@ -52,24 +67,32 @@ class SettingsWidget(ImageBackgroundWidget):  # just hardcode it, i give up
 
         print(f"eee {self.fields}")
 
-    def save(self):
-        def hex_to_rgb(hex_val):
-            hex_val = f"#{hex_val}" if not hex_val.startswith("#") else hex_val
-            qcolor = QtGui.QColor(hex_val)
-            return f"{qcolor.red()}, {qcolor.green()}, {qcolor.blue()}"
-
+    def dirty_rows(self):
+        """The rows whose field differs from their saved setting"""
+        dirty = []
         for category, rows in self.fields.items():
             for row in rows:
+                data = row[2].data()
+                value = None if data is None else str(data)
+                if value != row[1].value and not (row[1].value is None and value == ""):  # empty and unset are the same
+                    dirty.append(row)
+        return dirty
+
+    def save(self):
+        # only the changed settings are written, all in one commit. Each one's subscribers are told once it's committed,
+        # so only what uses them updates (the stylesheet, backgrounds, the timer, the email checker...), see main.py
+        with transaction():
+            for row in self.dirty_rows():
                 print(f"saving: {row[0]} | {row[2].data()}")
                 row[1].set_value(row[2].data())  # This works only since all fields use utils.field_widgets widgets.
 
-        with open("qss_vars.json", "r") as vars_file:
-            qss_vars = json.load(vars_file)
-
-        with open("qss_vars.json", "w") as vars_file:
-            qss_vars["primary_color"] = hex_to_rgb(Setting.get("Primary Color").value)
-            qss_vars["accent_color"] = hex_to_rgb(Setting.get("Accent Color").value)
-            qss_vars["opacity"] = str(Setting.get("Opacity").value)
-            json.dump(qss_vars, vars_file, indent=4)
-
+        self.theme_select.setCurrentText(themes.current_theme())
         self.updated.emit()
+
+    def switch_theme(self, name):
+        if name == themes.CUSTOM_THEME:  # nothing to switch to, it's whatever the fields are set to
+            return
+        themes.switch(name)
+        for row in self.fields["Appearance"]:
+            if row[1].name in themes.THEME_SETTINGS:
+                row[2].set_data(row[1].value)  # so they aren't saved back over the theme
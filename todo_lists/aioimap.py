@@ -0,0 +1,208 @@
+"""
+A small asyncio IMAP4rev1 client, covering just the commands the email checker uses, and a pool of logged-in
+connections per account. Responses come back in the same shape as imaplib's (FETCH literals are (line, data) tuples),
+so the FETCH parsing helpers in email_checking work with either.
+"""
+import asyncio
+import contextlib
+import imaplib
+import re
+import ssl
+
+# imaplib's exceptions are reused, so code that knows how to handle imaplib failures handles these too
+IMAPError = imaplib.IMAP4.error
+IMAPAbort = imaplib.IMAP4.abort
+
+_LITERAL_RE = re.compile(rb"\{(\d+)\}\r\n$")
+_RESPONSE_CODE_RE = re.compile(rb"\[(\w+) (\d+)\]")
+
+
+class AsyncIMAPConnection:
+    def __init__(self, host, port=993, use_ssl=True):
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.reader = None
+        self.writer = None
+        self.tag_number = 0
+        self.capabilities = ()
+        self.selected = None  # name of the selected mailbox
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.use_ssl else None)
+        greeting = await self.reader.readline()
+        if not greeting.startswith(b"* OK") and not greeting.startswith(b"* PREAUTH"):
+            raise IMAPAbort(f"Unexpected greeting: {greeting}")
+
+    async def read_response(self):
+        """
+        Reads one full response line, including any literals in it. Returns a list of parts, where literals are
+        (line up to and including the {n} marker, literal data) tuples, like imaplib.
+        """
+        parts = []
+        line = await self.reader.readline()
+        if not line:
+            raise IMAPAbort("Connection closed by server")
+        literal = _LITERAL_RE.search(line)
+        while literal is not None:
+            data = await self.reader.readexactly(int(literal.group(1)))
+            parts.append((line[:-2], data))
+            line = await self.reader.readline()
+            literal = _LITERAL_RE.search(line)
+        parts.append(line[:-2])
+        return parts
+
+    async def command(self, *args):
+        """Sends a command, returning (result type, untagged responses). Raises IMAPError if it fails."""
+        self.tag_number += 1
+        tag = f"A{self.tag_number}".encode()
+        self.writer.write(tag + b" " + " ".join(str(arg) for arg in args).encode() + b"\r\n")
+        await self.writer.drain()
+
+        untagged = []  # includes unsolicited responses the server sent since the last command
+        while True:
+            response = await self.read_response()
+            first = response[0][0] if isinstance(response[0], tuple) else response[0]
+            if first.startswith(tag + b" "):
+                typ, text = (first.split(b" ", 2) + [b""])[1:3]
+                if typ != b"OK":
+                    raise IMAPError(text)  # same message as imaplib, ex. b'[AUTHENTICATIONFAILED] Invalid credentials'
+                return typ.decode(), untagged
+            if first.startswith(b"* BYE"):
+                raise IMAPAbort(f"Server closed connection: {first}")
+            untagged.append(response)
+
+    async def login(self, user, password):
+        await self.command("LOGIN", _quote(user), _quote(password))
+        typ, untagged = await self.command("CAPABILITY")
+        for response in untagged:
+            if response[0].startswith(b"* CAPABILITY"):
+                self.capabilities = tuple(response[0].upper().split()[2:])
+
+    async def select(self, mailbox="INBOX", readonly=False):
+        """Returns {"EXISTS": ..., "UIDVALIDITY": ..., "UIDNEXT": ...}, whichever the server sent, as ints"""
+        typ, untagged = await self.command("EXAMINE" if readonly else "SELECT", mailbox)
+        self.selected = mailbox
+        info = {}
+        for response in untagged:
+            line = response[-1]
+            if line.endswith(b" EXISTS"):
+                info["EXISTS"] = int(line.split()[1])
+            code = _RESPONSE_CODE_RE.search(line)
+            if code is not None:
+                info[code.group(1).decode().upper()] = int(code.group(2))
+        return info
+
+    async def uid_search(self, criteria):
+        typ, untagged = await self.command("UID SEARCH", criteria)
+        return [int(uid) for response in untagged if response[-1].startswith(b"* SEARCH")
+                for uid in response[-1].split()[2:]]
+
+    async def uid_fetch(self, uids, items):
+        typ, untagged = await self.command("UID FETCH", uids, items)
+        return self.fetch_data(untagged)
+
+    async def fetch(self, message_set, items):
+        typ, untagged = await self.command("FETCH", message_set, items)
+        return self.fetch_data(untagged)
+
+    @staticmethod
+    def fetch_data(untagged):
+        """Turns FETCH responses into imaplib's format: "* 1 FETCH (" becomes "1 (" and literal tuples are kept"""
+        data = []
+        for response in untagged:
+            first = response[0][0] if isinstance(response[0], tuple) else response[0]
+            if not re.match(rb"\* \d+ FETCH ", first):
+                continue
+            seq = first.split(b" ", 3)[1]
+            prefix_length = len(b"* ") + len(seq) + len(b" FETCH ")
+            first = seq + b" " + first[prefix_length:]
+            data.append((first, response[0][1]) if isinstance(response[0], tuple) else first)
+            data += response[1:]
+        return data
+
+    async def idle(self, timeout):
+        """
+        IMAP IDLE (RFC 2177). Returns True as soon as the server announces new messages with EXISTS, or False after
+        timeout seconds. If cancelled mid-IDLE the connection is left idling, so it should be closed, not reused.
+        """
+        self.tag_number += 1
+        tag = f"A{self.tag_number}".encode()
+        self.writer.write(tag + b" IDLE\r\n")
+        await self.writer.drain()
+
+        has_new = False
+        response = await self.read_response()
+        while not response[-1].startswith(b"+"):
+            if response[-1].startswith(tag):
+                raise IMAPError(f"IDLE rejected: {response[-1]}")
+            has_new = has_new or response[-1].endswith(b" EXISTS")
+            response = await self.read_response()
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not has_new:
+            try:
+                response = await asyncio.wait_for(self.read_response(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                break
+            if response[-1].startswith(b"* BYE"):
+                raise IMAPAbort(f"Server closed connection while idling: {response[-1]}")
+            has_new = response[-1].endswith(b" EXISTS")
+
+        self.writer.write(b"DONE\r\n")
+        await self.writer.drain()
+        while True:
+            response = await self.read_response()
+            if response[-1].startswith(tag + b" "):
+                return has_new
+
+    async def logout(self):
+        try:
+            await self.command("LOGOUT")
+        except (IMAPError, OSError):
+            pass
+        self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class IMAPConnectionPool:
+    """Up to size logged-in connections to one account, reused between checks instead of logging in every time"""
+    def __init__(self, account, size=2):
+        self.account = account
+        self.free_connections = []
+        self.semaphore = asyncio.Semaphore(size)
+
+    async def connect(self):
+        conn = AsyncIMAPConnection(self.account.imap_url, self.account.port, self.account.use_ssl)
+        await conn.connect()
+        try:
+            await conn.login(self.account.address, self.account.password)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        async with self.semaphore:
+            conn = self.free_connections.pop() if self.free_connections else await self.connect()
+            try:
+                yield conn
+            except BaseException:
+                conn.close()  # it could be mid-command, so it can't be reused
+                raise
+            self.free_connections.append(conn)
+
+    async def close(self):
+        connections, self.free_connections = self.free_connections, []
+        await asyncio.gather(*(conn.logout() for conn in connections), return_exceptions=True)
+
+
+def _quote(arg):
+    return '"' + arg.replace("\\", "\\\\").replace('"', '\\"') + '"'
@@ -0,0 +1,260 @@
+"""
+An alternative to a column of TodoCardWidgets for long lists. Cards are rows in a CardListModel, shown by a QListView that
+paints only the visible ones with CardDelegate, instead of a widget tree (frame, layouts, line edit, label frames) per
+card. Picked with the "Card Display" setting.
+"""
+import functools
+import json
+
+from PySide2 import QtWidgets, QtCore, QtGui
+
+from settings.models import Setting
+from utils.widgets import DeleteAction
+from . import deadlines
+
+CARD_DISPLAY_WIDGETS = "Widgets"
+CARD_DISPLAY_LIST_VIEW = "List View (faster for long lists)"
+CARD_DISPLAYS = (CARD_DISPLAY_WIDGETS, CARD_DISPLAY_LIST_VIEW)
+
+LABELS_PER_ROW = 5
+LABEL_SIZE = QtCore.QSize(32, 8)
+DUE_DATE_SIZE = QtCore.QSize(50, 25)
+CARD_WIDTH = 205
+PADDING = 9
+SPACING = 4
+TITLE_HEIGHT = 20
+MAX_VIEW_HEIGHT = 600  # past this the view scrolls, instead of growing to fit every card
+
+
+@functools.lru_cache(maxsize=256)
+def label_brush(color):
+    """A label's color as a brush, made once per color. Invalid ones paint nothing, like they did as a stylesheet."""
+    color = QtGui.QColor(color or "")
+    return QtGui.QBrush(color) if color.isValid() else QtGui.QBrush()
+
+
+def unwatch_items(items):
+    for item in items:
+        deadlines.scheduler.unwatch(item)
+
+
+def _text_option(alignment):
+    option = QtGui.QTextOption(alignment)
+    option.setWrapMode(QtGui.QTextOption.NoWrap)  # like a QLabel
+    return option
+
+
+TITLE_TEXT_OPTION = _text_option(QtCore.Qt.AlignVCenter)  # left aligned
+DUE_DATE_TEXT_OPTION = _text_option(QtCore.Qt.AlignCenter)
+
+
+class CardItem:
+    """
+    A card in a CardListView. Has what CardDialog, DeleteAction and TodoMainWidget.cards use from a TodoCardWidget, so
+    they work with either.
+    """
+    def __init__(self, model, view):
+        self.model = model
+        self.view = view
+
+    def ui_refresh(self):
+        self.view.model().refresh(self)
+
+    def deleteLater(self):
+        pass  # the view removes the row, there's no widget to delete
+
+
+class CardListModel(QtCore.QAbstractListModel):
+    CardRole = QtCore.Qt.UserRole
+
+    def __init__(self, view, cards, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.items = [CardItem(card, view) for card in cards]
+        for item in self.items:
+            self.watch(item)
+        # the scheduler holds on to every watched item, so they're unwatched when the view (and this model) is deleted,
+        # ex. when its list is deleted or the board is rebuilt. Just the list, this model is gone by then.
+        view.destroyed.connect(functools.partial(unwatch_items, self.items))
+
+    def watch(self, item):
+        """Repaints item's card when its due date gets close or passes. Cards without one aren't watched."""
+        if item.model.due_date is None:
+            deadlines.scheduler.unwatch(item)  # it could have had one
+        else:
+            deadlines.scheduler.watch(item, item.model.due_date, lambda state: self.refresh(item))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.items)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == QtCore.Qt.DisplayRole:
+            return self.items[index.row()].model.title
+        if role == self.CardRole:
+            return self.items[index.row()]
+        return None
+
+    def flags(self, index):
+        return QtCore.Qt.ItemIsEnabled | QtCore.Qt.ItemIsSelectable | QtCore.Qt.ItemIsDragEnabled
+
+    def mimeTypes(self):
+        return ["application/json"]
+
+    def mimeData(self, indexes):
+        # same format as TodoCardWidget's drags, so cards can be dragged between either kind of list
+        card = self.items[indexes[0].row()].model
+        mime_data = QtCore.QMimeData()
+        mime_data.setData("application/json", QtCore.QByteArray(json.dumps({"og_list_id": card.list.id, "card_id": card.id}).encode()))
+        return mime_data
+
+    def insert_item(self, row, item):
+        row = max(0, min(row, len(self.items)))
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.items.insert(row, item)
+        self.endInsertRows()
+        self.watch(item)
+
+    def remove_item(self, item):
+        row = self.items.index(item)
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self.items[row]
+        self.endRemoveRows()
+        deadlines.scheduler.unwatch(item)
+
+    def refresh(self, item):
+        self.watch(item)  # its due date could have been changed
+        index = self.index(self.items.index(item))
+        self.dataChanged.emit(index, index)
+
+
+class CardDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints a card the way TodoCardWidget lays one out: label bars, then the title, then the due date"""
+    def sizeHint(self, option, index):
+        card = index.data(CardListModel.CardRole).model
+        height = 2 * PADDING + TITLE_HEIGHT
+        if len(card.labels) > 0:
+            label_rows = (len(card.labels) + LABELS_PER_ROW - 1) // LABELS_PER_ROW
+            height += label_rows * (LABEL_SIZE.height() + SPACING)
+        if card.due_date is not None:
+            height += DUE_DATE_SIZE.height() + SPACING
+        return QtCore.QSize(CARD_WIDTH, height + SPACING)  # the last SPACING separates cards
+
+    def paint(self, painter, option, index):
+        card = index.data(CardListModel.CardRole).model
+        accent = QtGui.QColor(*Setting.get_color("Accent Color", "#000000"))
+        rect = option.rect.adjusted(0, 0, 0, -SPACING)
+
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        background = QtGui.QColor(accent)
+        background.setAlpha(Setting.get_int("Opacity", 100))
+        painter.setPen(QtGui.QPen(accent.darker(), 1))
+        painter.setBrush(background)
+        painter.drawRect(rect)
+
+        y = rect.top() + PADDING
+        if len(card.labels) > 0:
+            painter.setPen(QtCore.Qt.NoPen)
+            for i, label in enumerate(card.labels):
+                row, column = divmod(i, LABELS_PER_ROW)
+                painter.setBrush(label_brush(label.color))
+                painter.drawRoundedRect(rect.left() + PADDING + column * (LABEL_SIZE.width() + SPACING),
+                                        y + row * (LABEL_SIZE.height() + SPACING),
+                                        LABEL_SIZE.width(), LABEL_SIZE.height(), 4, 4)
+            y += ((len(card.labels) + LABELS_PER_ROW - 1) // LABELS_PER_ROW) * (LABEL_SIZE.height() + SPACING)
+
+        painter.setPen(accent)
+        title_rect = QtCore.QRect(rect.left() + PADDING, y, rect.width() - 2 * PADDING, TITLE_HEIGHT)
+        painter.drawText(QtCore.QRectF(title_rect), painter.fontMetrics().elidedText(card.title, QtCore.Qt.ElideRight, title_rect.width()),
+                         TITLE_TEXT_OPTION)
+        y += TITLE_HEIGHT + SPACING
+
+        if card.due_date is not None:
+            due_rect = QtCore.QRect(QtCore.QPoint(rect.left() + PADDING, y), DUE_DATE_SIZE)
+            state = deadlines.state(card.due_date)
+            if state == deadlines.STATE_OVERDUE:
+                painter.setBrush(QtGui.QColor(120, 0, 0, 90))
+            elif state == deadlines.STATE_SOON:
+                painter.setBrush(QtGui.QColor(250, 220, 120, 90))
+            else:
+                painter.setBrush(QtCore.Qt.NoBrush)
+            painter.drawRect(due_rect)
+            painter.drawText(QtCore.QRectF(due_rect), card.due_date.strftime("%b %d"), DUE_DATE_TEXT_OPTION)
+        painter.restore()
+
+
+class CardListView(QtWidgets.QListView):
+    def __init__(self, parent_list_widget, cards, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parent_list_widget = parent_list_widget
+        self.setModel(CardListModel(self, cards, self))
+        self.setItemDelegate(CardDelegate(self))
+        self.setFixedWidth(CARD_WIDTH + 20)
+        self.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        # drops are left to the TodoListWidget, which handles them for both kinds of list
+        self.setDragEnabled(True)
+        self.setAcceptDrops(False)
+
+        self.model().rowsInserted.connect(self.update_height)
+        self.model().rowsRemoved.connect(self.update_height)
+        self.model().dataChanged.connect(self.update_height)
+        self.update_height()
+
+    def items(self):
+        return self.model().items
+
+    def filter_cards(self, ids):
+        """Shows only the cards whose id is in ids, or all of them if ids is None"""
+        for row, item in enumerate(self.items()):
+            self.setRowHidden(row, ids is not None and item.model.id not in ids)
+        self.update_height()
+
+    def update_height(self, *args):
+        delegate, option = self.itemDelegate(), self.viewOptions()
+        height = 0
+        for row in range(self.model().rowCount()):
+            if self.isRowHidden(row):
+                continue
+            height += delegate.sizeHint(option, self.model().index(row)).height()
+            if height >= MAX_VIEW_HEIGHT:
+                break
+        self.setFixedHeight(min(height, MAX_VIEW_HEIGHT) + 2 * self.frameWidth())
+
+    def row_at(self, pos):
+        """The row a card dropped at pos (in this view's coordinates) goes in"""
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return self.model().rowCount()
+        rect = self.visualRect(index)
+        return index.row() + (1 if pos.y() > rect.center().y() else 0)
+
+    def startDrag(self, supported_actions):
+        # Like TodoCardWidget.mouseMoveEvent. QListView's own startDrag would remove the row itself after a move.
+        indexes = self.selectedIndexes()
+        if indexes:
+            drag = QtGui.QDrag(self)
+            drag.setMimeData(self.model().mimeData(indexes))
+            drag.exec_()
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        index = self.indexAt(event.pos())
+        if event.button() == QtCore.Qt.LeftButton and index.isValid():
+            from .widgets import CardDialog
+            item = index.data(CardListModel.CardRole)
+            CardDialog(item.model, widget=item).exec_()
+
+    def contextMenuEvent(self, event):
+        index = self.indexAt(event.pos())
+        if not index.isValid():
+            return
+        item = index.data(CardListModel.CardRole)
+        menu = QtWidgets.QMenu()
+        a = DeleteAction(item)
+        menu.addAction(a)
+        menu.exec_(event.globalPos())
+        if a.widget_deleted:
+            self.parent_list_widget.remove_card(item, delete_model=False)  # model is already deleted by the action.
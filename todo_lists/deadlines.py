@@ -0,0 +1,124 @@
+"""
+One scheduler for every card's due date, instead of a coroutine per card that wakes up to check it. A due date goes
+from STATE_NORMAL to STATE_SOON a day before it, then to STATE_OVERDUE. The scheduler keeps the next of those
+transitions for each watched due date in a min-heap, and has a single loop.call_later() for the earliest, so it wakes
+up exactly when some card has to be restyled and calls back only that card's watcher. Watching or unwatching is
+O(log n); with nothing coming up there's no timer at all.
+"""
+import asyncio
+import datetime
+import heapq
+import itertools
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+STATE_NORMAL = "normal"
+STATE_SOON = "soon"
+STATE_OVERDUE = "overdue"
+SOON = datetime.timedelta(days=1)
+
+# The loop's timers use a monotonic clock, which doesn't count time the computer spent asleep, and QTimer can't wait
+# more than ~24 days anyway, so longer waits are split up. After a suspend, cards catch up within this long.
+MAX_DELAY = 60 * 60  # seconds
+
+
+def state(due_date, now=None):
+    if due_date is None:
+        return STATE_NORMAL
+    time_left = due_date - (datetime.datetime.now() if now is None else now)
+    if time_left <= datetime.timedelta(days=0):
+        return STATE_OVERDUE
+    if time_left <= SOON:
+        return STATE_SOON
+    return STATE_NORMAL
+
+
+def next_transition(due_date, now):
+    """When due_date's state changes next, or None if it's overdue (or None) already"""
+    if due_date is None or due_date <= now:
+        return None
+    if due_date - SOON > now:
+        return due_date - SOON
+    return due_date
+
+
+class DeadlineScheduler:
+    def __init__(self, clock=datetime.datetime.now):
+        self.clock = clock
+        self.heap = []  # [(transition time, watch number, key)]
+        self.watches = {}  # {key: (watch number, due date, callback)}
+        self.stale = 0  # heap entries of keys that were unwatched or watched again since
+        self.counter = itertools.count()
+        self.handle = None
+        self.handle_when = None
+
+    def watch(self, key, due_date, callback):
+        """
+        callback(state) is called whenever due_date's state changes, until unwatch(key). Watching a key again replaces
+        its due date and callback. Returns the current state.
+        """
+        if key in self.watches:
+            self.stale += 1
+        number = next(self.counter)
+        self.watches[key] = (number, due_date, callback)
+        now = self.clock()
+        when = next_transition(due_date, now)
+        if when is not None:
+            heapq.heappush(self.heap, (when, number, key))
+            if self.handle_when is None or when < self.handle_when:
+                self.schedule()
+        return state(due_date, now)
+
+    def unwatch(self, key):
+        if self.watches.pop(key, None) is not None:
+            self.stale += 1  # its heap entry is skipped when it comes up, or dropped by compact()
+            if self.stale > 64 and self.stale > len(self.heap) // 2:
+                self.compact()
+
+    def compact(self):
+        self.heap = [entry for entry in self.heap if self.is_current(entry)]
+        heapq.heapify(self.heap)
+        self.stale = 0
+
+    def is_current(self, entry):
+        watch = self.watches.get(entry[2])
+        return watch is not None and watch[0] == entry[1]
+
+    def schedule(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = self.handle_when = None
+        while self.heap and not self.is_current(self.heap[0]):
+            heapq.heappop(self.heap)
+            self.stale = max(0, self.stale - 1)
+        if not self.heap:
+            return
+        self.handle_when = self.heap[0][0]
+        delay = (self.handle_when - self.clock()).total_seconds() + 0.001  # not a hair early
+        self.handle = asyncio.get_event_loop().call_later(min(max(delay, 0), MAX_DELAY), self.fire)
+
+    def fire(self):
+        self.handle = self.handle_when = None
+        now = self.clock()
+        due = []
+        while self.heap and self.heap[0][0] <= now:
+            entry = heapq.heappop(self.heap)
+            if not self.is_current(entry):
+                self.stale = max(0, self.stale - 1)
+                continue
+            number, due_date, callback = self.watches[entry[2]]
+            when = next_transition(due_date, now)
+            if when is not None:
+                heapq.heappush(self.heap, (when, number, entry[2]))
+            due.append((callback, state(due_date, now)))
+        self.schedule()
+        for callback, new_state in due:
+            try:
+                callback(new_state)
+            except Exception:  # one broken watcher shouldn't keep the other cards from being restyled
+                logger.error(f"\n\nERROR in a due date callback ({new_state}):", exc_info=sys.exc_info())
+
+
+scheduler = DeadlineScheduler()
@@ -0,0 +1,102 @@
+"""
+The EmailChecker that turns Google Classroom emails into to-do cards. Its own module so main.py only imports
+email_checking (and its parsing and IMAP code) once the checker is started, after the window is shown.
+"""
+import functools
+import random
+
+from PySide2 import QtWidgets
+
+from project_sqlalchemy_globals import Session, after_commit
+from settings.models import Setting
+from . import email_checking, ordering
+from .models import TodoListModel, TodoCardModel, TodoLabelModel
+
+
+class TodoCardEmailChecker(email_checking.EmailChecker):
+    def __init__(self, main_tab_widget, accounts=None):
+        self.upper = main_tab_widget
+        self.reported_offline = False
+        super().__init__(accounts)
+
+    def on_account_error(self, account, error):
+        if isinstance(error, OSError) and not isinstance(error, ConnectionRefusedError):
+            # ex. socket.gaierror when offline. The checker keeps retrying, so this is only shown once
+            if not self.reported_offline and Setting.get_bool("Offline Notification", True):
+                self.reported_offline = True
+                mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Offline",
+                                           "Unable to connect to the internet. Some features, such as auto-generated "
+                                           "to-do cards from Google Classroom emails, may be unavailable. This message"
+                                           " can be disabled in the settings menu.")
+                mb.exec_()
+            return True
+
+        if isinstance(error, email_checking.IMAPError) and "AUTHENTICATIONFAILED" in str(error):
+            mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Invalid Email Credentials",
+                                       f"The email login information for {account.address} is incorrect. "
+                                       f"Auto-generated to-do cards from its Google Classroom emails will be "
+                                       f"unavailable. You can disable Google Classroom emails in settings.")
+            mb.exec_()
+            return False
+
+        if isinstance(error, ConnectionRefusedError):
+            mb = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Information, "Invalid IMAP URL",
+                                       f"The IMAP url provided in settings for {account.address} is invalid. "
+                                       f"Auto-generated to-do cards from its Google Classroom emails will be "
+                                       f"unavailable. You can disable Google Classroom emails in settings.")
+            mb.exec_()
+            return False
+
+        return super().on_account_error(account, error)
+
+    def is_known_message(self, message_id):
+        return TodoCardModel.exists_for_message(message_id)
+
+    def on_new_assignment(self, title, subject, date, description, message_id=None, **kwargs):
+        list_name = Setting.get("Assignments List").value
+        list_model = Session.query(TodoListModel).filter(TodoListModel.title == list_name).first()
+        try:
+            print(self.upper.todo_widget.lists)
+            list_widget = self.upper.todo_widget.lists[list_model.id]
+            model = TodoCardModel(list_model, title, description, date, labels=[TodoLabelModel.get_or_create(subject, color=f'#{"".join((random.choice(list("0123456789ABCDEF")) for i in range(6)))}')],
+                                  source_message_id=message_id)
+            self.add_card(list_widget, model)
+        except KeyError:
+            box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Critical, "Invalid List",
+                                        f'Invalid list "{list_name.title}" selected as Assignments List. Please '
+                                        f"select another in settings. You can also disable google classroom emails "
+                                        f"integration there")
+            box.exec_()
+            raise self.ExitError("Invalid list")
+        print("DONE")
+
+    def on_new_material(self, title, subject, description, message_id=None, **kwargs):
+        list_name = Setting.get("Materials List").value
+        list_model = Session.query(TodoListModel).filter(TodoListModel.title == list_name).first()
+        try:
+            list_widget = self.upper.todo_widget.lists[list_model.id]
+            model = TodoCardModel(list_model, title, description, None, labels=[TodoLabelModel.get_or_create(subject, color=f'#{"".join((random.choice("0123456789ABCDEF") for _ in range(6)))}')],
+                                  source_message_id=message_id)
+            self.add_card(list_widget, model)
+        except KeyError:
+            box = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Critical, "Invalid List",
+                                        f'Invalid list "{list_name.title}" selected as Materials List. Please '
+                                        f"select another in settings. You can also disable google classroom emails "
+                                        f"integration there")
+            box.exec_()
+            raise self.ExitError("Invalid list")
+
+    def add_card(self, list_widget, model):
+        """
+        Puts model, just made in list_widget's list, at its end. This runs in AccountIngester.flush()'s transaction, so
+        the card is only shown once that has committed: one that's rolled back never shows up on the board, and isn't
+        shown twice once its email is checked again.
+        """
+        others = [card for card in list_widget.model.cards if card is not model]
+        model.position = ordering.position_at(list_widget.model, others, len(others))
+        model.save()
+        after_commit(functools.partial(self.show_card, list_widget, model))
+
+    @staticmethod
+    def show_card(list_widget, model):
+        list_widget.insert_card(list_widget.make_card(model))
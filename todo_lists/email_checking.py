@@ -1,16 +1,21 @@
-import imaplib
-import email, email.policy
+import email, email.policy, email.parser
 import datetime
+import hashlib
+import json
 from settings.models import Setting
-import time
+from project_sqlalchemy_globals import transaction
 import base64
 import binascii
+import quopri
+import itertools
+import concurrent.futures
+import multiprocessing
+import os
 import logging
 import sys
 import asyncio
-import threading
-import queue
-from sqlalchemy import orm, create_engine
+import re
+from .aioimap import IMAPConnectionPool, IMAPError
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -24,31 +29,495 @@ stream_handler = logging.StreamHandler(sys.stdout)
 stream_handler.setFormatter(formatter)
 logger.addHandler(stream_handler)
 
+CHECK_MODE_PUSH = "Push (IMAP IDLE)"
+CHECK_MODE_POLLING = "Polling"
+CHECK_MODES = (CHECK_MODE_PUSH, CHECK_MODE_POLLING)
+
+IDLE_TIMEOUT = 29 * 60  # RFC 2177: clients should re-issue IDLE at least every 29 minutes
+POLL_INTERVAL_MIN = 1
+POLL_INTERVAL_MAX = 60
+RETRY_DELAY_MIN = 5  # after an error (ex. offline), an account is retried with back-off between these
+RETRY_DELAY_MAX = 5 * 60
+
+CONNECTIONS_PER_ACCOUNT = 2  # one sits in IDLE, the other fetches
+
+DEFAULT_CHUNK_SIZE = 100  # messages per UID FETCH while catching up
+RESYNC_LIMIT = 200  # newest messages re-checked when the mailbox's UIDVALIDITY changes
+BULK_PARSE_THRESHOLD = 50  # messages in a chunk before parsing moves to worker processes
+# new cards and the checkpoint after them are committed together once this many messages were checked, or this many
+# seconds after the first uncommitted one, instead of once per chunk
+CHECKPOINT_FLUSH_MESSAGES = 500
+CHECKPOINT_FLUSH_INTERVAL = 0.5
+
+HEADER_FIELDS = "SUBJECT FROM DATE MESSAGE-ID"  # all that's needed to decide if a message should become a card
+
+_HEADER_RE = re.compile(r" posted a new (?P<type>\w+) in (?P<subject>.*?)<https://classroom\.google\.com/c/", re.DOTALL)
+_OPEN_LINK_RE = re.compile(r"\n(?:OPEN|Open)  \n<https://classroom\.google\.com/c/")
+_DUE_PREFIX_RE = re.compile(r"Due: |New assignment Due ")
+_SPACES_RE = re.compile(r" {2,}")
+
+# parens, quoted strings, literal markers ({n}, their data is a separate part in imaplib's responses) and atoms, where
+# atoms like BODY[HEADER.FIELDS (SUBJECT)] keep their brackets
+_FETCH_TOKEN_RE = re.compile(rb'\(|\)|"(?:[^"\\]|\\.)*"|\{\d+\}$|[^\s()"\[]+(?:\[[^\]]*\](?:<\d+>)?)?')
+
+
+def is_classroom_notification(headers):
+    subject = headers["subject"] or ""
+    return (("New assignment" in subject or "New material" in subject)
+            and (headers["from"] or "").endswith("classroom.google.com>"))
+
+
+def message_source_id(headers, text=None):
+    """
+    The Message-ID header, which stays the same if the mailbox is renumbered or the checkpoint is lost. The rare message
+    without one gets a hash of its headers and raw text instead, or None if the text isn't given.
+    """
+    message_id = (headers["message-id"] or "").strip()
+    if message_id:
+        return message_id
+    if text is None:
+        return None
+    digest = hashlib.sha1("\0".join(str(headers[name] or "") for name in ("from", "date", "subject")).encode())
+    digest.update(text)
+    return f"sha1:{digest.hexdigest()}"
+
+
+def _tokenize_fetch_line(line):
+    for token in _FETCH_TOKEN_RE.findall(line):
+        if token in (b"(", b")"):
+            yield token.decode()  # str, so they can't be mistaken for a quoted "(" or ")"
+        elif token.startswith(b'"'):
+            yield re.sub(rb"\\(.)", rb"\1", token[1:-1])
+        elif token.startswith(b"{"):
+            continue
+        elif token.upper() == b"NIL":
+            yield None
+        else:
+            yield token
+
+
+def parse_fetch_response(data):
+    """
+    Turns the data of an imaplib UID FETCH into {uid: {item name: value}}. Values are bytes, None or nested lists of
+    them, so a BODYSTRUCTURE comes out as nested lists. Responses without a UID (ex. unsolicited flag updates) are
+    dropped.
+    """
+    stack = [[]]
+    for part in data:
+        if isinstance(part, tuple):  # (line ending in a {n} literal marker, literal data)
+            parts = (part[0], part[1])
+        else:
+            parts = (part,)
+
+        for i, line in enumerate(parts):
+            if i == 1:
+                stack[-1].append(line)
+                continue
+            for token in _tokenize_fetch_line(line or b""):
+                if token == "(":
+                    stack.append([])
+                elif token == ")":
+                    finished = stack.pop()
+                    stack[-1].append(finished)
+                else:
+                    stack[-1].append(token)
+
+    messages = {}
+    response = stack[0]
+    for i in range(1, len(response), 2):  # alternating sequence number, item list
+        items = {name.upper(): value for name, value in zip(response[i][::2], response[i][1::2])}
+        if b"UID" in items:
+            messages[int(items[b"UID"])] = items
+    return messages
+
+
+def get_body_section(items):
+    """Returns the data of the (only) BODY[...] item in a parsed FETCH response"""
+    for name, value in items.items():
+        if name.startswith(b"BODY["):
+            return value
+
+
+def find_text_part(structure, part_number=""):
+    """Returns (part number, transfer encoding, charset) of the first text/plain part in a parsed BODYSTRUCTURE"""
+    if isinstance(structure[0], list):  # multipart, the sub-parts come before the subtype and extension data
+        for i, child in enumerate(itertools.takewhile(lambda p: isinstance(p, list), structure), 1):
+            found = find_text_part(child, f"{part_number}.{i}" if part_number else str(i))
+            if found is not None:
+                return found
+        return None
+
+    if (structure[0] or b"").lower() != b"text" or (structure[1] or b"").lower() != b"plain":
+        return None
+    params = structure[2] or []
+    params = {name.lower(): value for name, value in zip(params[::2], params[1::2])}
+    return part_number or "1", (structure[5] or b"7bit").lower(), params.get(b"charset", b"utf-8").decode()
+
+
+def decode_part(data, encoding, charset):
+    if encoding == b"base64":
+        data = base64.b64decode(data)
+    elif encoding == b"quoted-printable":
+        data = quopri.decodestring(data)
+    try:
+        return data.decode(charset, errors="replace")
+    except LookupError:  # unknown charset
+        return data.decode(errors="replace")
+
+
+def parse_classroom_email(subject, text):
+    """
+    Parses the subject and decoded text/plain body of a Classroom notification into on_new_* kwargs. Each field is found
+    by searching forward from the previous one, so the body is only scanned once. Raises IndexError if the text isn't
+    shaped like a notification.
+    """
+    classroom_type = subject.split(" ", 2)[1].lower().replace(":", "")
+    og_title = subject.split('"', 1)[1][:-1].replace("\r", "").replace("\n ", "\n")
+    title = _SPACES_RE.sub(" ", og_title.replace("\n", "")).strip(" ")
+    text = text.replace("\r", "")
+
+    # Ms. Smith posted a new assignment in Biology <https://classroom.google.com/c/...>.
+    header = _HEADER_RE.search(text)
+    if header is None or header.group("type") != classroom_type:
+        raise IndexError("Not a classroom notification")
+    subject_label = header.group("subject")
+    body_start = text.find(">.\n\n", header.end())
+    found_class_link = body_start != -1
+    body_start = header.end() if body_start == -1 else body_start + 4
+
+    # Due: Oct 20 (assignments only)
+    # {title}
+    # {description}
+    # OPEN
+    # <https://classroom.google.com/c/.../details>
+    title_used = og_title if og_title in text else title
+    title_start = text.find(title_used, body_start)
+    if title_start == -1:
+        title_start = text.find(title_used)
+    if title_start == -1:
+        raise IndexError("Title not found in text")
+    description_start = title_start + len(title_used)
+
+    open_link = _OPEN_LINK_RE.search(text, description_start)
+    if open_link is None:
+        raise IndexError("Classroom link not found in text")
+    next_title = text.find(title_used, description_start, open_link.start())
+    description = text[description_start:open_link.start() if next_title == -1 else next_title]
+
+    url_end = text.find("/details>\n", open_link.end())
+    url = f"https://classroom.google.com/c/{text[open_link.end():url_end if url_end != -1 else None]}"
+    description = f"{url}\n\n{description}".replace("\n", "<br>")
+
+    date = None
+    if classroom_type == "assignment" and found_class_link:
+        date_end = text.find(f"\n{title}", body_start)
+        date = _DUE_PREFIX_RE.sub("", text[body_start:date_end if date_end != -1 else None])
+        try:
+            date = datetime.datetime.strptime(date, "%b %d")
+            # If the date is in or past Jan, but before Sep, year is increased by 1
+            date = date.replace(
+                year=datetime.datetime.now().year + 1 if 9 > date.month >= 1 else datetime.datetime.now().year)
+        except ValueError:
+            date = None
+
+    logger.info("Generating card for: Subject: %s", subject)
+    logger.debug("parsed: type=%r title=%r subject=%r date=%r url=%r", classroom_type, title, subject_label, date, url)
+    return {"type": classroom_type, "title": title, "subject": subject_label, "date": date, "description": description}
+
+
+def parse_raw_classroom_email(subject, raw_text, encoding, charset):
+    """
+    Decodes and parses a raw text/plain part. Returns None for a message that isn't a parsable notification, so this can
+    run in worker processes without one bad message failing the whole batch.
+    """
+    try:
+        return parse_classroom_email(subject, decode_part(raw_text, encoding, charset))
+    except (AssertionError, IndexError):
+        return None
+
+
+def parse_raw_classroom_emails(jobs):
+    """parse_raw_classroom_email() for a list of (subject, raw text, encoding, charset), run in a worker process"""
+    return [parse_raw_classroom_email(*job) for job in jobs]
+
+
+class EmailAccount:
+    def __init__(self, address, password, imap_url, port=993, use_ssl=True, checkpoint_suffix=""):
+        """
+        checkpoint_suffix keeps each account's checkpoint in its own Setting rows. The first account has none, so it
+        keeps using the rows from before there could be more than one.
+        """
+        self.address = address
+        self.password = password
+        self.imap_url = imap_url
+        self.port = port
+        self.use_ssl = use_ssl
+        self.checkpoint_name = f"email_latest_message_uid{checkpoint_suffix}"
+        self.uidvalidity_name = f"email_uidvalidity{checkpoint_suffix}"
+
+    def __repr__(self):
+        return f"<EmailAccount {self.address}>"
+
+
+def load_email_accounts():
+    """The account in the Email Address/Password/IMAP URL settings, then any in the Additional Email Accounts setting"""
+    accounts = []
+    address = Setting.get_or_create("Email Address").value
+    if address:
+        accounts.append(EmailAccount(address, Setting.get_or_create("Email Password").value,
+                                     Setting.get_or_create("Email IMAP URL").value))
+    for account in json.loads(Setting.get_or_create("Additional Email Accounts", "[]").value or "[]"):
+        accounts.append(EmailAccount(account["address"], account["password"], account["imap_url"],
+                                     checkpoint_suffix=f":{account['address']}"))
+    return accounts
+
+
+class AccountIngester:
+    """Checks one account for new Classroom emails, using its own pool of connections and its own checkpoint"""
+    def __init__(self, checker, account):
+        self.checker = checker
+        self.account = account
+        self.pool = IMAPConnectionPool(account, CONNECTIONS_PER_ACCOUNT)
+        self.latest_checked_email_uid = None  # the committed checkpoint
+        self.checked_uidvalidity = None
+        self.checked_uid = None  # how far checking got, including messages that aren't committed yet
+
+        self.pending = []  # parsed emails waiting to be committed along with pending_uid as the checkpoint
+        self.pending_uid = None
+        self.pending_count = 0
+        self.flush_handle = None
+
+    async def run(self):
+        retry_delay = RETRY_DELAY_MIN
+        while True:
+            try:
+                await self.checker.catch_up(self)
+                await self.watch()
+            except self.checker.ExitError:
+                self.checker.stop()
+                return
+            except Exception as e:  # run at all costs
+                if not self.checker.on_account_error(self.account, e):
+                    return
+                logger.error(f"\n\nERROR checking {self.account.address}:", exc_info=sys.exc_info())
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, RETRY_DELAY_MAX)
+
+    async def catch_up(self):
+        logger.info(f"{'=' * 100}\nStarting {self.account.address}!")
+        self.flush()  # anything checked before an error, so the checkpoint read below is up to date
+        async with self.pool.connection() as conn:
+            info = await conn.select("INBOX")
+            latest_email_uid = info["UIDNEXT"] - 1
+            logger.info(f"Latest uid in inbox: {latest_email_uid}\n")
+
+            self.latest_checked_email_uid = Setting.get(self.account.checkpoint_name)
+            self.checked_uidvalidity = Setting.get(self.account.uidvalidity_name)
+
+            if self.latest_checked_email_uid is None:
+                # change value to 1 to check all emails.
+                self.latest_checked_email_uid = Setting(name=self.account.checkpoint_name, value=latest_email_uid)
+            elif self.checked_uidvalidity is not None and int(self.checked_uidvalidity.value) != info["UIDVALIDITY"]:
+                # The mailbox was reset, so the saved uid means nothing anymore. Only the newest messages are re-checked.
+                self.latest_checked_email_uid.value = await self.get_resync_uid(conn, info["EXISTS"])
+                logger.warning(f"UIDVALIDITY changed ({self.checked_uidvalidity.value} -> {info['UIDVALIDITY']}), "
+                               f"re-checking messages after uid {self.latest_checked_email_uid.value}")
+
+            if self.checked_uidvalidity is None:
+                self.checked_uidvalidity = Setting(name=self.account.uidvalidity_name)
+            with transaction():
+                self.checked_uidvalidity.value = info["UIDVALIDITY"]
+                self.checked_uidvalidity.save()
+                self.latest_checked_email_uid.save()
+
+            self.checked_uid = int(self.latest_checked_email_uid.value)
+            await self.check_emails(conn, self.checked_uid + 1, latest_email_uid)
+
+    async def watch(self):
+        async with self.pool.connection() as watcher:
+            await watcher.select("INBOX", readonly=True)
+            use_idle = self.checker.CHECK_MODE == CHECK_MODE_PUSH and b"IDLE" in watcher.capabilities
+            if self.checker.CHECK_MODE == CHECK_MODE_PUSH and not use_idle:
+                logger.info(f"{self.account.imap_url} does not support IDLE, falling back to polling")
+            poll_interval = POLL_INTERVAL_MIN
+
+            while True:
+                if use_idle:  # the watcher stays in IDLE, so new emails are fetched on another connection
+                    async with self.pool.connection() as conn:
+                        found_new = await self.check_new(conn)
+                else:
+                    found_new = await self.check_new(watcher)
+
+                if found_new:  # check again before waiting, in case more arrived while these were being processed
+                    poll_interval = POLL_INTERVAL_MIN
+                elif use_idle:
+                    await watcher.idle(IDLE_TIMEOUT)
+                else:
+                    # back off while the inbox is quiet, so an idle inbox costs a request a minute instead of one a second
+                    await asyncio.sleep(poll_interval)
+                    poll_interval = min(poll_interval * 2, POLL_INTERVAL_MAX)
+
+    async def check_new(self, conn):
+        """Checks emails newer than the checkpoint. Returns True if there were any."""
+        if conn.selected != "INBOX":
+            await conn.select("INBOX")
+        await conn.command("NOOP")  # lets the server tell this connection about messages that arrived since its last command
+        latest_email_uid = self.checked_uid
+        # "n:*" always matches the newest message, even if its uid is below n
+        new_uids = [uid for uid in await conn.uid_search(f"UID {latest_email_uid + 1}:*") if uid > latest_email_uid]
+        if new_uids:
+            await self.check_emails(conn, min(new_uids), max(new_uids))
+        return bool(new_uids)
+
+    async def check_emails(self, conn, first_uid, last_uid):
+        """
+        Checks every message with a uid in [first_uid, last_uid], CHUNK_SIZE uids at a time. Cards for new emails are
+        made, and the checkpoint saved, when the checked messages are flushed.
+
+        Only messages from Classroom are looked at, and of those only the headers of each are downloaded until it is
+        known to be a new assignment or material. Then only its text/plain part is downloaded, never the html or
+        attachments.
+        """
+        chunk_size = self.checker.CHUNK_SIZE
+        total = last_uid - first_uid + 1
+        for chunk_start in range(first_uid, last_uid + 1, chunk_size):
+            chunk_end = min(chunk_start + chunk_size - 1, last_uid)
+
+            text_parts = {}
+            headers = await self.fetch_headers(conn, await self.search_classroom_uids(conn, chunk_start, chunk_end))
+            for uid, (message_headers, structure) in headers.items():
+                text_part = find_text_part(structure)
+                source_id = message_source_id(message_headers)
+                if source_id is not None and self.checker.is_known_message(source_id):
+                    logger.info(f"ALREADY HAS CARD: Subject: {[message_headers['subject']]}")
+                elif is_classroom_notification(message_headers) and text_part is not None:
+                    text_parts[uid] = (message_headers, text_part)
+                else:
+                    logger.info(f'''IGNORED: Subject: {[message_headers['subject']]} | Received: {message_headers["Date"]}''')
+
+            raw_texts = await self.fetch_text_parts(conn, {uid: text_part for uid, (h, text_part) in text_parts.items()})
+            uids = sorted(raw_texts)
+            jobs = [(text_parts[uid][0]["subject"], raw_texts[uid], *text_parts[uid][1][1:]) for uid in uids]
+            parsed = []
+            for uid, args in zip(uids, await self.checker.parse_raw_emails(jobs)):
+                message_headers = text_parts[uid][0]
+                if args is None:
+                    logger.info(f'''IGNORED: Subject: {[message_headers['subject']]} | Received: {message_headers["Date"]}''')
+                else:
+                    args["message_id"] = message_source_id(message_headers, raw_texts[uid])
+                    parsed.append(args)
+            self.add_pending(parsed, chunk_end, chunk_end - chunk_start + 1)
+            self.checker.on_progress(self.account, chunk_end - first_uid + 1, total)
+
+    def add_pending(self, parsed, checked_uid, checked_count):
+        """Queues emails for flush(), which happens right away if enough messages are waiting, otherwise soon"""
+        self.pending += parsed
+        self.pending_uid = self.checked_uid = checked_uid
+        self.pending_count += checked_count
+        if self.pending_count >= CHECKPOINT_FLUSH_MESSAGES:
+            self.flush()
+        elif self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(CHECKPOINT_FLUSH_INTERVAL, self.flush_later)
+
+    def flush(self):
+        """
+        Makes cards for the pending emails and saves the checkpoint after them in one transaction, so after a crash
+        either both were saved or neither was and the emails are checked again: never lost and never duplicated.
+        If it fails, the pending emails are dropped and checking rewinds to the saved checkpoint. So on_new_emails() should
+        only show what it made once it's committed, with after_commit().
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        if self.pending_uid is None:
+            return
+        pending, pending_uid = self.pending, self.pending_uid
+        self.pending, self.pending_uid, self.pending_count = [], None, 0
+
+        try:
+            with transaction():
+                if pending:
+                    self.checker.on_new_emails(pending)
+                self.latest_checked_email_uid.value = pending_uid
+                self.latest_checked_email_uid.save()
+        except BaseException:
+            self.checked_uid = int(self.latest_checked_email_uid.value)  # the rollback reloaded the saved value
+            raise
+
+    def flush_later(self):
+        try:
+            self.flush()
+        except self.checker.ExitError:
+            self.checker.stop()
+        except Exception:
+            # the emails are checked again next time new ones are looked for
+            logger.error(f"\n\nERROR saving emails from {self.account.address}:", exc_info=sys.exc_info())
+
+    @staticmethod
+    async def search_classroom_uids(conn, first_uid, last_uid):
+        """Returns the uids of messages from Classroom in [first_uid, last_uid], found server-side"""
+        uids = await conn.uid_search(f'UID {first_uid}:{last_uid} FROM "classroom.google.com"')
+        return [uid for uid in uids if first_uid <= uid <= last_uid]
+
+    @staticmethod
+    async def fetch_headers(conn, uids):
+        """Returns {uid: (header-only email.message.Message, parsed BODYSTRUCTURE)} for the given uids"""
+        if not uids:
+            return {}
+        data = await conn.uid_fetch(",".join(str(uid) for uid in uids),
+                                    f"(UID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])")
+        header_parser = email.parser.BytesHeaderParser()
+        return {uid: (header_parser.parsebytes(get_body_section(items) or b""), items[b"BODYSTRUCTURE"])
+                for uid, items in parse_fetch_response(data).items()}
+
+    @staticmethod
+    async def fetch_text_parts(conn, text_parts):
+        """
+        text_parts is {uid: (part number, transfer encoding, charset)}, as returned by find_text_part(). Returns
+        {uid: raw (still transfer encoded) text} with one request per distinct part number (usually just one).
+        """
+        uids_by_part = {}
+        for uid, (part_number, encoding, charset) in text_parts.items():
+            uids_by_part.setdefault(part_number, []).append(uid)
+
+        texts = {}
+        for part_number, uids in uids_by_part.items():
+            data = await conn.uid_fetch(",".join(str(uid) for uid in uids), f"(UID BODY.PEEK[{part_number}])")
+            for uid, items in parse_fetch_response(data).items():
+                if uid in text_parts:
+                    texts[uid] = get_body_section(items) or b""
+        return texts
+
+    @staticmethod
+    async def get_resync_uid(conn, message_count):
+        """Returns the uid to resume after when the saved checkpoint is invalid, so at most RESYNC_LIMIT are re-checked"""
+        if message_count <= RESYNC_LIMIT:
+            return 0
+        data = await conn.fetch(str(message_count - RESYNC_LIMIT), "(UID)")
+        return int(re.search(rb"UID (\d+)", data[0]).group(1))
+
 
 class EmailChecker:
+    """
+    Checks every configured account for new Classroom emails, all from the running (qt) event loop. Subclasses handle
+    what to do with them in on_new_assignment() and on_new_material().
+    """
     class ExitError(Exception):
-        """indicates self.run_forever() should exit. Not used in base class"""
+        """indicates the checker should stop. Not used in base class"""
         pass
 
-    def __init__(self):
-        self.EMAIL_ADDRESS = Setting.get_or_create("Email Address").value
-        self.PWD = Setting.get_or_create("Email Password").value
-
-        self.ASSIGNMENTS_LIST = Setting.get_or_create("Email Address").value
-        self.MATERIALS_LIST = Setting.get_or_create("Email Address").value
-
-        self.IMAP_URL = Setting.get_or_create("Email IMAP URL").value
-        self.IMAP_PORT = 993
+    def __init__(self, accounts=None):
+        """accounts defaults to load_email_accounts(). Passing them in allows pointing at a local fake server."""
+        self.accounts = load_email_accounts() if accounts is None else accounts
+        self.CHECK_MODE = Setting.get_or_create("Email Check Mode", CHECK_MODE_PUSH).value
+        self.CHUNK_SIZE = max(Setting.get_int("Email Fetch Chunk Size", DEFAULT_CHUNK_SIZE), 1)
 
-        self.thread = None
-        self.is_stopped = threading.Event()
-        self.queue = queue.Queue()
+        self.ingesters = []
         self.main_task = None
-
-        self.latest_checked_email_uid = None
-        self.imap_conn = imaplib.IMAP4_SSL(self.IMAP_URL, 993)
-        print(self.imap_conn.login(self.EMAIL_ADDRESS, self.PWD))
-        # self.imap_conn.debug = 5
+        self.parser_pool = None
+        self.parser_workers = None  # worker processes in parser_pool, None for one per core
+        self.parser_futures = set()  # batches submitted to parser_pool that haven't finished
+        self.catch_ups_running = 0
 
     def on_new_assignment(self, title, subject, date, description, **kwargs):
         raise NotImplementedError
@@ -56,165 +525,103 @@ class EmailChecker:
     def on_new_material(self, title, subject, description, **kwargs):
         raise NotImplementedError
 
+    def is_known_message(self, message_id):
+        """Whether a card was already made from this email (see message_source_id()), so it should be skipped"""
+        return False
+
+    def on_new_emails(self, batch):
+        for new in batch:
+            if new.get("message_id") is not None and self.is_known_message(new["message_id"]):
+                continue  # ex. the same email in two accounts, or checked again after a failed flush
+            if new["type"] == "assignment":
+                self.on_new_assignment(**new)
+            else:
+                self.on_new_material(**new)
+
+    def on_progress(self, account, checked, total):
+        logger.info(f"{account.address}: checked {checked}/{total} emails")
+
+    def on_account_error(self, account, error):
+        """Called when checking an account fails. Returns whether to try the account again later."""
+        return not (isinstance(error, IMAPError) and "AUTHENTICATIONFAILED" in str(error))
+
     def parse_email(self, email_message: email.message.Message):
-        assert "New assignment" in email_message["subject"] or "New material" in email_message["subject"]
-        assert email_message["from"].endswith("classroom.google.com>")
+        assert is_classroom_notification(email_message)
         assert email_message.is_multipart()  # payload 1 is raw text, 2 is html
 
-        logger.info(f'Generating card for: Subject: {email_message["subject"]}')
-        logger.debug(f"!!DEBUG{'=' * 100}")
-
         text = [msg.get_payload() for msg in email_message.get_payload() if msg.get_content_disposition() is None][0]
         try:  # Occasionally the the plaintext is b64 encoded for some reason?? idk
             text = base64.b64decode(text).decode()
         except (UnicodeDecodeError, binascii.Error):
             pass
-        text = text.replace("\r", "")
-        logger.debug(f"original text: \n {text}")
-
-        classroom_type = email_message["subject"].split(" ")[1].lower().replace(":", "")
-
-        logger.debug(f"classroom_type: {classroom_type}")
-        og_title = email_message["subject"].split('"', 1)[1][:-1].replace("\r", "").replace("\n ", "\n")
-        title = " ".join(og_title.split(' ')).replace("\n", "")
-        while "  " in title:
-            title = title.replace("  ", " ")
-        title = title[:-1] if title.endswith(" ") else title
-        title = title[1:] if title.startswith(" ") else title
-        logger.debug(f"title: {[title]}, {title.split(' ')}, {title.endswith(' ')}\nog_title: {[og_title]}")
-
-
-        subject_label = text.split("<https://classroom.google.com/c/")[0].split(f" posted a new {classroom_type} in ")[1]
-        logger.debug([f"subject_label: {subject_label}"])
-
-
+        return parse_classroom_email(email_message["subject"], text)
+
+    async def parse_raw_emails(self, jobs):
+        """
+        Parses [(subject, raw text, transfer encoding, charset)], returning the parsed dicts (None for ignored messages)
+        in the same order. Big batches, like the ones while catching up on a backlog, are spread over a pool of worker
+        processes so the parsing doesn't block the gui.
+        """
+        if len(jobs) < BULK_PARSE_THRESHOLD:
+            return parse_raw_classroom_emails(jobs)
+
+        if self.parser_pool is None:
+            # spawned, not forked: a fork would copy this process with qt's threads stopped mid-flight (and whatever
+            # locks they held) into each worker. A spawned worker imports this module fresh, so it's given the log level.
+            self.parser_pool = concurrent.futures.ProcessPoolExecutor(
+                self.parser_workers, mp_context=multiprocessing.get_context("spawn"),
+                initializer=logger.setLevel, initargs=(logger.level,))
+        batch_size = max(len(jobs) // (4 * (self.parser_workers or os.cpu_count() or 1)), 1)
+        futures = [self.parser_pool.submit(parse_raw_classroom_emails, jobs[i:i + batch_size])
+                   for i in range(0, len(jobs), batch_size)]
+        self.parser_futures.update(futures)
         try:
-            url = "https://classroom.google.com/c/{}".format(
-                text.split("\nOPEN  \n<https://classroom.google.com/c/")[1].split("/details>\n")[0])
-        except IndexError:
-            url = "https://classroom.google.com/c/{}".format(
-                text.split("\nOpen  \n<https://classroom.google.com/c/")[1].split("/details>\n")[0])
-        logger.debug(f"url: {url}")
-        logger.debug(f"text.split(title) debug: {text.split(title), len(text.split(title)), title in text, type(text)}")
+            # gather() keeps the order the batches were submitted in, so cards are still created (and checkpointed) in uid order
+            batches = await asyncio.gather(*(asyncio.wrap_future(future) for future in futures))
+        finally:
+            self.parser_futures.difference_update(futures)
+        return [args for batch in batches for args in batch]
+
+    def shutdown_parser_pool(self):
+        """
+        Lets the worker processes exit without waiting for them, cancelling the batches they haven't started (what
+        shutdown(cancel_futures=True) does, which needs python 3.9)
+        """
+        if self.parser_pool is None:
+            return
+        for future in self.parser_futures:
+            future.cancel()
+        self.parser_pool.shutdown(wait=False)
+        self.parser_pool = None
+
+    async def catch_up(self, ingester):
+        self.catch_ups_running += 1
         try:
-            description = text.split(og_title)[1].split("\nOPEN  \n<https://classroom.google.com/c/")[0].split(
-                "\nOpen  \n<https://classroom.google.com/c/")[0]
-        except IndexError:
-            description = text.split(title)[1].split("\nOPEN  \n<https://classroom.google.com/c/")[0].split(
-                "\nOpen  \n<https://classroom.google.com/c/")[0]
-
-        description = f"{url}\n\n{description}".replace("\n", "<br>")
-        logger.debug(f"description: {description}")
-
-        date = None
-        if classroom_type == "assignment":
-            try:
-                date = text.split(">.\n\n")[1].split(f"\n{title}")[0].replace("Due: ", "").replace(
-                    "New assignment Due ", "")
-                date = datetime.datetime.strptime(date, "%b %d")
-                # If the date is in or past Jan, but before Sep, year is increased by 1
-                date = date.replace(
-                    year=datetime.datetime.now().year + 1 if 9 > date.month >= 1 else datetime.datetime.now().year)
-            except ValueError:
-                date = None
-
-        logger.debug(f"date: {date}")
-        logger.debug(f"!!END_DEBUG{'=' * 100}\n\n")
-        return {"type": classroom_type, "title": title, "subject": subject_label, "date": date, "description": description}
-
-    def wait_for_emails(self):
-        print(threading.active_count())
-        logger.info(f"{'=' * 100}\nStarting!")
-        self.imap_conn.select('INBOX')
-        latest_email_uid = int(self.imap_conn.status("INBOX", '(UIDNEXT)')[1][0].decode().split("UIDNEXT")[1][:-1]) - 1
-        logger.info(f"Latest uid in inbox: {latest_email_uid} {type(latest_email_uid)}\n")
-
-        engine = create_engine('sqlite:///db.sqlite3', echo=False)
-        session = orm.sessionmaker(bind=engine)()
-        session.expire_on_commit = False
-
-        # SqlAlchemy objects can only be used in the thread they were created in, so gotta do this
-        self.latest_checked_email_uid = session.query(Setting).filter(Setting.name == "email_latest_message_uid").one_or_none()
-        print(self.latest_checked_email_uid)
-
-        if self.latest_checked_email_uid is None:
-            self.latest_checked_email_uid = Setting(name="email_latest_message_uid", value=latest_email_uid)  # change value to 1 to check all emails.
-            session.add(self.latest_checked_email_uid)
-            session.commit()
-
-        print(list(range(int(self.latest_checked_email_uid.value) + 1, latest_email_uid + 1)))
-        for i in range(int(self.latest_checked_email_uid.value), latest_email_uid + 1):
-            if self.is_stopped.is_set():
-                break
-
-            self.latest_checked_email_uid.value = i
-            session.add(self.latest_checked_email_uid)
-            session.commit()
-
-            print(f"Getting email uid: {i}")
-            msg = email.message_from_bytes(
-                self.imap_conn.uid("fetch", str(i), "(RFC822 BODY.PEEK[])")[1][0][1])
-            print(i)
-            try:
-                args = self.parse_email(msg)
-                self.queue.put(args)
-            except AssertionError:
-                logger.info(f'''IGNORED: Subject: {[msg['subject']]} | Received {msg["Date"]}''')
-            time.sleep(0.3)
-        latest_email_uid = int(self.latest_checked_email_uid.value)
-
-        while not self.is_stopped.is_set():
-            print(f"Trying email uid: {latest_email_uid + 1}")
-            msg = self.imap_conn.uid("fetch", str(latest_email_uid + 1), "(RFC822 BODY.PEEK[])")
-            print("e:", msg, type(msg), str(latest_email_uid + 1), latest_email_uid)
-            msg = msg[1][0]
-            if msg is not None:
-                msg = msg[1]  # noqa
-                print(type(msg))
-                latest_email_uid += 1
-                self.latest_checked_email_uid.value = latest_email_uid
-                session.add(self.latest_checked_email_uid)
-                session.commit()
-
-                try:
-                    msg = email.message_from_bytes(msg)
-                    args = self.parse_email(msg)
-                    self.queue.put(args)
-                except AssertionError:
-                    logger.info(f'''IGNORED: Subject: {[msg['subject']]} | Received: {msg["Date"]}''')
-            time.sleep(1)
-
-    def wait_for_emails_run_forever(self):
-        while not self.is_stopped.is_set():
-            try:
-                self.wait_for_emails()
-            except Exception as e:  # run at all costs
-                if type(e) in (self.ExitError, asyncio.CancelledError):
-                    break
-                else:
-                    logger.error("\n\nERROR in run_forever():", exc_info=sys.exc_info())
-            time.sleep(1)
+            await ingester.catch_up()
+        finally:
+            self.catch_ups_running -= 1
+            if self.catch_ups_running == 0:
+                # new emails come a few at a time after this, so the workers aren't needed
+                self.shutdown_parser_pool()
 
     async def main(self):
-        self.is_stopped.clear()
-        self.thread = threading.Thread(target=self.wait_for_emails_run_forever, daemon=True)
-        self.thread.start()
-        while not self.is_stopped.is_set():
-            try:
-                new = self.queue.get_nowait()
-
-                if new["type"] == "assignment":
-                    self.on_new_assignment(**new)
-                else:
-                    self.on_new_material(**new)
-            except queue.Empty:
-                pass
-            await asyncio.sleep(0.3)
+        self.ingesters = [AccountIngester(self, account) for account in self.accounts]
+        try:
+            await asyncio.gather(*(ingester.run() for ingester in self.ingesters))
+        finally:
+            for ingester in self.ingesters:
+                for conn in ingester.pool.free_connections:
+                    conn.close()
 
     def start(self):
-        self.is_stopped.clear()
         self.main_task = asyncio.get_event_loop().create_task(self.main())
 
     def stop(self):
-        self.is_stopped.set()
-        self.main_task.cancel()
+        for ingester in self.ingesters:
+            try:
+                ingester.flush()
+            except Exception:  # includes ExitError, the checker is stopping anyway
+                logger.error(f"\n\nERROR saving emails from {ingester.account.address}:", exc_info=sys.exc_info())
+        if self.main_task is not None:
+            self.main_task.cancel()
+        self.shutdown_parser_pool()
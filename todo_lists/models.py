@@ -1,21 +1,22 @@
 import json
 
 import sqlalchemy.exc
-from sqlalchemy import orm, create_engine, Table, Column, Integer, String, Sequence, ForeignKey, DateTime
-from project_sqlalchemy_globals import Session, Base, engine
+from sqlalchemy import orm, create_engine, Table, Column, Integer, String, Sequence, ForeignKey, DateTime, Index, func
+from project_sqlalchemy_globals import Session, Base, engine, commit, transaction
+from .ordering import sort_key
 import typing
 
 
 class CoolerModel:
     def save(self):
         Session.add(self)
-        Session.commit()
+        commit()
 
 
 class TodoListModel(Base):
     __tablename__ = "todo_lists"
     id = Column(Integer, primary_key=True)
-    title = Column(String)
+    title = Column(String, index=True, unique=True)
     cards = orm.relationship("TodoCardModel", back_populates="list")  # one-to-many
 
     def __init__(self, title):
@@ -48,19 +49,21 @@ class TodoListModel(Base):
     def save(self):
         print(f"SAVING {self.title}", [c.title for c in self.cards])
         Session.add(self)
-        Session.commit()
+        commit()
 
 
 card_labels_m2m = Table("todo_card_labels_m2m", Base.metadata,
                         Column("card_id", ForeignKey("todo_cards.id"), primary_key=True),
-                        Column("label_id", ForeignKey("todo_labels.id"), primary_key=True)
+                        Column("label_id", ForeignKey("todo_labels.id"), primary_key=True),
+                        # the primary key index starts with card_id, so it can't find the cards of a label
+                        Index("ix_todo_card_labels_m2m_label_id", "label_id")
                         )
 
 
 class TodoLabelModel(Base):
     __tablename__ = "todo_labels"
     id = Column(Integer, primary_key=True)
-    name = Column(String)
+    name = Column(String, index=True, unique=True)
     color = Column(String)
     cards = orm.relationship("TodoCardModel", secondary=card_labels_m2m, back_populates="labels")  # many-to-many
 
@@ -75,32 +78,36 @@ class TodoLabelModel(Base):
         if a is None:
             a = cls(name=name, color=color)
             Session.add(a)
-            Session.commit()
+            commit()
         return a
 
     def save(self):
         Session.add(self)
-        Session.commit()
+        commit()
 
 
 class TodoCardModel(Base):
     __tablename__ = "todo_cards"
+    __table_args__ = (Index("ix_todo_cards_list_id_position", "list_id", "position"),)  # a list's cards, in order
     id = Column(Integer, primary_key=True)
     title = Column(String)
     description = Column(String)
-    due_date = Column(DateTime)
+    due_date = Column(DateTime, index=True)
     position = Column(Integer)
+    # Message-ID (or a hash, see email_checking.message_source_id) of the email the card was made from, if any
+    source_message_id = Column(String, index=True, unique=True)
     list_id = Column(Integer, ForeignKey("todo_lists.id"))  # both this and the one below are necessary
     list = orm.relationship("TodoListModel")  # many-to-one
     labels = orm.relationship(TodoLabelModel, secondary=card_labels_m2m, back_populates="cards")  # many-to-many
 
-    def __init__(self, parent_list, title, description, due_date, position=None, labels=None,):
+    def __init__(self, parent_list, title, description, due_date, position=None, labels=None, source_message_id=None):
         self.list = parent_list
         self.title = title
         self.description = description
         self.due_date = due_date
         self.position = position if position is not None else 0
         self.labels = [] if labels is None else labels
+        self.source_message_id = source_message_id
 
         self.save()
 
@@ -108,8 +115,49 @@ class TodoCardModel(Base):
     def from_db_init(self):
         pass
 
+    @classmethod
+    def exists_for_message(cls, message_id):
+        """Whether a card was already made from the email with this source id. One lookup in the unique index."""
+        return Session.query(cls.id).filter(cls.source_message_id == message_id).first() is not None
+
     def save(self):
         Session.add(self)
-        Session.commit()
-
-
+        commit()
+
+
+def load_board():
+    """
+    Returns [(list, its cards sorted by position)] with every card's labels loaded too, in 2 queries however many cards
+    there are, instead of a query for each list's cards and another for each card's labels. The labels are joined onto
+    the cards query, since selectinload() would split a big board's cards into several IN queries for them.
+    """
+    lists = (Session.query(TodoListModel)
+             .options(orm.selectinload(TodoListModel.cards).joinedload(TodoCardModel.labels))
+             .order_by(TodoListModel.id)
+             .all())
+    return [(todo_list, sorted(todo_list.cards, key=sort_key)) for todo_list in lists]
+
+
+def merge_duplicates():
+    """
+    Label names and list titles are unique now, but older databases could have duplicates, which would stop their
+    unique indexes from being created. Duplicate labels are merged into the oldest one, and duplicate lists are renamed.
+    """
+    with transaction():
+        for (name,) in Session.query(TodoLabelModel.name).group_by(TodoLabelModel.name).having(func.count() > 1).all():
+            first, *duplicates = Session.query(TodoLabelModel).filter(TodoLabelModel.name == name).order_by(TodoLabelModel.id)
+            for duplicate in duplicates:
+                for card in duplicate.cards:
+                    if first not in card.labels:
+                        card.labels.append(first)
+                Session.delete(duplicate)
+            commit()
+
+        for (title,) in Session.query(TodoListModel.title).group_by(TodoListModel.title).having(func.count() > 1).all():
+            first, *duplicates = Session.query(TodoListModel).filter(TodoListModel.title == title).order_by(TodoListModel.id)
+            number = 2
+            for duplicate in duplicates:
+                while Session.query(TodoListModel.id).filter(TodoListModel.title == f"{title} ({number})").first():
+                    number += 1
+                duplicate.title = f"{title} ({number})"
+                commit()
@@ -0,0 +1,75 @@
+"""
+Card positions are spaced POSITION_GAP apart, so a card can be put between two others by giving it the position halfway
+between theirs, without moving any other card. Once neighbours get too close, the whole list is rebalanced (its cards
+spaced out again) in one transaction, from the event loop a little later so several moves share one rebalance.
+"""
+import asyncio
+
+from sqlalchemy import inspect
+
+from project_sqlalchemy_globals import transaction
+
+POSITION_GAP = 2 ** 16  # sqlite integers are 64 bit, so there is plenty of room
+MIN_GAP = 8  # a rebalance is scheduled once neighbours are this close, well before they run out of room
+REBALANCE_DELAY = 1  # seconds
+
+_scheduled_lists = {}  # {list model id: list model}
+
+
+def sort_key(card):
+    return card.position if card.position is not None else 0, card.id or 0
+
+
+def position_between(before, after):
+    """A position between before and after, either of which may be None for the start/end of the list. None if full."""
+    if before is None and after is None:
+        return POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if before is None:
+        return after - POSITION_GAP
+    if after - before < 2:
+        return None
+    return (before + after) // 2
+
+
+def position_at(list_model, cards, index):
+    """
+    The position for a card inserted at index (0 for the start) among cards, the other cards in list_model. If they're
+    too close together there, the list is rebalanced right away first.
+    """
+    cards = sorted(cards, key=sort_key)
+    index = max(0, min(index, len(cards)))
+    before = cards[index - 1].position if index > 0 else None
+    after = cards[index].position if index < len(cards) else None
+    position = position_between(before, after)
+
+    if position is None:
+        rebalance(cards)
+        return position_at(list_model, cards, index)
+    if before is not None and after is not None and after - before <= MIN_GAP:
+        schedule_rebalance(list_model)
+    return position
+
+
+def rebalance(cards):
+    """Spaces cards POSITION_GAP apart, keeping their order"""
+    with transaction():
+        for i, card in enumerate(sorted(cards, key=sort_key), start=1):
+            card.position = i * POSITION_GAP
+            card.save()
+
+
+def schedule_rebalance(list_model):
+    if not _scheduled_lists:
+        asyncio.get_event_loop().call_later(REBALANCE_DELAY, _rebalance_scheduled)
+    _scheduled_lists[list_model.id] = list_model
+
+
+def _rebalance_scheduled():
+    lists = list(_scheduled_lists.values())
+    _scheduled_lists.clear()
+    with transaction():
+        for list_model in lists:
+            if inspect(list_model).persistent:  # it could have been deleted since
+                rebalance(list_model.cards)
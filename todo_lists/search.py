@@ -0,0 +1,93 @@
+"""
+Full-text search over the cards' titles and descriptions. todo_cards_fts is an FTS5 table with todo_cards as its
+external content: it only keeps the index, the text itself stays in todo_cards. Triggers on todo_cards update it on
+every insert, update and delete, whoever makes them (the board, CardDialog, the email checker...), so it can't go stale.
+A search is one query against the index, ranked with bm25 with titles counting for more than descriptions.
+
+If sqlite was built without FTS5, there's no index and search() falls back to a LIKE query. That's still done by sqlite,
+just by reading every card.
+"""
+import re
+
+import sqlalchemy.exc
+from sqlalchemy import text
+
+from project_sqlalchemy_globals import Session
+
+FTS_TABLE = "todo_cards_fts"
+TITLE_WEIGHT = 10.0  # bm25 weight of a match in the title, one in the description counts 1
+
+SCHEMA = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+            title, description, content='todo_cards', content_rowid='id', tokenize='unicode61 remove_diacritics 2')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON todo_cards BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+    # an external content table has to be told the old values to remove them from the index
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON todo_cards BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF title, description ON todo_cards BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description) VALUES (new.id, new.title, new.description);
+        END""",
+)
+
+
+def has_index(connection=None):
+    connection = Session if connection is None else connection
+    return connection.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                              {"name": FTS_TABLE}).first() is not None
+
+
+def add_search_index():
+    """
+    Creates the search index and its triggers if they're missing, indexing the cards already there. Call after
+    create_all(). Returns whether there's an index, False if sqlite has no FTS5.
+    """
+    with Session.bind.begin() as connection:
+        if has_index(connection):
+            return True
+        try:
+            for statement in SCHEMA:
+                connection.exec_driver_sql(statement)
+        except sqlalchemy.exc.OperationalError as e:
+            if "fts5" not in str(e.orig):  # "no such module: fts5"
+                raise
+            print(f"No card search index, sqlite can't make one: {e}")
+            return False
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")  # the existing cards
+    return True
+
+
+def words(query):
+    return re.findall(r"\w+", query)
+
+
+def match_query(query):
+    """query as an FTS5 query: each word has to be in the card, as the start of a word so matches come while typing"""
+    return " ".join(f'"{word}"*' for word in words(query))  # quoted, so words like AND or NEAR aren't operators
+
+
+def search(query, limit=None, ranked=True):
+    """
+    The ids of the cards matching query, best first, or [] if it has no words. ranked=False skips ranking them, for
+    when only which cards match matters (ranking a word that's in most cards means scoring most cards).
+    """
+    if not words(query):
+        return []
+    if has_index():
+        order = f"ORDER BY bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0)" if ranked else ""
+        rows = Session.execute(text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :query {order} LIMIT :limit"),
+                               {"query": match_query(query), "limit": -1 if limit is None else limit})
+    else:
+        conditions, parameters = [], {"limit": -1 if limit is None else limit}
+        for i, word in enumerate(words(query)):
+            conditions.append(f"(title LIKE :word{i} ESCAPE '\\' OR description LIKE :word{i} ESCAPE '\\')")
+            parameters[f"word{i}"] = "%" + word.replace("_", "\\_") + "%"  # words are only letters, digits and _
+        order = "ORDER BY id DESC" if ranked else ""  # newest first, there's nothing to rank by
+        rows = Session.execute(text(f"SELECT id FROM todo_cards WHERE {' AND '.join(conditions)} {order} LIMIT :limit"),
+                               parameters)
+    return [row[0] for row in rows]
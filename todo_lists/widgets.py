@@ -1,21 +1,23 @@
 import textwrap
 import typing
 from PySide2 import QtWidgets, QtCore, QtGui
-from utils.widgets import HBoxFrame, UpdatingLineEdit, ColorSelectWidget, BaseFormDialog, DeleteAction, HiddenLineEdit, ImageBackgroundDialog
+from utils.widgets import HBoxFrame, UpdatingLineEdit, ColorFrame, BaseFormDialog, DeleteAction, HiddenLineEdit, ImageBackgroundDialog
 from utils import style_selector_widgets as styles
 import json
-import datetime
-from project_sqlalchemy_globals import Session
-from .models import TodoListModel, TodoCardModel, TodoLabelModel
-import asyncio
+from project_sqlalchemy_globals import Session, transaction
+from .models import TodoListModel, TodoCardModel, TodoLabelModel, load_board
+from . import ordering, deadlines, search
+from .card_view import CardListView, CardItem, CARD_DISPLAY_WIDGETS, CARD_DISPLAY_LIST_VIEW, LABELS_PER_ROW, LABEL_SIZE, label_brush
 from settings.models import Setting
 from utils.field_widgets import ColorSelectField, LineEditField
+from utils.image_cache import ScaledBackground
 
 # TODO: Re-organize. Place each model and its widget in its own file, including dialogues and other necessary objects. Then, combine the object and widget classes into one class, and do everything through that.
 
 
 class TodoListWidget(styles.PrimaryColorWidget):
-    def __init__(self, model, *args, **kwargs):
+    def __init__(self, model, cards=None, *args, **kwargs):
+        """cards is model's cards in order, if already loaded (see models.load_board())"""
         super().__init__(*args, **kwargs)
         self.model = model
         self.holder = None
@@ -33,10 +35,16 @@ class TodoListWidget(styles.PrimaryColorWidget):
         self.setFixedWidth(225)
         self.setAcceptDrops(True)
 
-        for card in sorted(self.model.cards, key=lambda c: c.position):
-            card = TodoCardWidget(card)
-            self.card_widgets.append(card)
-            self.layout().addWidget(card)
+        cards = sorted(self.model.cards, key=ordering.sort_key) if cards is None else cards
+        self.card_view = None
+        if Setting.get_or_create("Card Display", CARD_DISPLAY_WIDGETS).value == CARD_DISPLAY_LIST_VIEW:
+            self.card_view = CardListView(self, cards)
+            self.layout().addWidget(self.card_view)
+        else:
+            for card in cards:
+                card = TodoCardWidget(card)
+                self.card_widgets.append(card)
+                self.layout().addWidget(card)
 
         self.layout().addWidget(AddCardWidget(self))
         self.layout().setSizeConstraint(QtWidgets.QLayout.SetFixedSize)  # fit-contents
@@ -46,31 +54,71 @@ class TodoListWidget(styles.PrimaryColorWidget):
         self.empty_card.setFixedHeight(50)
 
     def set_title(self, title: str):
+        if title != self.model.title and Session.query(TodoListModel.id).filter(TodoListModel.title == title).first():
+            self.title_label.setText(self.model.title)  # list titles are unique
+            return
         self.model.title = title
         self.model.save()
 
+    def make_card(self, model):
+        """A TodoCardWidget for model, or a CardItem if this list shows its cards in a CardListView"""
+        return TodoCardWidget(model) if self.card_view is None else CardItem(model, self.card_view)
+
+    def cards(self):
+        """The TodoCardWidgets or CardItems of this list"""
+        return self.card_widgets if self.card_view is None else self.card_view.items()
+
+    @transaction()
     def add_card(self, card_widget, index=None):
+        """
+        card_widget is from make_card(). index is in the layout, where the title comes first, so 1 is the top card
+        (for a CardListView too).
+        """
+        if self.card_view is not None and not isinstance(card_widget, CardItem):
+            card_widget.deleteLater()  # dragged from a list that shows widgets
+            card_widget = CardItem(card_widget.model, self.card_view)
+        elif self.card_view is None and isinstance(card_widget, CardItem):
+            card_widget = TodoCardWidget(card_widget.model)
+
+        others = [widget.model for widget in self.cards() if widget is not card_widget]
         if index is None:
-            index = len(self.model.cards) + 1
+            index = len(others) + 1
 
-        card_widget.model.position = index
+        # only this card is written, see ordering
+        card_widget.model.position = ordering.position_at(self.model, others, index - 1)
         card_widget.model.save()
 
-        for widget in self.card_widgets:
-            if widget.model.position >= card_widget.model.position:
-                widget.model.position += 1
-                widget.model.save()
-
         self.model.add_card(card_widget.model)
-        self.layout().insertWidget(index, card_widget)
-        self.card_widgets.append(card_widget)
+        self.insert_card(card_widget, index)
+
+    def insert_card(self, card_widget, index=None):
+        """Shows card_widget, from make_card(), at index (see add_card()). Its model must already be in this list."""
+        if index is None:
+            index = len(self.cards()) + 1
+        if self.card_view is not None:
+            self.card_view.model().insert_item(index - 1, card_widget)
+        else:
+            self.layout().insertWidget(index, card_widget)
+            self.card_widgets.append(card_widget)
         self.holder.cards[card_widget.model.id] = card_widget
 
+    def filter_cards(self, ids):
+        """Shows only the cards whose id is in ids, or all of them if ids is None"""
+        if self.card_view is not None:
+            self.card_view.filter_cards(ids)
+        else:
+            for card_widget in self.card_widgets:
+                card_widget.setVisible(ids is None or card_widget.model.id in ids)
+
     def remove_card(self, card_widget, delete_model=True):
-        self.layout().removeWidget(card_widget)
-        self.card_widgets.remove(card_widget)
+        if self.card_view is not None:
+            self.card_view.model().remove_item(card_widget)
+        else:
+            self.layout().removeWidget(card_widget)
+            self.card_widgets.remove(card_widget)
         self.model.remove_card(card_widget.model)
 
+    @transaction()  # removing from the old list and adding to this one is one commit
     def dropEvent(self, event):
         if event.mimeData().hasFormat("application/json"):
             event.acceptProposedAction()
@@ -88,9 +136,12 @@ class TodoListWidget(styles.PrimaryColorWidget):
 
     def dragMoveEvent(self, event):
         self.new_card_index = self.get_drag_event_card_index(event)
-        self.layout().insertWidget(self.new_card_index, self.empty_card)
+        if self.card_view is None:
+            self.layout().insertWidget(self.new_card_index, self.empty_card)
 
     def get_drag_event_card_index(self, event):
+        if self.card_view is not None:
+            return self.card_view.row_at(self.card_view.mapFrom(self, event.pos())) + 1
         y = event.answerRect().y() - 35  # get y pos of widget (-35 accounts for the list title)
         i = 0
         # subtract card heights until you reach <= 0, that card is where to place the empty card
@@ -117,49 +168,38 @@ class TodoListWidget(styles.PrimaryColorWidget):
 
 
 class TodoCardWidget(styles.AccentColorWidget):
-    class LabelContainer(QtWidgets.QFrame):
+    class LabelStrip(QtWidgets.QWidget):
+        """
+        The card's labels as rows of LABELS_PER_ROW colored bars, all painted by this one widget. Laid out the way a
+        row of fixed size frames in a QHBoxLayout would be: the width left over is spread evenly around the bars.
+        """
         def __init__(self, labels, *args, **kwargs):
             super().__init__(*args, **kwargs)
-
-            self.setLayout(QtWidgets.QVBoxLayout())
-            self.layout().setContentsMargins(0, 0, 0, 0)
-
-            # print(len(labels), list(range(0, len(labels))), list(range(5, len(labels), 5)))
-            last = 0
-            for i in range(5, len(labels), 5):
-                a = QtWidgets.QFrame()
-                a.setLayout(QtWidgets.QHBoxLayout())
-                a.layout().setContentsMargins(0, 0, 0, 0)
-
-                for label in labels[last:i]:
-                    a.layout().addWidget(self.CardLabelWidget(label))
-                    # a.layout().addWidget(QtWidgets.QLabel(label.name))
-                last = i
-                self.layout().addWidget(a)
-
-            a = QtWidgets.QFrame()
-            a.setLayout(QtWidgets.QHBoxLayout())
-            a.layout().setContentsMargins(0, 0, 0, 0)
-            for label in labels[last:len(labels)]:
-                a.layout().addWidget(self.CardLabelWidget(label))
-
-            while a.layout().count() != 5:
-                a.layout().addWidget(self.CardLabelSpacer())
-            self.layout().addWidget(a)
-
-        class CardLabelWidget(QtWidgets.QFrame):
-            def __init__(self, label, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self.setStyleSheet(f"background-color: {label.color}; border-radius: 4px;")
-                self.setFixedWidth(32)
-                self.setFixedHeight(8)
-
-        class CardLabelSpacer(QtWidgets.QFrame):
-            def __init__(self, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self.setStyleSheet(f"background-color: rgba(0, 0, 0, 0)")
-                self.setFixedWidth(32)
-                self.setFixedHeight(8)
+            self.brushes = [label_brush(label.color) for label in labels]
+            self.rows = (len(labels) + LABELS_PER_ROW - 1) // LABELS_PER_ROW
+            self.spacing = self.style().pixelMetric(QtWidgets.QStyle.PM_LayoutHorizontalSpacing)  # a layout's default
+            if self.spacing < 0:  # styles like macos' space widgets by their type instead
+                self.spacing = self.style().layoutSpacing(QtWidgets.QSizePolicy.DefaultType,
+                                                          QtWidgets.QSizePolicy.DefaultType, QtCore.Qt.Horizontal)
+            self.row_width = LABELS_PER_ROW * LABEL_SIZE.width() + (LABELS_PER_ROW - 1) * self.spacing
+            self.setMinimumWidth(self.row_width)
+            self.setFixedHeight(self.rows * LABEL_SIZE.height() + (self.rows - 1) * self.spacing)
+
+        def sizeHint(self):
+            return QtCore.QSize(self.row_width, self.height())
+
+        def paintEvent(self, event):
+            extra = max(0, self.width() - self.row_width) // (LABELS_PER_ROW + 1)
+            painter = QtGui.QPainter(self)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            painter.setPen(QtCore.Qt.NoPen)
+            for i, brush in enumerate(self.brushes):
+                row, column = divmod(i, LABELS_PER_ROW)
+                painter.setBrush(brush)
+                painter.drawRoundedRect(extra + column * (LABEL_SIZE.width() + self.spacing + extra),
+                                        row * (LABEL_SIZE.height() + self.spacing),
+                                        LABEL_SIZE.width(), LABEL_SIZE.height(), 4, 4)
+            painter.end()
 
     class DueDateDisplay(QtWidgets.QFrame):
         def __init__(self, date_time, *args, **kwargs):
@@ -167,7 +207,6 @@ class TodoCardWidget(styles.AccentColorWidget):
             self.date_time = date_time
 
             self.setFrameStyle(1)
-            self.setStyleSheet("border-width: 5px")
             self.setFixedSize(50, 25)
 
             self.setLayout(QtWidgets.QHBoxLayout())
@@ -175,15 +214,15 @@ class TodoCardWidget(styles.AccentColorWidget):
 
             self.layout().addWidget(QtWidgets.QLabel(date_time.strftime("%b %d")))
 
-            asyncio.get_running_loop().create_task(self.check_date())
+            # restyled by the one deadline scheduler when the date gets close or passes, see deadlines.py
+            self.set_state(deadlines.scheduler.watch(self, date_time, self.set_state))
+            self.destroyed.connect(lambda: deadlines.scheduler.unwatch(self))
 
-        async def check_date(self):
-            while True:
-                if (self.date_time - datetime.datetime.now()) <= datetime.timedelta(days=0):
-                    self.setStyleSheet("background-color: rgba(120, 0, 0, 90)")
-                elif (self.date_time - datetime.datetime.now()) <= datetime.timedelta(days=1):
-                    self.setStyleSheet("background-color: rgba(250, 220, 120, 90)")
-                await asyncio.sleep(5000)
+        def set_state(self, state):
+            # styled by the DueDateDisplay[state=...] rules in styles.qss. Re-polishing just this widget picks them up.
+            self.setProperty("state", state)
+            self.style().unpolish(self)
+            self.style().polish(self)
 
     def __init__(self, model, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -202,7 +241,7 @@ class TodoCardWidget(styles.AccentColorWidget):
         self.setFixedWidth(225)
 
         if len(self.model.labels) > 0:
-            self.layout().addWidget(self.LabelContainer(self.model.labels))
+            self.layout().addWidget(self.LabelStrip(self.model.labels))
 
         title_qlabel = HiddenLineEdit(self.model.title if len(self.model.title) < 34 else f"{self.model.title[:33]}...")
         title_qlabel.setFrame(False)
@@ -366,9 +405,10 @@ class CardDialog(BaseFormDialog):
 
         model_attrs["parent_list"] = None
         print(model_attrs)
-        model = super().save(model_attrs, accept=False)
-        if self.parent_list_widget is not None:
-            self.parent_list_widget.add_card(TodoCardWidget(model))
+        with transaction():
+            model = super().save(model_attrs, accept=False)
+            if self.parent_list_widget is not None:
+                self.parent_list_widget.add_card(self.parent_list_widget.make_card(model))
 
         if self.widget is not None:
             self.widget.ui_refresh()  # refresh card
@@ -376,16 +416,17 @@ class CardDialog(BaseFormDialog):
         self.accept()
 
 
-class LabelWidget(QtWidgets.QFrame):
+class LabelWidget(ColorFrame):
+    radius = 5
+
     def __init__(self, model, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(model.color, *args, **kwargs)
         self.model = model
 
         self.setLayout(QtWidgets.QHBoxLayout())
         self.name_label = QtWidgets.QLabel(self.model.name)
         self.layout().addWidget(self.name_label)
 
-        self.setStyleSheet(f"background-color: {self.model.color}; border-radius: 5px;")
         self.setFixedWidth(125)
         self.setFixedHeight(30)
         self.setFrameStyle(1)
@@ -473,9 +514,20 @@ class LabelDialog(BaseFormDialog):
                                      "color": (ColorSelectField(model.color), "data()")},
                              image_fp=Setting.get("Background Image").value, *args, **kwargs)
 
+    def generate_attrs_dict(self):
+        ret = super().generate_attrs_dict()
+        existing = Session.query(TodoLabelModel).filter(TodoLabelModel.name == ret["name"]).one_or_none()
+        assert existing is None or existing is self.model
+        return ret
+
     def save(self):  # noqa
-        self.created = super().save(accept=False)
-        self.accept()
+        try:
+            self.created = super().save(accept=False)
+            self.accept()
+        except AssertionError:
+            e = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Warning, "Invalid label name",
+                                      "A label with this name already exists. Please select another.")
+            e.exec_()
 
 
 class ListDialog(BaseFormDialog):
@@ -493,8 +545,9 @@ class ListDialog(BaseFormDialog):
 
     def save(self):  # noqa
         try:
-            model = super().save(accept=False)
-            self.parent_holder_widget.add_list(TodoListWidget(model))
+            with transaction():
+                model = super().save(accept=False)
+                self.parent_holder_widget.add_list(TodoListWidget(model))
             self.accept()
         except AssertionError:
             e = QtWidgets.QMessageBox(QtWidgets.QMessageBox.Warning, "Invalid list name",
@@ -507,18 +560,39 @@ class TodoMainScroll(QtWidgets.QScrollArea):
         super().__init__(*args, **kwargs)
         self.setWidget(MainTodoWidget())
         self.setWidgetResizable(True)
-        self.bg = QtGui.QPixmap(Setting.get_or_create("Background Image", "bg.jpg").value)
-        self.bg = self.bg.scaled(self.width(), self.height(), QtCore.Qt.KeepAspectRatioByExpanding)
+        self.bg = ScaledBackground(self.viewport(), Setting.get_or_create("Background Image", "bg.jpg").value)
+        Setting.subscribe_widget(self, "Background Image", self.bg.set_path)
         print(self.viewport())
 
     def paintEvent(self, arg__1: QtGui.QPaintEvent):  # Special Case since its a scrollarea.
         super().paintEvent(arg__1)
         painter = QtGui.QPainter(self.viewport())
-        painter.drawPixmap(0, 0, self.bg)
+        self.bg.paint(painter)
 
     def resizeEvent(self, event) -> None:
-        self.bg = QtGui.QPixmap(Setting.get("Background Image").value)
-        self.bg = self.bg.scaled(event.size().width(), event.size().height(), QtCore.Qt.KeepAspectRatioByExpanding)
+        self.bg.resize(event.size())
+
+
+class CardSearchBox(QtWidgets.QLineEdit):
+    """Filters the board down to the cards matching what's typed, searched in the index in search.py"""
+    DELAY = 150  # ms after the last keystroke
+
+    def __init__(self, holder, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.holder = holder
+        self.setPlaceholderText("Search cards")
+        self.setClearButtonEnabled(True)
+        self.setFixedWidth(300)
+        self.search_timer = QtCore.QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(self.DELAY)
+        self.search_timer.timeout.connect(self.filter_board)
+        self.textChanged.connect(lambda text: self.search_timer.start())
+
+    def filter_board(self):
+        ids = set(search.search(self.text(), ranked=False)) if search.words(self.text()) else None
+        for list_widget in self.holder.lists.values():
+            list_widget.filter_cards(ids)
 
 
 class MainTodoWidget(styles.InvisibleBackgroundWidget):
@@ -536,22 +610,24 @@ class MainTodoWidget(styles.InvisibleBackgroundWidget):
         self.hbox.layout().addWidget(CreateListWidget(), alignment=QtCore.Qt.AlignTop)  # Noqa
         self.hbox.layout().addStretch()
 
+        self.search_box = CardSearchBox(self)
+
         self.setLayout(QtWidgets.QVBoxLayout())
+        self.layout().addWidget(self.search_box, alignment=QtCore.Qt.AlignLeft)  # Noqa
         self.layout().addWidget(self.hbox, alignment=QtCore.Qt.AlignTop)  # Noqa
 
-        list_models = Session.query(TodoListModel).all()
-        # print(list_models, len(list_models))
-        if len(list_models) == 0:
-            list_models = [TodoListModel("To-Do"),
-                           TodoListModel("Doing"),
-                           TodoListModel("Done")]
+        board = load_board()
+        # print(board, len(board))
+        if len(board) == 0:
+            with transaction():
+                list_models = [TodoListModel("To-Do"),
+                               TodoListModel("Doing"),
+                               TodoListModel("Done")]
             for todo_list in list_models:
-                Session.add(todo_list)
-                Session.commit()
                 self.add_list(TodoListWidget(todo_list))
         else:
-            for todo_list in list_models:
-                self.add_list(TodoListWidget(todo_list))
+            for todo_list, cards in board:
+                self.add_list(TodoListWidget(todo_list, cards))
 
         # print([a.position for a in Session.query(TodoCardModel).order_by(TodoCardModel.position).all()])
 
@@ -559,5 +635,5 @@ class MainTodoWidget(styles.InvisibleBackgroundWidget):
         self.lists[list_widget.model.id] = list_widget
         list_widget.holder = self
         self.hbox.layout().insertWidget(len(self.lists) - 1, list_widget, alignment=QtCore.Qt.AlignTop)
-        for card_widget in list_widget.card_widgets:
+        for card_widget in list_widget.cards():
             self.cards[card_widget.model.id] = card_widget
@@ -1,6 +1,7 @@
 """
 Provides Widgets to be used in dialogues and settings, with a standardized function to return the data
 """
+import json
 from PySide2 import QtWidgets, QtCore
 from .widgets import ColorSelectWidget
 from utils import style_selector_widgets as styles
@@ -10,30 +11,48 @@ class BaseFieldWidget():
     def data(self):
         pass
 
+    def set_data(self, value):
+        """Shows value, in the same form data() returns, ex. a setting that was changed from somewhere else"""
+        raise NotImplementedError
+
 
 class LineEditField(QtWidgets.QLineEdit, BaseFieldWidget):
     def data(self):
         return self.text()
 
+    def set_data(self, value):
+        self.setText("" if value is None else str(value))
+
 
 class TextEditField(QtWidgets.QTextEdit, BaseFieldWidget):
     def data(self):
         return self.document().toPlainText()
 
+    def set_data(self, value):
+        self.setPlainText("" if value is None else str(value))
+
 
 class ComboBoxField(QtWidgets.QComboBox, BaseFieldWidget):
-    def __init__(self, options=(), *args, **kwargs):
+    def __init__(self, options=(), selected=None, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.addItems(options)
+        if selected is not None:
+            self.setCurrentText(selected)
 
     def data(self):
         return self.currentText()
 
+    def set_data(self, value):
+        self.setCurrentText(str(value))
+
 
 class ColorSelectField(ColorSelectWidget, BaseFieldWidget):
     def data(self):
         return self.selected_color
 
+    def set_data(self, value):
+        self.set_color(value)
+
 
 class SelectMultipleField():
     pass  # SUggestion: move labelselect to this sort of thing?
@@ -73,6 +92,12 @@ class TimeField(QtWidgets.QFrame, BaseFieldWidget):
     def data(self):
         return f"{int(self.hours_select.value())}:{int(self.minutes_select.value())}:{int(self.seconds_select.value())}"
 
+    def set_data(self, value):
+        hours, minutes, seconds = str(value).split(":")
+        self.hours_select.setValue(float(hours))
+        self.minutes_select.setValue(float(minutes))
+        self.seconds_select.setValue(float(seconds))
+
 
 class FilePathField(styles.PrimaryColorWidget, BaseFieldWidget):
     def __init__(self, file_path=None, *args, **kwargs):
@@ -83,6 +108,7 @@ class FilePathField(styles.PrimaryColorWidget, BaseFieldWidget):
         self.file_dialog = QtWidgets.QFileDialog()
         self.file_dialog.setFileMode(QtWidgets.QFileDialog.ExistingFile)
         self.file_dialog.currentChanged.connect(lambda path: self.file_label.setText(path))
+        self.file_dialog.fileSelected.connect(self.set_data)
 
         self.setLayout(QtWidgets.QHBoxLayout())
         self.layout().addWidget(self.file_label)
@@ -92,11 +118,11 @@ class FilePathField(styles.PrimaryColorWidget, BaseFieldWidget):
             self.file_dialog.exec_()
 
     def data(self):
-        if len(self.file_dialog.selectedFiles()) != 0:
-            print(self.file_dialog.selectedFiles()[0])
-            return self.file_dialog.selectedFiles()[0]
-        else:
-            return self.file_path
+        return self.file_path
+
+    def set_data(self, value):
+        self.file_path = value
+        self.file_label.setText("Select a File" if value is None else value)
 
 
 class SliderField(QtWidgets.QFrame, BaseFieldWidget):
@@ -116,13 +142,67 @@ class SliderField(QtWidgets.QFrame, BaseFieldWidget):
     def data(self):
         return self.slider.value()
 
+    def set_data(self, value):
+        self.slider.setValue(int(value))
+
 
 class BooleanField(QtWidgets.QCheckBox, BaseFieldWidget):
     def __init__(self, is_checked=False, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        if isinstance(is_checked, str):
-            is_checked = False if is_checked == "False" else True
-        self.setChecked(is_checked)
+        self.set_data(is_checked)
 
     def data(self):
         return str(self.isChecked())
+
+    def set_data(self, value):
+        if isinstance(value, str):
+            value = False if value == "False" else True
+        self.setChecked(value)
+
+
+class EmailAccountsField(QtWidgets.QFrame, BaseFieldWidget):
+    """Rows of (address, password, IMAP url), stored as a json list"""
+    class AccountRow(QtWidgets.QFrame):
+        def __init__(self, address="", password="", imap_url="imap.gmail.com", *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.setLayout(QtWidgets.QHBoxLayout())
+            self.layout().setContentsMargins(0, 0, 0, 0)
+
+            self.address = LineEditField(address)
+            self.address.setPlaceholderText("Address")
+            self.password = PasswordField(password)
+            self.password.setPlaceholderText("Password")
+            self.imap_url = LineEditField(imap_url)
+            self.imap_url.setPlaceholderText("IMAP URL")
+            self.remove_button = QtWidgets.QPushButton("Remove")
+            self.remove_button.pressed.connect(self.deleteLater)
+
+            for widget in (self.address, self.password, self.imap_url, self.remove_button):
+                self.layout().addWidget(widget)
+
+        def data(self):
+            return {"address": self.address.data(), "password": self.password.data(), "imap_url": self.imap_url.data()}
+
+    def __init__(self, accounts_json="[]", *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setLayout(QtWidgets.QVBoxLayout())
+        self.layout().setContentsMargins(0, 0, 0, 0)
+
+        self.add_button = QtWidgets.QPushButton("Add Account")
+        self.add_button.pressed.connect(lambda: self.add_row(self.AccountRow()))
+        self.layout().addWidget(self.add_button)
+        self.set_data(accounts_json)
+
+    def add_row(self, row):
+        self.layout().insertWidget(self.layout().count() - 1, row)
+
+    def data(self):
+        return json.dumps([row.data() for row in self.findChildren(self.AccountRow)
+                           if row.address.data() and not row.isHidden()])
+
+    def set_data(self, value):
+        for row in self.findChildren(self.AccountRow):
+            row.hide()  # it's only deleted later, until then data() skips it
+            row.deleteLater()
+        for account in json.loads(value or "[]"):
+            self.add_row(self.AccountRow(account["address"], account["password"], account["imap_url"]))
@@ -0,0 +1,183 @@
+"""
+One cache of background images for the whole app. Each image file is decoded once, and its scaled versions are kept in
+an LRU cache keyed on (path, size) and bounded by MAX_SCALED_BYTES, so reopening a dialog or going back to a size
+costs nothing. Scaling (and the first decode) is done on QThreadPool's threads as QImages; only turning the result into
+a QPixmap happens on the GUI thread.
+
+Widgets use it through a ScaledBackground, which also debounces resizes: while a window edge is being dragged it keeps
+drawing the last pixmap, and only asks for a new one once the size stops changing for RESCALE_DELAY ms.
+"""
+import collections
+import threading
+
+import shiboken2
+from PySide2 import QtCore, QtGui
+
+MAX_SCALED_BYTES = 64 * 1024 * 1024  # about 8 full hd backgrounds
+RESCALE_DELAY = 60  # ms
+
+_originals = {}  # {path: QImage}
+_originals_lock = threading.Lock()
+_scaled = collections.OrderedDict()  # {(path, width, height): QPixmap}, least recently used first
+_scaled_bytes = 0
+_pending = set()  # keys being scaled on the thread pool
+_waits_on_quit = False  # whether the app waits for the thread pool's tasks when it quits
+
+
+def original(path):
+    """The decoded image at path, decoding it if this is the first time. Safe to call from any thread."""
+    with _originals_lock:
+        image = _originals.get(path)
+        if image is None:
+            image = _originals[path] = QtGui.QImage(path)
+        return image
+
+
+def cached(path, size):
+    """The image at path scaled to cover size, if it's cached. Otherwise None."""
+    key = (path, size.width(), size.height())
+    pixmap = _scaled.get(key)
+    if pixmap is not None:
+        _scaled.move_to_end(key)
+    return pixmap
+
+
+def scaled(path, size):
+    """The image at path scaled to cover size, scaling it right away (on this, the GUI thread) if it isn't cached"""
+    pixmap = cached(path, size)
+    if pixmap is None:
+        pixmap = _store(path, size, _scale(path, size))
+    return pixmap
+
+
+def request(path, size):
+    """Scales the image at path to cover size on the thread pool. scaler.scaled is emitted once it's cached."""
+    key = (path, size.width(), size.height())
+    if key in _scaled:
+        scaler.scaled.emit(path, size)
+    elif key not in _pending:
+        _pending.add(key)
+        _wait_on_quit()
+        QtCore.QThreadPool.globalInstance().start(_ScaleTask(path, QtCore.QSize(size)))
+
+
+def clear():
+    global _scaled_bytes
+    with _originals_lock:
+        _originals.clear()
+    _scaled.clear()
+    _scaled_bytes = 0
+
+
+def _wait_on_quit():
+    """
+    Has the app finish the scaling tasks still running when it quits. Otherwise python deletes scaler while they're
+    about to emit on it.
+    """
+    global _waits_on_quit
+    app = QtCore.QCoreApplication.instance()
+    if not _waits_on_quit and app is not None:
+        app.aboutToQuit.connect(lambda: QtCore.QThreadPool.globalInstance().waitForDone())
+        _waits_on_quit = True
+
+
+def _scale(path, size):
+    return original(path).scaled(size, QtCore.Qt.KeepAspectRatioByExpanding, QtCore.Qt.SmoothTransformation)
+
+
+def _store(path, size, image):
+    global _scaled_bytes
+    key = (path, size.width(), size.height())
+    pixmap = QtGui.QPixmap.fromImage(image)
+    if key in _scaled:
+        _scaled_bytes -= _pixmap_bytes(_scaled.pop(key))
+    _scaled[key] = pixmap
+    _scaled_bytes += _pixmap_bytes(pixmap)
+    while _scaled_bytes > MAX_SCALED_BYTES and len(_scaled) > 1:
+        _, evicted = _scaled.popitem(last=False)
+        _scaled_bytes -= _pixmap_bytes(evicted)
+    return pixmap
+
+
+def _pixmap_bytes(pixmap):
+    return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+
+class _Scaler(QtCore.QObject):
+    """Lives on the GUI thread, so the thread pool's results are handed to it there"""
+    done = QtCore.Signal(str, QtCore.QSize, QtGui.QImage)
+    scaled = QtCore.Signal(str, QtCore.QSize)  # path, size: the pixmap is in the cache now
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.done.connect(self.on_done)
+
+    def on_done(self, path, size, image):
+        _pending.discard((path, size.width(), size.height()))
+        _store(path, size, image)
+        self.scaled.emit(path, size)
+
+
+scaler = _Scaler()
+
+
+class _ScaleTask(QtCore.QRunnable):
+    def __init__(self, path, size):
+        super().__init__()
+        self.path = path
+        self.size = size
+
+    def run(self):
+        image = _scale(self.path, self.size)
+        if shiboken2.isValid(scaler):  # gone if python exited without the app quitting, ex. a script that never exec_()s
+            scaler.done.emit(self.path, self.size, image)
+
+
+class ScaledBackground(QtCore.QObject):
+    """
+    A widget's background image, scaled to cover it. The widget calls resize() from its resizeEvent and paint() from its
+    paintEvent.
+    """
+    def __init__(self, widget, path, *args, **kwargs):
+        super().__init__(widget, *args, **kwargs)
+        self.widget = widget
+        self.path = path
+        self.size = QtCore.QSize()
+        self.pixmap = None
+        self.rescale_timer = QtCore.QTimer(self)
+        self.rescale_timer.setSingleShot(True)
+        self.rescale_timer.setInterval(RESCALE_DELAY)
+        self.rescale_timer.timeout.connect(lambda: request(self.path, self.size))
+        scaler.scaled.connect(self.on_scaled)
+
+    def set_path(self, path):
+        if path != self.path:
+            self.path = path
+            self.pixmap = None
+            self.resize(self.size)
+
+    def resize(self, size):
+        self.size = QtCore.QSize(size)
+        if size.isEmpty():
+            return
+        pixmap = cached(self.path, size)
+        if pixmap is not None:
+            self.pixmap = pixmap
+            self.widget.update()
+        elif self.pixmap is None:
+            request(self.path, size)  # nothing to show meanwhile, so no point waiting
+        else:
+            self.rescale_timer.start()
+
+    def on_scaled(self, path, size):
+        if path == self.path and (size == self.size or self.pixmap is None):  # an old size is better than nothing
+            self.pixmap = cached(path, size)
+            self.widget.update()
+
+    def paint(self, painter):
+        if self.pixmap is None:
+            return
+        if self.pixmap.size() == self.pixmap.size().scaled(self.size, QtCore.Qt.KeepAspectRatioByExpanding):
+            painter.drawPixmap(0, 0, self.pixmap)
+        else:  # an old size while a resize is debounced, stretch it (quickly) to cover until the new one is ready
+            painter.drawPixmap(QtCore.QRect(QtCore.QPoint(0, 0), self.pixmap.size().scaled(self.size, QtCore.Qt.KeepAspectRatioByExpanding)), self.pixmap)
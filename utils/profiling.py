@@ -0,0 +1,217 @@
+"""
+Profiling mode, for finding out where startup and the first seconds of use go. Off unless main.py is run with
+--profile (or --profile=report.json), or with the STUDYCOORDINATOR_PROFILE environment variable set to a report path.
+While on, it records:
+    - how long each module took to import, with and without the modules it imported
+    - how long each phase() took, ex. creating the tables or building a tab, and when each mark() happened
+    - a cProfile of the first PROFILE_SECONDS seconds (STUDYCOORDINATOR_PROFILE_SECONDS)
+and writes them to a json report, plus the raw cProfile stats next to it (report.prof, for pstats or snakeviz).
+
+Two reports can be compared, ex. before and after a change, to catch startup regressions:
+    python -m utils.profiling compare old.json new.json [--threshold 10]
+It prints each phase's and the slowest imports' change and exits with 1 if a phase got slower by more than the threshold
+(in percent).
+
+Only the standard library is used here, so it can be turned on before anything else is imported.
+"""
+import atexit
+import contextlib
+import cProfile
+import datetime
+import importlib.abc
+import json
+import os
+import pstats
+import sys
+import time
+
+DEFAULT_REPORT = "profile_report.json"
+PROFILE_SECONDS = float(os.environ.get("STUDYCOORDINATOR_PROFILE_SECONDS", 10))
+TOP_FUNCTIONS = 50  # functions kept in the report, by cumulative time
+
+_report_path = None  # None while profiling is off
+_started = None
+_profiler = None
+_import_timer = None
+_phases = []  # [{"name", "start_ms", "ms"}]
+_marks = []  # [{"name", "ms"}]
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Goes first in sys.meta_path and wraps each module's loader so its exec_module() is timed"""
+    def __init__(self):
+        self.times = {}  # {module: [total seconds, seconds spent importing other modules]}
+        self.stack = []
+        self.finding = set()
+
+    def find_spec(self, name, path, target=None):
+        if name in self.finding:
+            return None
+        self.finding.add(name)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self.finding.discard(name)
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimedLoader(self, spec.loader)
+        return spec
+
+    def timed(self, name, function):
+        start = time.perf_counter()
+        self.stack.append(name)
+        try:
+            return function()
+        finally:
+            self.stack.pop()
+            elapsed = time.perf_counter() - start
+            self.times.setdefault(name, [0, 0])[0] += elapsed
+            if self.stack:
+                self.times.setdefault(self.stack[-1], [0, 0])[1] += elapsed
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, timer, loader):
+        self.timer = timer
+        self.loader = loader
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        self.timer.timed(module.__name__, lambda: self.loader.exec_module(module))
+
+    def __getattr__(self, name):  # get_resource_reader(), is_package() etc. of the real loader
+        return getattr(self.loader, name)
+
+
+def enabled():
+    return _report_path is not None
+
+
+def enable_from_args(argv):
+    """Turns profiling on if --profile[=path] is in argv or STUDYCOORDINATOR_PROFILE is set"""
+    for arg in argv[1:]:
+        if arg == "--profile":
+            return enable(DEFAULT_REPORT)
+        if arg.startswith("--profile="):
+            return enable(arg.split("=", 1)[1])
+    if os.environ.get("STUDYCOORDINATOR_PROFILE"):
+        return enable(os.environ["STUDYCOORDINATOR_PROFILE"])
+
+
+def enable(report_path):
+    global _report_path, _started, _profiler, _import_timer
+    if enabled():
+        return
+    _report_path = report_path
+    _started = time.perf_counter()
+    _import_timer = _ImportTimer()
+    sys.meta_path.insert(0, _import_timer)
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+    atexit.register(write_report)  # in case the app is closed before PROFILE_SECONDS
+    print(f"Profiling, the report will be written to {_report_path}")
+
+
+def stop_after(seconds=PROFILE_SECONDS):
+    """Stops the cProfile and writes the report after seconds, from the event loop so it's the profiled thread"""
+    if enabled():
+        import asyncio
+        asyncio.get_event_loop().call_later(seconds, write_report)
+
+
+@contextlib.contextmanager
+def phase(name):
+    """Times the with block as the named phase. Does nothing while profiling is off."""
+    if not enabled():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append({"name": name, "start_ms": _ms(start - _started), "ms": _ms(time.perf_counter() - start)})
+
+
+def mark(name):
+    """Records when something happened, ex. the first paint"""
+    if enabled():
+        _marks.append({"name": name, "ms": _ms(time.perf_counter() - _started)})
+
+
+def write_report():
+    global _profiler
+    if not enabled() or _profiler is None:
+        return
+    _profiler.disable()
+    sys.meta_path.remove(_import_timer)
+    stats_path = os.path.splitext(_report_path)[0] + ".prof"
+    _profiler.dump_stats(stats_path)
+
+    stats = pstats.Stats(_profiler)
+    functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+    imports = [{"module": name, "ms": _ms(total), "self_ms": _ms(total - children)}
+               for name, (total, children) in _import_timer.times.items()]
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "argv": sys.argv,
+        "python": sys.version,
+        "profiled_ms": _ms(time.perf_counter() - _started),
+        "phases": _phases,
+        "marks": _marks,
+        "imports": sorted(imports, key=lambda i: i["self_ms"], reverse=True),
+        "functions": [{"function": f"{file}:{line}({name})", "calls": calls, "tottime_ms": _ms(tottime),
+                       "cumtime_ms": _ms(cumtime)}
+                      for (file, line, name), (_, calls, tottime, cumtime, _) in functions],
+        "stats_file": stats_path,
+    }
+    with open(_report_path, "w") as report_file:
+        json.dump(report, report_file, indent=4)
+    _profiler = None
+    print(f"Profiling report written to {_report_path}")
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def compare(old_path, new_path, threshold=10, top=15):
+    """Prints how the phases, marks and slowest imports changed. Returns whether a phase got threshold% slower."""
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+
+    regressed = False
+    for section, key in (("phases", "ms"), ("marks", "ms")):
+        print(f"{section}:")
+        old_times = {item["name"]: item[key] for item in old[section]}
+        for item in new[section]:
+            before, after = old_times.get(item["name"]), item[key]
+            if before is None:
+                print(f"    {item['name']:40} {'':>10} {after:10.1f}ms (new)")
+                continue
+            change = (after - before) / before * 100 if before else 0
+            slower = section == "phases" and change > threshold
+            regressed = regressed or slower
+            print(f"    {item['name']:40} {before:10.1f} {after:10.1f}ms {change:+7.1f}%{'  SLOWER' if slower else ''}")
+
+    print(f"imports (slowest {top}, self time):")
+    old_imports = {item["module"]: item["self_ms"] for item in old["imports"]}
+    for item in new["imports"][:top]:
+        before = old_imports.get(item["module"])
+        print(f"    {item['module']:40} {'' if before is None else f'{before:.1f}':>10} {item['self_ms']:10.1f}ms")
+    return regressed
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 4 or sys.argv[1] != "compare":
+        print(__doc__)
+        sys.exit(2)
+    threshold = float(sys.argv[sys.argv.index("--threshold") + 1]) if "--threshold" in sys.argv else 10
+    sys.exit(1 if compare(sys.argv[2], sys.argv[3], threshold) else 0)
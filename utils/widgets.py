@@ -1,5 +1,7 @@
 from PySide2 import QtWidgets, QtCore, QtGui
 from project_sqlalchemy_globals import Session
+from . import profiling
+from .image_cache import ScaledBackground
 
 
 class HBoxFrame(QtWidgets.QFrame):
@@ -39,21 +41,48 @@ class HiddenLineEdit(QtWidgets.QLineEdit):
         self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents, True)
 
 
-class ColorSelectWidget(QtWidgets.QFrame):
-    def __init__(self, default="#FFFFF", *args, **kwargs):
+class ColorFrame(QtWidgets.QFrame):
+    """
+    A frame filled with a color it paints itself. A widget with its own stylesheet gets its own style, which every
+    restyle (ex. a theme switch) has to rebuild separately, so fixed colors aren't done with setStyleSheet().
+    """
+    radius = 0
+
+    def __init__(self, color, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.color = QtGui.QColor(color)
+
+    def set_color(self, color):
+        self.color = QtGui.QColor(color)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QtGui.QPainter(self)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(self.color)
+        painter.drawRoundedRect(self.rect(), self.radius, self.radius)
+        painter.end()
+        super().paintEvent(event)  # the frame, if it has one
+
+
+class ColorSelectWidget(ColorFrame):
+    def __init__(self, default="#FFFFF", *args, **kwargs):
+        super().__init__(default, *args, **kwargs)
         print("defauld: ", default)
         self.color_dialog = QtWidgets.QColorDialog()
         self.selected_color = default
-        self.setStyleSheet(f"background-color: {default}")
         self.setFrameStyle(1)
         self.setFixedWidth(75)
         self.setFixedHeight(20)
 
+    def set_color(self, color):
+        self.selected_color = color
+        super().set_color(color)
+
     def mouseReleaseEvent(self, event):
         color = self.color_dialog.getColor()
-        self.selected_color = color.name()
-        self.setStyleSheet(f"background-color: {self.selected_color}")
+        self.set_color(color.name())
 
 
 class DeleteAction(QtWidgets.QAction):
@@ -74,38 +103,93 @@ class DeleteAction(QtWidgets.QAction):
         self.widget_deleted = True
 
 
+class LazyTabWidget(QtWidgets.QTabWidget):
+    """
+    A QTabWidget whose tabs are built the first time they're shown, so nothing runs for a tab that's never opened and
+    the window can show before any tab's work is done. Until then a tab is a LazyTabPlaceholder.
+    """
+    def add_lazy_tab(self, factory, title):
+        """factory() returns the tab's widget"""
+        return self.addTab(LazyTabPlaceholder(self, factory), title)
+
+    def build_tab(self, index):
+        """The widget of the tab at index, built right away if it hasn't been yet"""
+        widget = self.widget(index)
+        if isinstance(widget, LazyTabPlaceholder):
+            widget = widget.build()
+        return widget
+
+    def reset_tab(self, index, factory):
+        """Throws away the tab at index if it's been built, so factory() builds it again the next time it's shown"""
+        old = self.widget(index)
+        if isinstance(old, LazyTabPlaceholder):
+            return
+        current = self.currentIndex() == index
+        self.insertTab(index, LazyTabPlaceholder(self, factory), self.tabText(index))
+        self.removeTab(index + 1)
+        if current:
+            self.setCurrentIndex(index)
+        old.deleteLater()
+
+
+class LazyTabPlaceholder(QtWidgets.QLabel):
+    """Builds its tab after it's first painted, which only happens once its tab is shown"""
+    def __init__(self, tab_widget, factory, *args, **kwargs):
+        super().__init__("Loading...", *args, **kwargs)
+        self.setAlignment(QtCore.Qt.AlignCenter)
+        self.tab_widget = tab_widget
+        self.factory = factory
+        self.build_scheduled = False
+        self.built = None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.build_scheduled:
+            self.build_scheduled = True
+            QtCore.QTimer.singleShot(0, self.build)  # once this frame is on screen
+
+    def build(self):
+        if self.built is not None:  # build_tab() got to it first
+            return self.built
+        index = self.tab_widget.indexOf(self)
+        current = self.tab_widget.currentIndex() == index
+        title = self.tab_widget.tabText(index)
+        with profiling.phase(f"tab: {title}"):
+            self.built = self.factory()
+        self.tab_widget.insertTab(index, self.built, title)
+        self.tab_widget.removeTab(index + 1)
+        if current:
+            self.tab_widget.setCurrentIndex(index)
+        self.deleteLater()
+        return self.built
+
+
 class ImageBackgroundWidget(QtWidgets.QFrame):
     def __init__(self, image_fp, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.bg_fp = image_fp
-        self.bg = QtGui.QPixmap(image_fp)
-        self.bg = self.bg.scaled(self.width(), self.height(), QtCore.Qt.KeepAspectRatioByExpanding)
+        self.bg = ScaledBackground(self, image_fp)  # decoded and scaled once, off the gui thread, see utils/image_cache.py
 
     def paintEvent(self, event: QtGui.QPaintEvent):  # Special Case since its a scrollarea.
         super().paintEvent(event)
         painter = QtGui.QPainter(self)
-        painter.drawPixmap(0, 0, self.bg)
+        self.bg.paint(painter)
 
     def resizeEvent(self, event) -> None:
-        self.bg = QtGui.QPixmap(self.bg_fp)
-        self.bg = self.bg.scaled(event.size().width(), event.size().height(), QtCore.Qt.KeepAspectRatioByExpanding)
+        self.bg.resize(event.size())
 
 
 class ImageBackgroundDialog(QtWidgets.QDialog):
     def __init__(self, image_fp, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.bg_fp = image_fp
-        self.bg = QtGui.QPixmap(image_fp)
-        self.bg = self.bg.scaled(self.width(), self.height(), QtCore.Qt.KeepAspectRatioByExpanding)
+        self.bg = ScaledBackground(self, image_fp)
 
     def paintEvent(self, event: QtGui.QPaintEvent):  # Special Case since its a scrollarea.
         super().paintEvent(event)
         painter = QtGui.QPainter(self)
-        painter.drawPixmap(0, 0, self.bg)
+        self.bg.paint(painter)
 
     def resizeEvent(self, event) -> None:
-        self.bg = QtGui.QPixmap(self.bg_fp)
-        self.bg = self.bg.scaled(event.size().width(), event.size().height(), QtCore.Qt.KeepAspectRatioByExpanding)
+        self.bg.resize(event.size())
 
 
 class BaseFormDialog(ImageBackgroundDialog):